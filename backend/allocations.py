@@ -0,0 +1,320 @@
+"""Payment allocations and the invoice balances they maintain.
+
+A payment is split across invoices by ``PaymentAllocation`` rows. Every
+invoice carries ``amount_paid`` and ``balance_due``; whenever allocations
+change, :func:`refresh_invoices` recomputes both for the invoices involved
+with one set-based UPDATE in the same transaction. Sent or overdue invoices
+whose balance is settled become paid, and paid invoices whose allocations
+no longer cover them go back to sent. Invoices marked paid by hand keep
+their status until their allocations change.
+
+These writes bypass the ORM, so like the bulk imports they assign change
+sequence numbers, move the rollups and bump the table versions themselves.
+"""
+import csv
+import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import bindparam, delete, func, insert, or_, select, update
+
+from cache import bump_versions
+from models import Invoice, Payment, PaymentAllocation, allocate_change_seqs
+from rollups import apply_changes, invoice_fact
+from utils import parse_float, parse_int
+
+# Amounts closer than this count as equal, absorbing float rounding in sums.
+PAYMENT_TOLERANCE = 0.005
+# Statuses that become paid once the balance is settled.
+PAYABLE_STATUSES = ('sent', 'overdue')
+LOOKUP_CHUNK_SIZE = 1000
+REMITTANCE_CSV_COLUMNS = ('invoiceNumber', 'amount')
+
+# ``{invoice_id: amount}`` in the order the allocations were given.
+Allocations = Dict[int, float]
+
+
+def _chunks(values: List[Any]) -> Iterator[List[Any]]:
+    for start in range(0, len(values), LOOKUP_CHUNK_SIZE):
+        yield values[start:start + LOOKUP_CHUNK_SIZE]
+
+
+def parse_allocations(data) -> Optional[Allocations]:
+    """Read the ``allocations`` array of a payment body.
+
+    Returns ``None`` when the body has none. Raises ``ValueError`` with a
+    client-facing message on malformed entries.
+    """
+    entries = data.get('allocations')
+    if entries is None:
+        return None
+    if not isinstance(entries, list):
+        raise ValueError('allocations must be an array')
+    allocations: Allocations = {}
+    for entry in entries:
+        invoice_id = parse_int(entry.get('invoiceId')) if isinstance(entry, dict) else None
+        if not invoice_id:
+            raise ValueError('Every allocation needs an invoiceId')
+        amount = parse_float(entry.get('amount'), 0.0)
+        if amount <= 0:
+            raise ValueError('Allocation amounts must be greater than zero')
+        if invoice_id in allocations:
+            raise ValueError('An invoice can only be allocated once per payment')
+        allocations[invoice_id] = amount
+    return allocations
+
+
+def payment_allocations(db, payment_id: Optional[int]) -> Allocations:
+    """The current allocations of a payment."""
+    if payment_id is None:
+        return {}
+    table = PaymentAllocation.__table__
+    return dict(db.execute(
+        select(table.c.invoice_id, table.c.amount).where(table.c.payment_id == payment_id).order_by(table.c.id)
+    ).all())
+
+
+def _balances(db, invoice_ids: Iterable[int]) -> Dict[int, float]:
+    balances: Dict[int, float] = {}
+    for chunk in _chunks(list(invoice_ids)):
+        balances.update(db.execute(
+            select(Invoice.id, func.coalesce(Invoice.balance_due, Invoice.total, 0.0)).where(Invoice.id.in_(chunk))
+        ).all())
+    return balances
+
+
+def check_allocations(db, payment_amount: float, allocations: Allocations,
+                      current: Optional[Allocations] = None) -> None:
+    """Raise ``ValueError`` unless ``allocations`` fit the payment and the invoice balances.
+
+    ``current`` holds the payment's existing allocations, which count as
+    available again to the same invoices.
+    """
+    current = current or {}
+    balances = _balances(db, allocations)
+    for invoice_id, amount in allocations.items():
+        if invoice_id not in balances:
+            raise ValueError(f'Invoice {invoice_id} not found')
+        if amount > balances[invoice_id] + current.get(invoice_id, 0.0) + PAYMENT_TOLERANCE:
+            raise ValueError(f'Allocation to invoice {invoice_id} exceeds its balance due')
+    if sum(allocations.values()) > payment_amount + PAYMENT_TOLERANCE:
+        raise ValueError('Allocations exceed the payment amount')
+
+
+def single_allocation(db, invoice_id: int, amount: float, current: Optional[Allocations] = None) -> Allocations:
+    """Apply as much of ``amount`` to one invoice as its balance due allows."""
+    balance = _balances(db, [invoice_id]).get(invoice_id)
+    if balance is None:
+        return {}
+    applied = round(min(amount, balance + (current or {}).get(invoice_id, 0.0)), 2)
+    return {invoice_id: applied} if applied > 0 else {}
+
+
+def set_allocations(db, payment_id: int, allocations: Allocations, current: Optional[Allocations] = None) -> None:
+    """Make a flushed payment's allocations match ``allocations``.
+
+    Only the differences are written, and only the invoices they touch are
+    refreshed. ``current`` skips reading the existing allocations again.
+    """
+    if current is None:
+        current = payment_allocations(db, payment_id)
+    table = PaymentAllocation.__table__
+    removed = [invoice_id for invoice_id in current if invoice_id not in allocations]
+    changed = [
+        {'allocated_invoice': invoice_id, 'new_amount': amount}
+        for invoice_id, amount in allocations.items()
+        if invoice_id in current and current[invoice_id] != amount
+    ]
+    now = datetime.datetime.utcnow().isoformat()
+    added = [
+        {'payment_id': payment_id, 'invoice_id': invoice_id, 'amount': amount, 'created_at': now}
+        for invoice_id, amount in allocations.items() if invoice_id not in current
+    ]
+    if removed:
+        db.execute(delete(table).where(table.c.payment_id == payment_id, table.c.invoice_id.in_(removed)))
+    if changed:
+        db.execute(
+            update(table)
+            .where(table.c.payment_id == payment_id, table.c.invoice_id == bindparam('allocated_invoice'))
+            .values(amount=bindparam('new_amount')),
+            changed,
+        )
+    if added:
+        db.execute(insert(table), added)
+    refresh_invoices(db, [*removed, *(row['allocated_invoice'] for row in changed), *(row['invoice_id'] for row in added)])
+
+
+def settled_status(status: Optional[str], total: Optional[float], balance_due: float) -> Optional[str]:
+    """The status an invoice should have once its balance is ``balance_due``."""
+    if status in PAYABLE_STATUSES and (total or 0.0) > 0 and balance_due <= PAYMENT_TOLERANCE:
+        return 'paid'
+    if status == 'paid' and balance_due > PAYMENT_TOLERANCE:
+        return 'sent'
+    return status
+
+
+def refresh_invoices(db, invoice_ids: Iterable[int]) -> None:
+    """Recompute paid amounts, balances and paid status of invoices from their allocations."""
+    ids = sorted(set(invoice_ids))
+    if not ids:
+        return
+    invoices = Invoice.__table__
+    allocations = PaymentAllocation.__table__
+    paid = (
+        select(func.coalesce(func.sum(allocations.c.amount), 0.0))
+        .where(allocations.c.invoice_id == invoices.c.id)
+        .scalar_subquery()
+    )
+    rows = []
+    for chunk in _chunks(ids):
+        db.execute(
+            update(invoices)
+            .where(invoices.c.id.in_(chunk))
+            .values(amount_paid=paid, balance_due=func.coalesce(invoices.c.total, 0.0) - paid)
+        )
+        rows.extend(db.execute(
+            select(
+                invoices.c.id, invoices.c.issue_date, invoices.c.created_at,
+                invoices.c.status, invoices.c.total, invoices.c.balance_due,
+            ).where(invoices.c.id.in_(chunk))
+        ).all())
+    if not rows:
+        return
+
+    seq = allocate_change_seqs(db, len(rows))
+    now = datetime.datetime.utcnow().isoformat()
+    params, changes = [], []
+    for offset, row in enumerate(rows):
+        status = settled_status(row.status, row.total, row.balance_due)
+        if status != row.status:
+            before = invoice_fact(row)
+            changes.append((before, (*before[:2], status or '', before[3])))
+        params.append({'invoice': row.id, 'new_status': status, 'seq': seq + offset, 'now': now})
+    db.execute(
+        update(invoices)
+        .where(invoices.c.id == bindparam('invoice'))
+        .values(status=bindparam('new_status'), change_seq=bindparam('seq'), updated_at=bindparam('now')),
+        params,
+    )
+    apply_changes(db, changes)
+    bump_versions(db, 'invoices')
+
+
+def release_invoice(db, invoice_id: int) -> None:
+    """Detach the payments of an invoice that is being deleted.
+
+    Its allocations are dropped and the affected payments get their
+    ``invoice_id`` recomputed from what is left: the invoice of their one
+    remaining allocation, otherwise none. Those payments are re-stamped for
+    sync.
+    """
+    allocations = PaymentAllocation.__table__
+    payments = Payment.__table__
+    payment_ids = sorted(set(db.scalars(
+        select(payments.c.id)
+        .outerjoin(allocations, allocations.c.payment_id == payments.c.id)
+        .where(or_(allocations.c.invoice_id == invoice_id, payments.c.invoice_id == invoice_id))
+    )))
+    if not payment_ids:
+        return
+    db.execute(delete(allocations).where(allocations.c.invoice_id == invoice_id))
+    sole_invoice = (
+        select(func.min(allocations.c.invoice_id))
+        .where(allocations.c.payment_id == payments.c.id)
+        .having(func.count() == 1)
+        .scalar_subquery()
+    )
+    seq = allocate_change_seqs(db, len(payment_ids))
+    now = datetime.datetime.utcnow().isoformat()
+    db.execute(
+        update(payments)
+        .where(payments.c.id == bindparam('payment'))
+        .values(
+            invoice_id=sole_invoice,
+            change_seq=bindparam('seq'),
+            updated_at=bindparam('now'),
+        ),
+        [{'payment': payment_id, 'seq': seq + offset, 'now': now} for offset, payment_id in enumerate(payment_ids)],
+    )
+    bump_versions(db, 'payments')
+
+
+def read_remittance_csv(lines: Iterable[str]) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Turn remittance CSV lines into numbered ``{"invoiceNumber", "amount"}`` rows.
+
+    Raises ``ValueError`` with a client-facing message if the header lacks
+    a required column.
+    """
+    reader = csv.DictReader(lines)
+    missing = [name for name in REMITTANCE_CSV_COLUMNS if name not in (reader.fieldnames or ())]
+    if missing:
+        raise ValueError(f"CSV is missing column(s): {', '.join(missing)}")
+    return ((reader.line_num, row) for row in reader)
+
+
+def apply_remittance(db, payment: Payment, lines: Iterable[Tuple[int, Any]]) -> Dict[str, Any]:
+    """Save a new payment allocated to the invoices listed on a remittance advice.
+
+    ``lines`` are numbered ``{"invoiceNumber", "amount"}`` rows. Invoices are
+    looked up with one IN query per chunk and the allocations written with
+    one executemany, followed by one balance refresh. Lines naming unknown
+    invoices, or more than an invoice's balance due, are reported and left
+    unapplied. Without an amount of its own the payment is the sum of the
+    lines. Nothing is saved when no line applies. Returns
+    ``{"applied", "failed", "errors"}``; the caller commits.
+    """
+    parsed, errors = [], []
+    for line, row in lines:
+        if not isinstance(row, dict):
+            errors.append({'line': line, 'invoiceNumber': None, 'error': 'Line must be an object'})
+            continue
+        number = str(row.get('invoiceNumber') or '').strip()
+        amount = parse_float(row.get('amount'), 0.0)
+        if not number or amount <= 0:
+            errors.append({'line': line, 'invoiceNumber': number or None,
+                           'error': 'Invoice number and a positive amount are required'})
+            continue
+        parsed.append((line, number, amount))
+
+    invoices: Dict[str, Tuple[int, float, int]] = {}
+    for chunk in _chunks(sorted({number for _, number, _ in parsed})):
+        for number, invoice_id, balance, customer_id in db.execute(
+            select(
+                Invoice.invoice_number, Invoice.id,
+                func.coalesce(Invoice.balance_due, Invoice.total, 0.0), Invoice.customer_id,
+            ).where(Invoice.invoice_number.in_(chunk))
+        ):
+            invoices[number] = (invoice_id, balance, customer_id)
+
+    if not payment.amount:
+        payment.amount = round(sum(amount for _, _, amount in parsed), 2)
+    unapplied = payment.amount
+    applied = 0
+    allocations: Allocations = {}
+    for line, number, amount in parsed:
+        if number not in invoices:
+            errors.append({'line': line, 'invoiceNumber': number, 'error': 'Invoice not found'})
+            continue
+        invoice_id, balance, _ = invoices[number]
+        if amount > balance - allocations.get(invoice_id, 0.0) + PAYMENT_TOLERANCE:
+            errors.append({'line': line, 'invoiceNumber': number, 'error': 'Amount exceeds the balance due'})
+            continue
+        if amount > unapplied + PAYMENT_TOLERANCE:
+            errors.append({'line': line, 'invoiceNumber': number, 'error': 'Amount exceeds the payment amount'})
+            continue
+        allocations[invoice_id] = allocations.get(invoice_id, 0.0) + amount
+        unapplied -= amount
+        applied += 1
+
+    errors.sort(key=lambda error: error['line'])
+    result = {'applied': applied, 'failed': len(errors), 'errors': errors}
+    if not allocations:
+        return result
+
+    customers = {customer_id for invoice_id, _, customer_id in invoices.values() if invoice_id in allocations}
+    if payment.customer_id is None and len(customers) == 1:
+        payment.customer_id = customers.pop()
+    payment.invoice_id = next(iter(allocations)) if len(allocations) == 1 else None
+    db.add(payment)
+    db.flush()
+    set_allocations(db, payment.id, allocations, current={})
+    return result
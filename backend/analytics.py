@@ -0,0 +1,293 @@
+"""Columnar in-memory snapshot of invoice, expense and payment facts.
+
+Each worker keeps one :class:`ReportEngine` (see :func:`get_report_engine`).
+Facts are held in compact ``array`` columns: dates as ordinals plus a
+``year * 12 + month - 1`` month index, and strings dictionary-encoded to
+integer codes. Group-bys and filters run over whole columns at once, using
+NumPy views of the same buffers when NumPy is installed and plain loops
+otherwise.
+
+``refresh`` is cheap when nothing changed (one version lookup). Otherwise it
+re-reads only rows whose ``updated_at`` moved past the last watermark, and
+falls back to a full reload when a row-count/id checksum shows deletions.
+Refreshes and group-bys share one lock, so a query never reads a store that
+is half way through a reload.
+"""
+import datetime
+import threading
+from array import array
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func
+
+from cache import get_versions
+from models import Invoice, Expense, Payment
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover - optional dependency
+    numpy = None
+
+# Rows updated up to this long before the watermark are re-read on refresh to
+# cover transactions that committed after a later timestamp was observed.
+REFRESH_OVERLAP = datetime.timedelta(seconds=60)
+
+INT, FLOAT, DATE, CATEGORY = 'int', 'float', 'date', 'category'
+
+
+def month_index(year: int, month: int) -> int:
+    """Encode a calendar month as a single integer."""
+    return year * 12 + month - 1
+
+
+def month_from_index(index: int) -> Tuple[int, int]:
+    """Decode :func:`month_index` back to ``(year, month)``."""
+    return index // 12, index % 12 + 1
+
+
+class ColumnStore:
+    """Column-oriented storage for the facts of one table."""
+
+    def __init__(self, model, columns: Sequence[Tuple[str, str]]):
+        self.model = model
+        self.spec = list(columns)
+        self.reset()
+
+    def reset(self) -> None:
+        self.ids = array('q')
+        self.positions: Dict[int, int] = {}
+        self.columns: Dict[str, array] = {}
+        self.categories: Dict[str, List[Optional[str]]] = {}
+        self._codes: Dict[str, Dict[Optional[str], int]] = {}
+        for name, kind in self.spec:
+            if kind == FLOAT:
+                self.columns[name] = array('d')
+            elif kind == DATE:
+                self.columns[name] = array('l')
+                self.columns[f'{name}__month'] = array('l')
+            else:
+                self.columns[name] = array('l')
+            if kind == CATEGORY:
+                self.categories[name] = []
+                self._codes[name] = {}
+
+    # -- Loading ---------------------------------------------------------------------------
+    def _encode(self, name: str, kind: str, value):
+        if kind == FLOAT:
+            return float(value or 0.0)
+        if kind == INT:
+            return int(value) if value is not None else 0
+        if kind == CATEGORY:
+            codes = self._codes[name]
+            if value not in codes:
+                codes[value] = len(self.categories[name])
+                self.categories[name].append(value)
+            return codes[value]
+        return value.toordinal() if value else 0
+
+    def upsert(self, row) -> None:
+        """Insert or overwrite the facts of one row (``id`` first, then the spec)."""
+        row_id = row[0]
+        position = self.positions.get(row_id)
+        if position is None:
+            position = len(self.ids)
+            self.positions[row_id] = position
+            self.ids.append(row_id)
+            for name, kind in self.spec:
+                self.columns[name].append(0)
+                if kind == DATE:
+                    self.columns[f'{name}__month'].append(-1)
+        for (name, kind), value in zip(self.spec, row[1:]):
+            self.columns[name][position] = self._encode(name, kind, value)
+            if kind == DATE:
+                self.columns[f'{name}__month'][position] = (
+                    month_index(value.year, value.month) if value else -1
+                )
+
+    @property
+    def live_count(self) -> int:
+        return len(self.positions)
+
+    @property
+    def id_checksum(self) -> int:
+        return sum(self.positions)
+
+    # -- Queries ---------------------------------------------------------------------------
+    def _code_values(self, name: str, values) -> List[int]:
+        codes = self._codes.get(name)
+        if codes is None:
+            return list(values)
+        return [codes[value] for value in values if value in codes]
+
+    def group_sum(self, value: str, by: Sequence[str], equals=None, between=None) -> Dict[tuple, float]:
+        """Sum ``value`` grouped by ``by`` columns.
+
+        ``equals`` maps columns to an allowed value or collection of values.
+        ``between`` maps date columns to inclusive ``(start, end)`` dates. Date
+        columns can be grouped by month as ``'<column>__month'``; those keys are
+        returned as ``(year, month)`` pairs and category keys are decoded.
+        """
+        equals = {
+            name: self._code_values(name, allowed if isinstance(allowed, (list, tuple, set)) else [allowed])
+            for name, allowed in (equals or {}).items()
+        }
+        between = {
+            name: (start.toordinal(), end.toordinal())
+            for name, (start, end) in (between or {}).items()
+        }
+        if numpy is not None and len(self.ids):
+            groups = self._group_sum_numpy(value, by, equals, between)
+        else:
+            groups = self._group_sum_python(value, by, equals, between)
+        return {self._decode_key(by, key): total for key, total in groups.items()}
+
+    def _group_sum_python(self, value, by, equals, between):
+        columns = [self.columns[name] for name in by]
+        filters = [(self.columns[name], set(allowed)) for name, allowed in equals.items()]
+        ranges = [(self.columns[name], low, high) for name, (low, high) in between.items()]
+        values = self.columns[value]
+        groups: Dict[tuple, float] = {}
+        for position in range(len(self.ids)):
+            if any(column[position] not in allowed for column, allowed in filters):
+                continue
+            if any(not low <= column[position] <= high for column, low, high in ranges):
+                continue
+            key = tuple(column[position] for column in columns)
+            groups[key] = groups.get(key, 0.0) + values[position]
+        return groups
+
+    def _group_sum_numpy(self, value, by, equals, between):
+        view = lambda name: numpy.frombuffer(self.columns[name], dtype=self.columns[name].typecode)
+        mask = numpy.ones(len(self.ids), dtype=bool)
+        for name, allowed in equals.items():
+            mask &= numpy.isin(view(name), allowed)
+        for name, (low, high) in between.items():
+            column = view(name)
+            mask &= (column >= low) & (column <= high)
+        values = view(value)[mask]
+        if not by:
+            return {(): float(values.sum())} if values.size else {}
+        keys = numpy.stack([view(name)[mask].astype(numpy.int64) for name in by], axis=1)
+        unique, inverse = numpy.unique(keys, axis=0, return_inverse=True)
+        totals = numpy.bincount(inverse.ravel(), weights=values, minlength=len(unique))
+        return {tuple(int(part) for part in key): float(total) for key, total in zip(unique, totals)}
+
+    def _decode_key(self, by, key):
+        decoded = []
+        for name, part in zip(by, key):
+            if name.endswith('__month'):
+                decoded.append(month_from_index(part) if part >= 0 else None)
+            elif name in self.categories:
+                decoded.append(self.categories[name][part])
+            else:
+                decoded.append(part)
+        return tuple(decoded)
+
+
+class ReportEngine:
+    """Warm, incrementally refreshed snapshot shared by report endpoints."""
+
+    TABLES = {
+        'invoices': (Invoice, (
+            ('status', CATEGORY),
+            ('issue_date', DATE),
+            ('due_date', DATE),
+            ('customer_id', INT),
+            ('subtotal', FLOAT),
+            ('tax_rate', FLOAT),
+            ('tax_total', FLOAT),
+            ('total', FLOAT),
+        )),
+        'expenses': (Expense, (
+            ('date', DATE),
+            ('type', CATEGORY),
+            ('tag', CATEGORY),
+            ('vendor_id', INT),
+            ('amount', FLOAT),
+        )),
+        'payments': (Payment, (
+            ('date', DATE),
+            ('invoice_id', INT),
+            ('customer_id', INT),
+            ('amount', FLOAT),
+        )),
+    }
+
+    def __init__(self):
+        self.stores = {name: ColumnStore(model, spec) for name, (model, spec) in self.TABLES.items()}
+        self._versions: Dict[str, Tuple[int, Optional[str]]] = {}
+        self._watermarks: Dict[str, Optional[str]] = {}
+        self._lock = threading.Lock()
+
+    def group_sum(self, table: str, value: str, by: Sequence[str], equals=None, between=None) -> Dict[tuple, float]:
+        """:meth:`ColumnStore.group_sum` on ``table``, under the engine lock.
+
+        A concurrent :meth:`refresh` resets and appends to the same arrays, so
+        reading them unlocked could see ``ids`` longer than the columns, and
+        NumPy views would make those appends raise ``BufferError``.
+        """
+        with self._lock:
+            return self.stores[table].group_sum(value, by, equals=equals, between=between)
+
+    def refresh(self, db) -> 'ReportEngine':
+        """Bring the snapshot up to date with the database."""
+        with self._lock:
+            versions = get_versions(db, *self.stores)
+            for name, store in self.stores.items():
+                if name in self._versions and self._versions[name] == versions[name]:
+                    continue
+                if name in self._versions:
+                    self._load(db, store, name, since=self._watermarks.get(name))
+                    if self._checksum(db, store) != (store.live_count, store.id_checksum):
+                        self._load(db, store, name)
+                else:
+                    self._load(db, store, name)
+                self._versions[name] = versions[name]
+            return self
+
+    def _query(self, db, store):
+        model = store.model
+        return db.query(
+            model.id,
+            *(getattr(model, name) for name, _ in store.spec),
+            model.updated_at,
+        )
+
+    def _load(self, db, store, name, since=None, batch_size=1000):
+        query = self._query(db, store)
+        if since is None:
+            store.reset()
+        else:
+            query = query.filter(store.model.updated_at >= _rewind(since))
+        watermark = None if since is None else since
+        for row in query.yield_per(batch_size):
+            store.upsert(row[:-1])
+            updated_at = row[-1]
+            if updated_at and (watermark is None or updated_at > watermark):
+                watermark = updated_at
+        self._watermarks[name] = watermark
+
+    def _checksum(self, db, store):
+        count, id_sum = db.query(func.count(store.model.id), func.sum(store.model.id)).one()
+        return count or 0, id_sum or 0
+
+
+def _rewind(watermark: str) -> str:
+    """Move an ISO watermark back by :data:`REFRESH_OVERLAP`."""
+    try:
+        return (datetime.datetime.fromisoformat(watermark) - REFRESH_OVERLAP).isoformat()
+    except ValueError:
+        return watermark
+
+
+_engine: Optional[ReportEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_report_engine(db) -> ReportEngine:
+    """Return this worker's engine, refreshed against ``db``."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = ReportEngine()
+    return _engine.refresh(db)
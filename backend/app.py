@@ -12,11 +12,18 @@ from routes import (
     company_bp,
     settings_bp,
     dashboard_bp,
+    reports_bp,
+    search_bp,
+    sync_bp,
+    batch_bp,
 )
 
 
 import os
 from config import config
+from json_provider import FastJSONProvider
+from query_stats import install_query_stats
+from search import install_search
 
 def create_app(config_name=None):
     """Create and configure the Flask application."""
@@ -25,11 +32,14 @@ def create_app(config_name=None):
 
     app = Flask(__name__)
     app.config.from_object(config[config_name])
+    app.json = FastJSONProvider(app)
     CORS(app)
+    install_query_stats(app, engine)
 
     # Initialize migrations (variable not used but needed for Flask-Migrate)
     Migrate(app, database_manager)
     database_manager.create_all()
+    install_search(engine)
 
     # Register blueprints
     app.register_blueprint(health_bp)
@@ -41,6 +51,10 @@ def create_app(config_name=None):
     app.register_blueprint(company_bp)
     app.register_blueprint(settings_bp)
     app.register_blueprint(dashboard_bp)
+    app.register_blueprint(reports_bp)
+    app.register_blueprint(search_bp)
+    app.register_blueprint(sync_bp)
+    app.register_blueprint(batch_bp)
 
     @app.teardown_appcontext
     def shutdown_session(exception=None):
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""Compare ORM and Core reads for the customer and vendor list endpoints.
+
+Times loading every row and serializing it to a response dict, once through
+mapped instances (``db.query(Model)``) and once through the Core ``select()``
+the list endpoints use, against the configured database (``DATABASE_URL``).
+Seed a realistic amount of data first, e.g. with ``seed_data.py``.
+
+    python benchmark_core_reads.py [repeat]
+"""
+import sys
+
+from sqlalchemy import select
+
+from benchmark_json import best_of
+from fieldsets import records, select_columns, serialize
+from models import SessionLocal, Customer, Vendor
+from pagination import sort_query
+from routes.customers import CUSTOMER_FIELDS, CUSTOMER_ROW_SORT
+from routes.vendors import VENDOR_FIELDS, VENDOR_ROW_SORT
+
+LISTS = (
+    ('customers', Customer, CUSTOMER_FIELDS, CUSTOMER_ROW_SORT),
+    ('vendors', Vendor, VENDOR_FIELDS, VENDOR_ROW_SORT),
+)
+
+
+def read_orm(model, table):
+    db = SessionLocal()
+    try:
+        return [serialize(obj, table) for obj in db.query(model).order_by(model.id)]
+    finally:
+        SessionLocal.remove()
+
+
+def read_core(model, table, keys):
+    db = SessionLocal()
+    try:
+        statement = sort_query(select(*select_columns(table, None, [model.id])), keys)
+        return [serialize(row, table) for row in records(db.execute(statement))]
+    finally:
+        SessionLocal.remove()
+
+
+def main():
+    """Print total and per-row timings for both read paths."""
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    print(f"{'list':<10} {'rows':>7} {'path':<5} {'total ms':>9} {'us/row':>8}")
+    for name, model, table, keys in LISTS:
+        rows = len(read_core(model, table, keys))
+        if read_orm(model, table) != read_core(model, table, keys):
+            print(f"{name}: ORM and Core responses differ")
+        for path, func in (
+            ('orm', lambda: read_orm(model, table)),
+            ('core', lambda: read_core(model, table, keys)),
+        ):
+            total_ms = best_of(repeat, func)
+            per_row = total_ms * 1000 / rows if rows else 0.0
+            print(f"{name:<10} {rows:>7} {path:<5} {total_ms:>9.1f} {per_row:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
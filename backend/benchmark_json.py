@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""Compare JSON encoding with and without orjson on the list endpoints.
+
+Times ``GET`` requests against the configured database (``DATABASE_URL``) with
+the app's JSON provider forced onto the standard library encoder and then
+with orjson, and also times encoding alone on the endpoint payloads. Seed a
+realistic amount of data first, e.g. with ``seed_data.py``.
+
+    python benchmark_json.py [repeat]
+"""
+import json
+import sys
+import time
+
+from app import app
+from json_provider import FastJSONProvider, orjson
+
+ENDPOINTS = ('/api/invoices', '/api/expenses', '/api/payments', '/api/customers', '/api/vendors')
+
+
+class StdlibJSONProvider(FastJSONProvider):
+    """The same provider with the orjson fast path disabled."""
+
+    def _orjson_option(self, kwargs):
+        return None
+
+
+def best_of(repeat, func):
+    """Return the fastest of ``repeat`` runs of ``func`` in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings)
+
+
+def main():
+    """Print request and encode timings for each list endpoint."""
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    if orjson is None:
+        print("orjson is not installed; only the stdlib encoder can be measured.")
+
+    providers = [('stdlib', StdlibJSONProvider(app))]
+    if orjson is not None:
+        providers.append(('orjson', FastJSONProvider(app)))
+
+    client = app.test_client()
+    print(f"{'endpoint':<16} {'rows':>7} {'encoder':<8} {'request ms':>11} {'encode ms':>10}")
+    for path in ENDPOINTS:
+        payload = json.loads(client.get(path).get_data())
+        for name, provider in providers:
+            app.json = provider
+            request_ms = best_of(repeat, lambda: client.get(path).get_data())
+            encode_ms = best_of(repeat, lambda: provider.dumps(payload))
+            print(f"{path:<16} {len(payload):>7} {name:<8} {request_ms:>11.1f} {encode_ms:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""Write-version tracking and bounded response caching.
+
+Every write route calls :func:`bump_versions` for the tables it touches
+before committing. Because the counters live in the database, all workers
+agree on them, so a key built from :func:`get_versions` is invalidated
+everywhere as soon as the write commits. :func:`conditional` uses the same
+counters to answer conditional GETs before a view touches its tables.
+"""
+import datetime
+import functools
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from flask import make_response, request
+from werkzeug.http import is_resource_modified
+
+from models import SessionLocal, TableVersion
+
+
+def bump_versions(db, *tables: str) -> None:
+    """Increment the write version of each table in the current transaction."""
+    now = datetime.datetime.utcnow().isoformat()
+    for name in tables:
+        updated = (
+            db.query(TableVersion)
+            .filter(TableVersion.name == name)
+            .update(
+                {TableVersion.version: TableVersion.version + 1, TableVersion.updated_at: now},
+                synchronize_session=False,
+            )
+        )
+        if not updated:
+            db.add(TableVersion(name=name, version=1, updated_at=now))
+            db.flush()
+
+
+def get_versions(db, *tables: str) -> Dict[str, Tuple[int, Optional[str]]]:
+    """Return ``{table: (version, updated_at)}`` for the given tables."""
+    rows = (
+        db.query(TableVersion.name, TableVersion.version, TableVersion.updated_at)
+        .filter(TableVersion.name.in_(tables))
+        .all()
+    )
+    versions = {name: (0, None) for name in tables}
+    for name, version, updated_at in rows:
+        versions[name] = (version, updated_at)
+    return versions
+
+
+def make_etag(*parts: Any) -> str:
+    """Build a stable ETag value from hashable parts."""
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+
+def last_modified(versions: Dict[str, Tuple[int, Optional[str]]]) -> Optional[datetime.datetime]:
+    """Latest write time across ``versions``, as an aware UTC datetime."""
+    stamps = [updated_at for _, updated_at in versions.values() if updated_at]
+    if not stamps:
+        return None
+    return datetime.datetime.fromisoformat(max(stamps)).replace(tzinfo=datetime.timezone.utc)
+
+
+def conditional(*tables: str):
+    """Serve ``ETag``/``Last-Modified`` for a GET view that reads ``tables``.
+
+    The validators come from the write versions of ``tables`` plus the
+    request path, query string and ``Accept`` header, so a matching
+    ``If-None-Match`` or ``If-Modified-Since`` is answered with 304 after a
+    single version lookup, without running the view.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            versions = get_versions(SessionLocal(), *tables)
+            etag = make_etag(
+                request.path,
+                sorted(request.args.items(multi=True)),
+                request.headers.get('Accept', ''),
+                sorted(versions.items()),
+            )
+            modified = last_modified(versions)
+
+            if not is_resource_modified(request.environ, etag=etag, last_modified=modified):
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            if modified is not None:
+                response.last_modified = modified
+            # Browsers must revalidate instead of reusing the response heuristically.
+            response.cache_control.no_cache = True
+            response.vary.add('Accept')
+            return response
+        return wrapper
+    return decorator
+
+
+class ResponseCache:
+    """Thread-safe LRU cache holding at most ``maxsize`` entries."""
+
+    def __init__(self, maxsize: int = 32):
+        self.maxsize = maxsize
+        self._entries: 'OrderedDict[Hashable, Any]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
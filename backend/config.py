@@ -6,6 +6,10 @@ class Config:
     DEBUG = False
     TESTING = False
     PORT = int(os.environ.get('PORT', 5000))
+    # 'sql' aggregates reports in the database, 'columnar' uses the in-memory engine
+    REPORT_ENGINE = os.environ.get('REPORT_ENGINE', 'sql')
+    # Days after a period ends before its sales tax figures are frozen
+    TAX_FILING_GRACE_DAYS = int(os.environ.get('TAX_FILING_GRACE_DAYS', 30))
 
 class DevelopmentConfig(Config):
     """Development configuration."""
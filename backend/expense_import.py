@@ -0,0 +1,249 @@
+"""Streaming import of bank statement CSV files as expenses.
+
+Lines are read lazily and inserted in bounded batches, each with one
+executemany and its own commit, so memory use does not depend on the size
+of the file. Vendors are matched by name against a map loaded once per
+import. Like the bulk invoice import, every batch assigns change sequence
+numbers, updates the rollups and bumps the expenses table version itself.
+
+Bank exports usually list money going out as negative amounts; rows on the
+other side of ``sign`` are deposits and are skipped. Exports with separate
+Debit and Credit columns are read from the debit column, where every value
+is an expense and blank cells are deposits.
+"""
+import csv
+import datetime
+import re
+from types import SimpleNamespace
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from cache import bump_versions
+from models import Expense, Vendor, allocate_change_seqs
+from rollups import apply_inserts, expense_fact
+from utils import parse_iso_date
+
+IMPORT_BATCH_SIZE = 2000
+MAX_REPORTED_ERRORS = 100
+DEFAULT_EXPENSE_TYPE = 'other'
+SIGNS = ('negative', 'positive')
+
+# Expense inputs and the CSV headers recognised for them, compared case-insensitively.
+COLUMN_SYNONYMS = {
+    'date': ('date', 'transaction date', 'posted date', 'posting date', 'booking date', 'value date'),
+    'amount': ('amount', 'debit', 'withdrawal', 'value'),
+    'description': ('description', 'details', 'memo', 'narrative', 'transaction description'),
+    'vendor': ('vendor', 'payee', 'merchant', 'counterparty', 'name'),
+    'reference': ('reference', 'ref', 'reference number', 'transaction id', 'check number'),
+    # Not 'type': in bank exports that is the transaction kind (debit, card, ...).
+    'type': ('category', 'expense type'),
+}
+REQUIRED_COLUMNS = ('date', 'amount')
+# Amount headers that only list money going out, whatever the sign.
+DEBIT_COLUMNS = ('debit', 'withdrawal')
+
+
+def _normalize_name(value: Optional[str]) -> str:
+    return ' '.join((value or '').split()).casefold()
+
+
+def load_vendor_map(db) -> Dict[str, int]:
+    """Map normalized vendor company and contact names to vendor ids."""
+    vendors: Dict[str, int] = {}
+    rows = db.execute(select(Vendor.id, Vendor.company, Vendor.contact_name).order_by(Vendor.id)).all()
+    # Contact names first so that company names win when both match.
+    for vendor_id, _, contact_name in rows:
+        if contact_name:
+            vendors.setdefault(_normalize_name(contact_name), vendor_id)
+    for vendor_id, company, _ in rows:
+        if company:
+            vendors[_normalize_name(company)] = vendor_id
+    return vendors
+
+
+def resolve_columns(fieldnames: Optional[List[str]], overrides: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """Map expense inputs to the CSV headers that hold them.
+
+    ``overrides`` names headers explicitly; the rest are recognised from
+    :data:`COLUMN_SYNONYMS`. Raises ``ValueError`` with a client-facing
+    message when a named or required column is missing.
+    """
+    headers = {_normalize_name(name): name for name in fieldnames or ()}
+    columns = {}
+    for field, synonyms in COLUMN_SYNONYMS.items():
+        wanted = (overrides or {}).get(field)
+        if wanted:
+            if _normalize_name(wanted) not in headers:
+                raise ValueError(f"CSV has no column named '{wanted}'")
+            columns[field] = headers[_normalize_name(wanted)]
+            continue
+        for synonym in synonyms:
+            if synonym in headers:
+                columns[field] = headers[synonym]
+                break
+    missing = [field for field in REQUIRED_COLUMNS if field not in columns]
+    if missing:
+        raise ValueError(f"CSV needs a column for: {', '.join(missing)}")
+    return columns
+
+
+def parse_amount(value: Optional[str]) -> Optional[float]:
+    """Parse bank amount text such as ``-1,234.50``, ``$12.00`` or ``(45.10)``."""
+    text = (value or '').strip()
+    if not text:
+        return None
+    negative = text.startswith('(') and text.endswith(')')
+    cleaned = re.sub(r'[^0-9.\-]', '', text)
+    try:
+        amount = float(cleaned)
+    except ValueError:
+        return None
+    return -abs(amount) if negative else amount
+
+
+def _parse_date(value: Optional[str], date_format: Optional[str]):
+    text = (value or '').strip()
+    if date_format:
+        try:
+            return datetime.datetime.strptime(text, date_format).date()
+        except ValueError:
+            return None
+    return parse_iso_date(text)
+
+
+class _Progress:
+    def __init__(self):
+        self.lines = 0
+        self.imported = 0
+        self.skipped = 0
+        self.failed = 0
+        self.errors: List[Dict[str, Any]] = []
+        self.error: Optional[str] = None
+
+    def fail(self, line: int, message: str) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'error': message})
+
+    def report(self, done: bool) -> Dict[str, Any]:
+        report = {
+            'lines': self.lines,
+            'imported': self.imported,
+            'skipped': self.skipped,
+            'failed': self.failed,
+            'errors': list(self.errors),
+            'done': done,
+        }
+        if self.error is not None:
+            report['error'] = self.error
+        return report
+
+
+def _write_batch(db, batch: List[Dict[str, Any]]) -> None:
+    seq = allocate_change_seqs(db, len(batch))
+    for offset, row in enumerate(batch):
+        row['change_seq'] = seq + offset
+    db.execute(insert(Expense.__table__), batch)
+    apply_inserts(db, (expense_fact(SimpleNamespace(**row)) for row in batch))
+    bump_versions(db, 'expenses')
+    db.commit()
+
+
+def import_bank_csv(db, lines: Iterable[str], columns: Optional[Dict[str, str]] = None,
+                    sign: str = 'negative', default_type: str = DEFAULT_EXPENSE_TYPE,
+                    payment_method: Optional[str] = None, date_format: Optional[str] = None,
+                    batch_size: int = IMPORT_BATCH_SIZE) -> Iterator[Dict[str, Any]]:
+    """Import expenses from bank CSV ``lines``, yielding progress after each batch.
+
+    ``columns`` overrides the header used for any of the inputs in
+    :data:`COLUMN_SYNONYMS`. The last report has ``done`` set; at most
+    :data:`MAX_REPORTED_ERRORS` failed lines are listed. If the file cannot
+    be read to the end, the lines read so far are still imported and the
+    last report carries an ``error``. Raises ``ValueError`` with a
+    client-facing message on unusable arguments or headers, before anything
+    is written.
+    """
+    if sign not in SIGNS:
+        raise ValueError(f"sign must be one of {', '.join(SIGNS)}")
+    reader = csv.DictReader(lines)
+    mapping = resolve_columns(reader.fieldnames, columns)
+    vendors = load_vendor_map(db)
+    return _import_rows(db, reader, mapping, vendors, sign, default_type, payment_method, date_format, batch_size)
+
+
+def _read_rows(reader, progress):
+    # A line that cannot be decoded or parsed ends the import, keeping what came before.
+    try:
+        yield from reader
+    except (ValueError, csv.Error) as exc:
+        progress.error = f'File could not be read to the end: {exc}'
+
+
+def _import_rows(db, reader, mapping, vendors, sign, default_type, payment_method, date_format, batch_size):
+    progress = _Progress()
+    batch: List[Dict[str, Any]] = []
+    lines: List[int] = []
+    now = datetime.datetime.utcnow().isoformat()
+
+    def field(row, name):
+        column = mapping.get(name)
+        return (row.get(column) or '').strip() if column else ''
+
+    debits = _normalize_name(mapping['amount']) in DEBIT_COLUMNS
+    for row in _read_rows(reader, progress):
+        progress.lines += 1
+        text = field(row, 'amount')
+        if debits and not text:
+            progress.skipped += 1
+            continue
+        amount = parse_amount(text)
+        if amount is None:
+            progress.fail(reader.line_num, 'Amount is missing or not a number')
+            continue
+        if amount == 0 or (not debits and (amount < 0) != (sign == 'negative')):
+            progress.skipped += 1
+            continue
+        date = _parse_date(field(row, 'date'), date_format)
+        if date is None:
+            progress.fail(reader.line_num, 'Date is missing or not in the expected format')
+            continue
+
+        vendor_name = field(row, 'vendor')
+        description = field(row, 'description') or vendor_name
+        batch.append({
+            'type': field(row, 'type') or default_type,
+            'amount': abs(amount),
+            'date': date,
+            'payment_method': payment_method,
+            'reference_number': field(row, 'reference')[:100] or None,
+            'description': description[:500] or None,
+            'tax_deductible': False,
+            'tag': None,
+            'vendor_id': vendors.get(_normalize_name(vendor_name)) if vendor_name else None,
+            'customer_id': None,
+            'created_at': now,
+            'updated_at': now,
+        })
+        lines.append(reader.line_num)
+
+        if len(batch) >= batch_size:
+            _flush(db, batch, lines, progress)
+            batch, lines = [], []
+            yield progress.report(False)
+
+    if batch:
+        _flush(db, batch, lines, progress)
+    yield progress.report(True)
+
+
+def _flush(db, batch, lines, progress) -> None:
+    try:
+        _write_batch(db, batch)
+    except SQLAlchemyError:
+        db.rollback()
+        for line in lines:
+            progress.fail(line, 'Failed to save expense')
+    else:
+        progress.imported += len(batch)
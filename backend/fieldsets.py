@@ -0,0 +1,107 @@
+"""Sparse fieldsets (``?fields=a,b``) for list endpoints.
+
+Serializers are declared as tables mapping response keys to :class:`Field`
+entries, each naming the mapped attributes it reads. A requested subset of
+the table is turned into ``load_only``/``noload`` options by
+:func:`load_options`, so columns the client did not ask for are never
+selected and relationships it did not ask for are never joined.
+
+Tables whose fields read plain columns only can also be served without the
+ORM: :func:`select_columns` gives Core columns labelled with the attribute
+names, so the same getters work on the selected rows.
+"""
+from collections import namedtuple
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import joinedload, load_only, noload, selectinload
+
+
+class Field(NamedTuple):
+    get: Callable[[Any], Any]
+    attributes: Sequence[Any] = ()
+
+
+def parse_fields(args, table: Dict[str, Field]) -> Optional[List[str]]:
+    """Read ``fields`` from request args; None means every field.
+
+    Raises ``ValueError`` with a client-facing message on unknown names.
+    """
+    raw = args.get('fields')
+    if raw is None:
+        return None
+    names = list(dict.fromkeys(name.strip() for name in raw.split(',') if name.strip()))
+    if not names:
+        raise ValueError('fields must name at least one field')
+    unknown = [name for name in names if name not in table]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+    return names
+
+
+def load_options(model, table: Dict[str, Field], fields: Iterable[str], required: Iterable[Any] = ()) -> list:
+    """Loader options that fetch only what ``fields`` read.
+
+    ``required`` lists extra columns the caller needs, such as sort keys.
+    Requested relationships are eager-loaded (collections with a separate
+    IN query, so the options are safe with ``yield_per``); all others are
+    not loaded at all.
+    """
+    mapper = inspect(model)
+    columns, requested = [], set()
+    for name in fields:
+        for attribute in table[name].attributes:
+            if attribute.key in mapper.relationships:
+                requested.add(attribute.key)
+            else:
+                columns.append(attribute)
+    columns.extend(required)
+
+    options = [load_only(*dict.fromkeys(columns))]
+    for key, relationship in mapper.relationships.items():
+        attribute = getattr(model, key)
+        if key not in requested:
+            options.append(noload(attribute))
+        elif relationship.uselist:
+            options.append(selectinload(attribute))
+        else:
+            options.append(joinedload(attribute))
+    return options
+
+
+def table_column(attribute):
+    """The Core ``Table`` column behind a mapped column attribute."""
+    return attribute.property.columns[0]
+
+
+def select_columns(table: Dict[str, Field], fields: Optional[Iterable[str]] = None,
+                   required: Iterable[Any] = ()) -> list:
+    """Core columns read by ``fields`` of ``table``, each labelled with its attribute name.
+
+    Rows of a ``select()`` over them are plain tuples that skip instance
+    hydration and the identity map but still serialize with ``table``.
+    ``required`` lists extra attributes the caller needs, such as sort keys.
+    """
+    attributes = [
+        attribute
+        for name in (table if fields is None else fields)
+        for attribute in table[name].attributes
+    ]
+    attributes.extend(required)
+    return [table_column(attribute).label(attribute.key) for attribute in dict.fromkeys(attributes)]
+
+
+def records(result) -> Iterator[Any]:
+    """Iterate a Core result as namedtuples.
+
+    ``Row`` resolves attribute names through its key map on every access,
+    which costs more than the rest of serialization; namedtuple attributes
+    are plain index lookups.
+    """
+    record = namedtuple('Record', result.keys())._make
+    return map(record, result)
+
+
+def serialize(obj, table: Dict[str, Field], fields: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    """Build the response dict for ``obj`` from the ``fields`` of ``table``."""
+    return {name: table[name].get(obj) for name in (table if fields is None else fields)}
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""Import expenses from a bank statement CSV file.
+
+The file is read line by line and written in batches, with a progress line
+after each batch, so exports of any length can be loaded into the
+configured database (``DATABASE_URL``):
+
+    python import_expenses.py statement.csv [--sign positive] [--date-format %d/%m/%Y]
+"""
+import argparse
+
+from database import SessionLocal
+from expense_import import COLUMN_SYNONYMS, DEFAULT_EXPENSE_TYPE, IMPORT_BATCH_SIZE, SIGNS, import_bank_csv
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Import expenses from a bank statement CSV file.')
+    parser.add_argument('path', help='CSV file with a header line')
+    for field in COLUMN_SYNONYMS:
+        parser.add_argument(f'--{field}-column', help=f'header of the {field} column')
+    parser.add_argument('--sign', choices=SIGNS, default='negative',
+                        help='sign of the amounts to import as expenses (default: negative)')
+    parser.add_argument('--default-type', default=DEFAULT_EXPENSE_TYPE,
+                        help=f'expense type for rows without one (default: {DEFAULT_EXPENSE_TYPE})')
+    parser.add_argument('--payment-method', help='payment method to record on every expense')
+    parser.add_argument('--date-format', help='strptime format of the dates (default: ISO 8601)')
+    parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+    return parser.parse_args()
+
+
+def main():
+    """Import the file, printing progress after every batch."""
+    args = parse_args()
+    columns = {
+        field: getattr(args, f'{field}_column')
+        for field in COLUMN_SYNONYMS if getattr(args, f'{field}_column')
+    }
+    session = SessionLocal()
+    try:
+        with open(args.path, newline='', encoding='utf-8-sig') as lines:
+            report = None
+            for report in import_bank_csv(
+                session, lines, columns=columns, sign=args.sign, default_type=args.default_type,
+                payment_method=args.payment_method, date_format=args.date_format,
+                batch_size=args.batch_size,
+            ):
+                print(f"{report['lines']} lines read: {report['imported']} imported, "
+                      f"{report['skipped']} skipped, {report['failed']} failed")
+        if 'error' in report:
+            print(f"Stopped early: {report['error']}")
+        for error in report['errors']:
+            print(f"  line {error['line']}: {error['error']}")
+        if report['failed'] > len(report['errors']):
+            print(f"  ... and {report['failed'] - len(report['errors'])} more")
+    except ValueError as e:
+        print(f"Error importing expenses: {e}")
+        session.rollback()
+        raise SystemExit(1)
+    finally:
+        session.close()
+
+
+if __name__ == '__main__':
+    main()
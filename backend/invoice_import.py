@@ -0,0 +1,182 @@
+"""Bulk invoice import.
+
+Invoices are validated and written in chunks. Each chunk checks invoice
+numbers and customers with one query each, inserts its invoices with one
+executemany, reads their ids back by number, inserts their line items with
+another executemany, updates the rollups once per bucket and commits. Rows
+that fail validation are reported and skipped; a chunk that fails to save
+is rolled back and reported without affecting the others.
+
+Every write path other than the ORM has to maintain the derived data
+itself: rows get explicit change sequence numbers, the invoice table
+version is bumped, and the search index follows through its triggers.
+"""
+import csv
+import datetime
+from types import SimpleNamespace
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from cache import bump_versions
+from models import Customer, Invoice, InvoiceItem, allocate_change_seqs
+from rollups import apply_inserts, invoice_fact
+from utils import parse_invoice_payload
+
+IMPORT_CHUNK_SIZE = 1000
+
+INVOICE_CSV_COLUMNS = (
+    'invoiceNumber', 'customerId', 'status', 'issueDate', 'dueDate',
+    'paymentTerms', 'notes', 'terms', 'taxRate', 'discountTotal',
+)
+ITEM_CSV_COLUMNS = ('description', 'quantity', 'rate')
+
+# (row number in the upload, invoice payload as accepted by POST /api/invoices)
+NumberedPayload = Tuple[int, Any]
+
+
+def read_invoice_csv(lines: Iterable[str]) -> Iterator[NumberedPayload]:
+    """Turn CSV lines into invoice payloads, reading lazily.
+
+    Each line holds one line item (``description``, ``quantity``, ``rate``);
+    adjacent lines with the same ``invoiceNumber`` form one invoice, whose
+    other columns are taken from its first line. Payloads are numbered with
+    that line's number. Raises ``ValueError`` with a client-facing message
+    if the header lacks required columns.
+    """
+    reader = csv.DictReader(lines)
+    missing = [name for name in ('invoiceNumber', 'customerId') if name not in (reader.fieldnames or ())]
+    if missing:
+        raise ValueError(f"CSV is missing column(s): {', '.join(missing)}")
+    return _group_csv_rows(reader)
+
+
+def _group_csv_rows(reader) -> Iterator[NumberedPayload]:
+    current, line = None, None
+    for row in reader:
+        number = (row.get('invoiceNumber') or '').strip()
+        if current is None or not number or number != current['invoiceNumber']:
+            if current is not None:
+                yield line, current
+            current = {name: row.get(name) for name in INVOICE_CSV_COLUMNS if row.get(name) not in (None, '')}
+            current['invoiceNumber'] = number
+            current['lineItems'] = []
+            line = reader.line_num
+        if (row.get('description') or '').strip():
+            current['lineItems'].append({name: row.get(name) for name in ITEM_CSV_COLUMNS})
+    if current is not None:
+        yield line, current
+
+
+def _error(row: int, number, message: str) -> Dict[str, Any]:
+    return {'row': row, 'invoiceNumber': number or None, 'status': 'error', 'error': message}
+
+
+def _import_chunk(db, chunk: List[NumberedPayload]) -> List[Dict[str, Any]]:
+    results: List[Any] = [None] * len(chunk)
+    parsed = []
+    for index, (row, payload) in enumerate(chunk):
+        if not isinstance(payload, dict):
+            results[index] = _error(row, None, 'Invoice must be an object')
+            continue
+        try:
+            values, items = parse_invoice_payload(payload)
+        except ValueError as exc:
+            results[index] = _error(row, payload.get('invoiceNumber'), str(exc))
+            continue
+        except Exception:
+            # One malformed row must not fail the rows around it.
+            results[index] = _error(row, payload.get('invoiceNumber'), 'Invoice could not be read')
+            continue
+        parsed.append((index, row, values, items))
+
+    numbers = {values['invoice_number'] for _, _, values, _ in parsed}
+    taken = set(db.scalars(select(Invoice.invoice_number).where(Invoice.invoice_number.in_(numbers))))
+    customer_ids = {values['customer_id'] for _, _, values, _ in parsed}
+    customers = set(db.scalars(select(Customer.id).where(Customer.id.in_(customer_ids))))
+
+    valid = []
+    for index, row, values, items in parsed:
+        number = values['invoice_number']
+        if number in taken:
+            results[index] = _error(row, number, 'Invoice number must be unique')
+        elif values['customer_id'] not in customers:
+            results[index] = _error(row, number, 'Customer not found')
+        else:
+            taken.add(number)
+            valid.append((index, row, values, items))
+    if not valid:
+        return results
+
+    now = datetime.datetime.utcnow().isoformat()
+    try:
+        seq = allocate_change_seqs(db, len(valid))
+        rows = [
+            {
+                **values, 'amount_paid': 0.0, 'balance_due': values['total'],
+                'created_at': now, 'updated_at': now, 'change_seq': seq + offset,
+            }
+            for offset, (_, _, values, _) in enumerate(valid)
+        ]
+        db.execute(insert(Invoice.__table__), rows)
+        # Reading the new ids back by their unique numbers keeps the insert a
+        # plain executemany; RETURNING in parameter order is row-at-a-time.
+        numbers = [values['invoice_number'] for _, _, values, _ in valid]
+        ids = dict(db.execute(
+            select(Invoice.invoice_number, Invoice.id).where(Invoice.invoice_number.in_(numbers))
+        ).all())
+        line_items = [
+            {**item, 'invoice_id': ids[values['invoice_number']]}
+            for _, _, values, items in valid
+            for item in items
+        ]
+        if line_items:
+            db.execute(insert(InvoiceItem.__table__), line_items)
+        apply_inserts(db, (invoice_fact(SimpleNamespace(**row)) for row in rows))
+        bump_versions(db, 'invoices')
+        db.commit()
+    except SQLAlchemyError as exc:
+        db.rollback()
+        message = 'Invoice number must be unique' if isinstance(exc, IntegrityError) else 'Failed to save invoice'
+        for index, row, values, _ in valid:
+            results[index] = _error(row, values['invoice_number'], message)
+        return results
+
+    for index, row, values, _ in valid:
+        number = values['invoice_number']
+        results[index] = {'row': row, 'invoiceNumber': number, 'status': 'created', 'id': ids[number]}
+    return results
+
+
+def import_invoices(db, payloads: Iterable[NumberedPayload], chunk_size: int = IMPORT_CHUNK_SIZE) -> Dict[str, Any]:
+    """Create invoices from numbered payloads, committing every ``chunk_size``.
+
+    Returns ``{"created", "failed", "results"}`` with one result per payload
+    in upload order. If the upload cannot be read to the end, the payloads
+    read so far are still imported and the report gains an ``error``, also
+    added as a last result without a row.
+    """
+    results: List[Dict[str, Any]] = []
+    payloads = iter(payloads)
+    error = None
+    while error is None:
+        chunk: List[NumberedPayload] = []
+        try:
+            for payload in payloads:
+                chunk.append(payload)
+                if len(chunk) >= chunk_size:
+                    break
+        except (ValueError, csv.Error) as exc:
+            error = f'Upload could not be read to the end: {exc}'
+        if chunk:
+            results.extend(_import_chunk(db, chunk))
+        if len(chunk) < chunk_size:
+            break
+    if error is not None:
+        results.append(_error(None, None, error))
+    created = sum(1 for result in results if result['status'] == 'created')
+    report = {'created': created, 'failed': len(results) - created, 'results': results}
+    if error is not None:
+        report['error'] = error
+    return report
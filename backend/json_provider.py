@@ -0,0 +1,58 @@
+"""JSON provider for Flask responses.
+
+``FastJSONProvider`` encodes with orjson when it is installed and falls back
+to the standard library otherwise, producing the same documents either way:
+sorted keys, ``date``/``datetime`` as ISO 8601 strings and ``Decimal`` as a
+JSON number. Flask's own provider would render dates as HTTP dates and
+decimals as strings.
+"""
+import datetime
+import decimal
+from typing import Any
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    """Encode types the JSON encoders do not handle natively."""
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    return DefaultJSONProvider.default(value)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Default provider with an orjson fast path."""
+
+    default = staticmethod(_default)
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        option = self._orjson_option(kwargs)
+        if option is None:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=_default, option=option).decode('utf-8')
+
+    def loads(self, s, **kwargs: Any) -> Any:
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def _orjson_option(self, kwargs):
+        """Map stdlib ``dumps`` arguments to orjson options, or None if unsupported."""
+        if orjson is None or not self.sort_keys:
+            return None
+        option = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+        for name, value in kwargs.items():
+            if name == 'indent' and value == 2:
+                option |= orjson.OPT_INDENT_2
+            elif name == 'separators' and tuple(value) == (',', ':'):
+                continue
+            else:
+                return None
+        return option
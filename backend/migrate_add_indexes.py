@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""Migration script to create indexes declared on the models.
+
+``create_all`` only creates indexes together with new tables, so indexes
+added to existing models have to be created explicitly on databases that
+predate them. Indexes made redundant by a composite index with the same
+leading column are dropped. Safe to run repeatedly.
+"""
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import SQLAlchemyError
+
+from database import Base, engine
+import models  # noqa: F401  (registers all tables on Base.metadata)
+
+# Indexes no longer declared because a composite index covers them.
+REDUNDANT_INDEXES = {
+    'invoices': ('ix_invoices_customer_id',),  # covered by ix_invoices_customer_id_id
+}
+
+
+def add_missing_indexes():
+    """Create every model index missing from the database and drop redundant ones."""
+    try:
+        inspector = inspect(engine)
+        existing_tables = set(inspector.get_table_names())
+        created = 0
+        dropped = 0
+
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                print(f"{table.name} table does not exist in the database.")
+                continue
+            existing = {index['name'] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name in existing:
+                    continue
+                index.create(bind=engine)
+                created += 1
+                print(f"Created index {index.name} on {table.name}.")
+            for name in REDUNDANT_INDEXES.get(table.name, ()):
+                if name in existing:
+                    with engine.begin() as conn:
+                        conn.execute(text(f"DROP INDEX {name}"))
+                    dropped += 1
+                    print(f"Dropped redundant index {name} on {table.name}.")
+
+        if not created and not dropped:
+            print("All indexes already exist.")
+
+    except SQLAlchemyError as exc:
+        print(f"Error creating indexes: {exc}")
+
+
+if __name__ == "__main__":
+    add_missing_indexes()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""Migration script to add change sequence numbers for ``/api/sync``.
+
+Adds the ``change_seq`` column and its index to every synced table, creates
+the ``tombstones`` table and numbers existing rows after the current counter
+so a first sync from zero returns them. Safe to run repeatedly.
+"""
+
+from sqlalchemy import func, inspect, select, text, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from database import engine
+from models import SYNCED_MODELS, TableVersion, Tombstone
+from models.change_tracking import CHANGE_SEQ_COUNTER
+
+
+def add_change_seq():
+    """Add, index and backfill ``change_seq`` on the synced tables."""
+    try:
+        inspector = inspect(engine)
+        existing_tables = set(inspector.get_table_names())
+        TableVersion.__table__.create(bind=engine, checkfirst=True)
+        Tombstone.__table__.create(bind=engine, checkfirst=True)
+
+        with engine.begin() as conn:
+            counter = TableVersion.__table__
+            seq = conn.execute(
+                select(counter.c.version).where(counter.c.name == CHANGE_SEQ_COUNTER)
+            ).scalar() or 0
+            start = seq
+
+            for model in SYNCED_MODELS:
+                table = model.__table__
+                if table.name not in existing_tables:
+                    print(f"{table.name} table does not exist in the database.")
+                    continue
+                columns = {column['name'] for column in inspector.get_columns(table.name)}
+                if 'change_seq' not in columns:
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN change_seq INTEGER"))
+                    print(f"Added change_seq column to {table.name} table.")
+                indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+                for index in table.indexes:
+                    if index.name not in indexes and 'change_seq' in index.columns:
+                        index.create(bind=conn)
+
+                # Offsetting ids keeps the numbers unique across tables.
+                numbered = conn.execute(
+                    update(table)
+                    .where(table.c.change_seq.is_(None))
+                    .values(change_seq=table.c.id + seq)
+                ).rowcount
+                if numbered:
+                    seq += conn.execute(select(func.max(table.c.id))).scalar()
+                    print(f"Numbered {numbered} existing rows in {table.name} table.")
+
+            if seq != start:
+                updated = conn.execute(
+                    update(counter).where(counter.c.name == CHANGE_SEQ_COUNTER).values(version=seq)
+                ).rowcount
+                if not updated:
+                    conn.execute(counter.insert().values(name=CHANGE_SEQ_COUNTER, version=seq))
+            print(f"Change sequence is at {seq}.")
+
+    except SQLAlchemyError as exc:
+        print(f"Error adding change sequence: {exc}")
+
+
+if __name__ == "__main__":
+    add_change_seq()
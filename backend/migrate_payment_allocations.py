@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""Migration script to add payment allocations and invoice balances.
+
+Adds ``amount_paid`` and ``balance_due`` to the invoices table and creates
+the ``payment_allocations`` table. Each legacy payment linked to an invoice
+through ``invoice_id`` gets an allocation for as much as its invoice still
+owes, oldest payments first; the rest stays unapplied. Then every invoice
+balance is recomputed. Invoice statuses are left as they are. When
+anything was added, invoices and payments are renumbered after the change
+counter, so sync clients fetch the new fields. Safe to run repeatedly.
+"""
+
+from sqlalchemy import exists, func, inspect, select, text, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from database import engine
+from models import Invoice, Payment, PaymentAllocation, TableVersion
+from models.change_tracking import CHANGE_SEQ_COUNTER
+
+
+def add_payment_allocations():
+    """Create allocations for legacy payments and backfill invoice balances."""
+    try:
+        inspector = inspect(engine)
+        existing_tables = set(inspector.get_table_names())
+        for table in (Invoice.__table__, Payment.__table__):
+            if table.name not in existing_tables:
+                print(f"{table.name} table does not exist in the database.")
+                return
+        changed = PaymentAllocation.__table__.name not in existing_tables
+        if changed:
+            PaymentAllocation.__table__.create(bind=engine)
+            print("Created payment_allocations table.")
+
+        invoices = Invoice.__table__
+        payments = Payment.__table__
+        allocations = PaymentAllocation.__table__
+        with engine.begin() as conn:
+            columns = {column['name'] for column in inspector.get_columns(invoices.name)}
+            for name in ('amount_paid', 'balance_due'):
+                if name not in columns:
+                    conn.execute(text(f"ALTER TABLE invoices ADD COLUMN {name} FLOAT"))
+                    print(f"Added {name} column to invoices table.")
+                    changed = True
+
+            allocated = (
+                select(func.coalesce(func.sum(allocations.c.amount), 0.0))
+                .where(allocations.c.invoice_id == invoices.c.id)
+                .scalar_subquery()
+            )
+            legacy = conn.execute(
+                select(
+                    payments.c.id, payments.c.invoice_id, payments.c.amount, payments.c.created_at,
+                    func.coalesce(invoices.c.total, 0.0) - allocated,
+                )
+                .join(invoices, invoices.c.id == payments.c.invoice_id)
+                .where(~exists().where(allocations.c.payment_id == payments.c.id))
+                .order_by(payments.c.invoice_id, payments.c.date, payments.c.id)
+            ).all()
+            # Like single_allocation, each payment covers at most what its
+            # invoice still owes, earlier payments first.
+            balances = {}
+            rows = []
+            unapplied = 0.0
+            for payment_id, invoice_id, amount, created_at, balance in legacy:
+                balance = balances.setdefault(invoice_id, balance)
+                applied = round(max(0.0, min(amount or 0.0, balance)), 2)
+                unapplied += (amount or 0.0) - applied
+                if applied > 0:
+                    balances[invoice_id] = balance - applied
+                    rows.append({
+                        'payment_id': payment_id, 'invoice_id': invoice_id,
+                        'amount': applied, 'created_at': created_at,
+                    })
+            if rows:
+                conn.execute(allocations.insert(), rows)
+                print(f"Allocated {len(rows)} legacy payments to their invoices.")
+                changed = True
+            if unapplied > 0.005:
+                print(f"Left {unapplied:.2f} of legacy payments unapplied where they exceeded the invoice balance.")
+
+            paid = (
+                select(func.coalesce(func.sum(allocations.c.amount), 0.0))
+                .where(allocations.c.invoice_id == invoices.c.id)
+                .scalar_subquery()
+            )
+            updated = conn.execute(
+                update(invoices).values(amount_paid=paid, balance_due=func.coalesce(invoices.c.total, 0.0) - paid)
+            ).rowcount
+            print(f"Recomputed balances of {updated} invoices.")
+
+            if not changed:
+                return
+            counter = TableVersion.__table__
+            seq = conn.execute(
+                select(counter.c.version).where(counter.c.name == CHANGE_SEQ_COUNTER)
+            ).scalar()
+            if seq is None:
+                print("Change sequence not found; run migrate_change_seq.py to number rows for sync.")
+                return
+            for table in (invoices, payments):
+                numbered = conn.execute(update(table).values(change_seq=table.c.id + seq)).rowcount
+                if numbered:
+                    seq += conn.execute(select(func.max(table.c.id))).scalar()
+            conn.execute(update(counter).where(counter.c.name == CHANGE_SEQ_COUNTER).values(version=seq))
+            print(f"Renumbered invoices and payments for sync; change sequence is at {seq}.")
+
+    except SQLAlchemyError as exc:
+        print(f"Error adding payment allocations: {exc}")
+
+
+if __name__ == "__main__":
+    add_payment_allocations()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""Migration script to normalize legacy date strings and index date columns.
+
+``invoices.issue_date``, ``invoices.due_date``, ``expenses.date`` and
+``payments.date`` used to be free-form strings. The models now declare them
+as ``Date`` columns, which SQLite stores as ``YYYY-MM-DD`` text, so existing
+values are rewritten to that form and indexed for range scans. Unparseable
+values are cleared in nullable columns and replaced by the record's
+``created_at`` date in required ones.
+"""
+
+import datetime
+import os
+import sqlite3
+
+DATE_COLUMNS = (
+    ('invoices', 'issue_date', True),
+    ('invoices', 'due_date', True),
+    ('expenses', 'date', False),
+    ('payments', 'date', False),
+)
+
+FORMATS = ("%Y-%m-%d", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M:%S")
+
+
+def normalize_date(value):
+    """Return ``value`` as a ``YYYY-MM-DD`` string, or None if unparseable."""
+    if not value:
+        return None
+    value = str(value).strip()
+    try:
+        return datetime.datetime.fromisoformat(value).date().isoformat()
+    except ValueError:
+        pass
+    for fmt in FORMATS:
+        try:
+            return datetime.datetime.strptime(value, fmt).date().isoformat()
+        except ValueError:
+            continue
+    return None
+
+
+def migrate_typed_dates():
+    """Normalize date strings and create date indexes."""
+    db_path = os.path.join(os.path.dirname(__file__), 'ledgerflow.db')
+
+    if not os.path.exists(db_path):
+        print(f"Database file not found at {db_path}")
+        return
+
+    conn = None
+    try:
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+
+        for table, column, nullable in DATE_COLUMNS:
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type='table' AND name=?",
+                (table,),
+            )
+            if cursor.fetchone() is None:
+                print(f"{table} table does not exist in the database.")
+                continue
+
+            cursor.execute(f"SELECT id, {column}, created_at FROM {table}")
+            updates = []
+            unresolved = []
+            for row_id, value, created_at in cursor.fetchall():
+                normalized = normalize_date(value)
+                if normalized is None and not nullable:
+                    normalized = normalize_date(created_at)
+                    if normalized is None:
+                        unresolved.append(row_id)
+                        continue
+                if normalized != value:
+                    updates.append((normalized, row_id))
+
+            cursor.executemany(f"UPDATE {table} SET {column} = ? WHERE id = ?", updates)
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS ix_{table}_{column} ON {table} ({column})"
+            )
+            print(f"Normalized {len(updates)} value(s) in {table}.{column}.")
+            if unresolved:
+                print(
+                    f"Could not determine {table}.{column} for id(s) "
+                    f"{', '.join(str(row_id) for row_id in unresolved)}; please fix them manually."
+                )
+
+        conn.commit()
+
+    except sqlite3.Error as exc:
+        if conn is not None:
+            conn.rollback()
+        print(f"Error migrating date columns: {exc}")
+    finally:
+        if conn is not None:
+            conn.close()
+
+
+if __name__ == "__main__":
+    migrate_typed_dates()
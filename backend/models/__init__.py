@@ -9,6 +9,12 @@ from models.vendor import Vendor
 from models.invoice import Invoice, InvoiceItem
 from models.expense import Expense
 from models.payment import Payment
+from models.payment_allocation import PaymentAllocation
+from models.monthly_rollup import MonthlyRollup
+from models.table_version import TableVersion
+from models.tax_period_snapshot import TaxPeriodSnapshot
+from models.tombstone import Tombstone
+from models.change_tracking import allocate_change_seqs, current_change_seq, SYNCED_MODELS
 
 __all__ = [
     'Base',
@@ -26,4 +32,12 @@ __all__ = [
     'InvoiceItem',
     'Expense',
     'Payment',
+    'PaymentAllocation',
+    'MonthlyRollup',
+    'TableVersion',
+    'TaxPeriodSnapshot',
+    'Tombstone',
+    'allocate_change_seqs',
+    'current_change_seq',
+    'SYNCED_MODELS',
 ]
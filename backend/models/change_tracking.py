@@ -0,0 +1,93 @@
+"""Change sequence numbers and delete tombstones for delta sync.
+
+Every insert or update of a synced row stamps it with the next value of a
+database-wide counter (``change_seq``), and every delete records a
+:class:`~models.tombstone.Tombstone` with its own sequence number, so
+``/api/sync`` can return everything that happened after a given number.
+A ``before_flush`` listener does the stamping for all ORM writes; Core
+inserts and updates must set ``change_seq`` themselves from
+:func:`allocate_change_seqs`.
+
+The counter is a ``table_versions`` row updated inside the writing
+transaction. Its row lock makes concurrent writers commit in sequence order,
+so once a number is visible every lower number is too.
+"""
+import datetime
+
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.orm import Session
+
+from models.customer import Customer
+from models.expense import Expense
+from models.invoice import Invoice, InvoiceItem
+from models.payment import Payment
+from models.table_version import TableVersion
+from models.tombstone import Tombstone
+from models.vendor import Vendor
+
+CHANGE_SEQ_COUNTER = '_change_seq'
+SYNCED_MODELS = (Customer, Vendor, Invoice, Expense, Payment)
+
+
+def allocate_change_seqs(session, count: int) -> int:
+    """Reserve ``count`` consecutive sequence numbers and return the first."""
+    table = TableVersion.__table__
+    now = datetime.datetime.utcnow().isoformat()
+    bump = (
+        update(table)
+        .where(table.c.name == CHANGE_SEQ_COUNTER)
+        .values(version=table.c.version + count, updated_at=now)
+    )
+    if session.get_bind().dialect.update_returning:
+        last = session.execute(bump.returning(table.c.version)).scalar()
+    elif session.execute(bump).rowcount:
+        last = session.execute(select(table.c.version).where(table.c.name == CHANGE_SEQ_COUNTER)).scalar_one()
+    else:
+        last = None
+    if last is None:
+        session.execute(insert(table).values(name=CHANGE_SEQ_COUNTER, version=count, updated_at=now))
+        last = count
+    return last - count + 1
+
+
+def current_change_seq(session) -> int:
+    """Highest sequence number committed so far (0 before any change)."""
+    return session.execute(
+        select(TableVersion.version).where(TableVersion.name == CHANGE_SEQ_COUNTER)
+    ).scalar() or 0
+
+
+def _changed_rows(session):
+    changed = {}
+    for obj in session.new:
+        if isinstance(obj, SYNCED_MODELS):
+            changed[id(obj)] = obj
+    for obj in session.dirty:
+        if isinstance(obj, SYNCED_MODELS) and session.is_modified(obj):
+            changed[id(obj)] = obj
+
+    # Line items are part of their invoice's sync payload.
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, InvoiceItem):
+            invoice = obj.invoice or (obj.invoice_id and session.get(Invoice, obj.invoice_id))
+            if invoice is not None and invoice not in session.deleted:
+                changed[id(invoice)] = invoice
+    return list(changed.values())
+
+
+@event.listens_for(Session, 'before_flush')
+def _track_changes(session, flush_context, instances):
+    changed = _changed_rows(session)
+    deleted = [obj for obj in session.deleted if isinstance(obj, SYNCED_MODELS)]
+    if not changed and not deleted:
+        return
+
+    seq = allocate_change_seqs(session, len(changed) + len(deleted))
+    for obj in changed:
+        obj.change_seq = seq
+        seq += 1
+
+    now = datetime.datetime.utcnow().isoformat()
+    for obj in deleted:
+        session.add(Tombstone(table_name=obj.__tablename__, row_id=obj.id, change_seq=seq, deleted_at=now))
+        seq += 1
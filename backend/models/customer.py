@@ -28,3 +28,4 @@ class Customer(Base):
     notes = Column(String(500), nullable=True)
     is_active = Column(Boolean, default=True)
     created_at = Column(String(50), nullable=True)
+    change_seq = Column(Integer, nullable=True, index=True)
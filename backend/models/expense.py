@@ -1,5 +1,5 @@
 """Expense model."""
-from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Boolean, Date, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from database import Base
 
@@ -7,11 +7,18 @@ from database import Base
 class Expense(Base):
     """Business expense record."""
     __tablename__ = 'expenses'
+    __table_args__ = (
+        Index('ix_expenses_date_type_tag_amount', 'date', 'type', 'tag', 'amount'),
+        Index('ix_expenses_type_date', 'type', 'date'),
+        Index('ix_expenses_tag_date', 'tag', 'date'),
+        Index('ix_expenses_vendor_id_date', 'vendor_id', 'date'),
+        Index('ix_expenses_customer_id_date', 'customer_id', 'date'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     type = Column(String(50), nullable=False)
     amount = Column(Float, nullable=False, default=0.0)
-    date = Column(String(50), nullable=False)
+    date = Column(Date, nullable=False, index=True)
     payment_method = Column(String(50), nullable=True)
     reference_number = Column(String(100), nullable=True)
     description = Column(String(500), nullable=True)
@@ -21,6 +28,7 @@ class Expense(Base):
     customer_id = Column(Integer, ForeignKey('customers.id'), nullable=True)
     created_at = Column(String(50), nullable=True)
     updated_at = Column(String(50), nullable=True)
+    change_seq = Column(Integer, nullable=True, index=True)
 
     vendor = relationship('Vendor', lazy='joined')
     customer = relationship('Customer', lazy='joined')
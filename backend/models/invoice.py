@@ -1,5 +1,5 @@
 """Invoice and InvoiceItem models."""
-from sqlalchemy import Column, Integer, String, Float, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Date, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from database import Base
 
@@ -7,13 +7,19 @@ from database import Base
 class Invoice(Base):
     """Invoice model."""
     __tablename__ = 'invoices'
+    __table_args__ = (
+        Index('ix_invoices_status_due_date', 'status', 'due_date'),
+        Index('ix_invoices_status_issue_date', 'status', 'issue_date'),
+        Index('ix_invoices_status_id', 'status', 'id'),
+        Index('ix_invoices_customer_id_id', 'customer_id', 'id'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     invoice_number = Column(String(50), nullable=False, unique=True)
     customer_id = Column(Integer, ForeignKey('customers.id'), nullable=False)
     status = Column(String(20), default='draft')
-    issue_date = Column(String(50), nullable=True)
-    due_date = Column(String(50), nullable=True)
+    issue_date = Column(Date, nullable=True, index=True)
+    due_date = Column(Date, nullable=True, index=True)
     payment_terms = Column(String(50), nullable=True)
     notes = Column(String(500), nullable=True)
     terms = Column(String(500), nullable=True)
@@ -22,8 +28,12 @@ class Invoice(Base):
     tax_total = Column(Float, default=0.0)
     discount_total = Column(Float, default=0.0)
     total = Column(Float, default=0.0)
+    # Maintained from payment allocations by ``allocations.refresh_invoices``.
+    amount_paid = Column(Float, default=0.0)
+    balance_due = Column(Float, nullable=True)
     created_at = Column(String(50), nullable=True)
     updated_at = Column(String(50), nullable=True)
+    change_seq = Column(Integer, nullable=True, index=True)
 
     customer = relationship('Customer')
     items = relationship('InvoiceItem', cascade='all, delete-orphan', lazy='joined', back_populates='invoice')
@@ -0,0 +1,22 @@
+"""Monthly rollup model."""
+from sqlalchemy import Column, Integer, String, Float, UniqueConstraint
+from database import Base
+
+
+class MonthlyRollup(Base):
+    """Running invoice and expense totals per month and category.
+
+    Invoices are bucketed by status and expenses by type. ``month`` holds a
+    ``YYYY-MM`` key, or an empty string for records without a usable date.
+    """
+    __tablename__ = 'monthly_rollups'
+    __table_args__ = (
+        UniqueConstraint('kind', 'month', 'category', name='uq_monthly_rollups_bucket'),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String(20), nullable=False)
+    month = Column(String(7), nullable=False, default='')
+    category = Column(String(50), nullable=False, default='')
+    total = Column(Float, nullable=False, default=0.0)
+    count = Column(Integer, nullable=False, default=0)
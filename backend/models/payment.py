@@ -1,27 +1,40 @@
 """Payment model."""
-from sqlalchemy import Column, Integer, Float, String, ForeignKey
+from sqlalchemy import Column, Integer, Float, String, Date, ForeignKey, Index
 from sqlalchemy.orm import relationship
 
 from database import Base
 
 
 class Payment(Base):
-    """Represents a payment that can be linked to invoices, vendors or customers."""
+    """Represents a payment that can be linked to invoices, vendors or customers.
+
+    ``invoice_id`` names the invoice of a payment applied to exactly one;
+    ``allocations`` holds the amounts applied to each invoice.
+    """
 
     __tablename__ = 'payments'
+    __table_args__ = (
+        Index('ix_payments_customer_id_date', 'customer_id', 'date'),
+        Index('ix_payments_vendor_id_date', 'vendor_id', 'date'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     amount = Column(Float, nullable=False, default=0.0)
-    date = Column(String(50), nullable=False)
+    date = Column(Date, nullable=False, index=True)
     payment_method = Column(String(50), nullable=True)
     reference_number = Column(String(100), nullable=True)
     notes = Column(String(500), nullable=True)
-    invoice_id = Column(Integer, ForeignKey('invoices.id'), nullable=True)
+    invoice_id = Column(Integer, ForeignKey('invoices.id'), nullable=True, index=True)
     vendor_id = Column(Integer, ForeignKey('vendors.id'), nullable=True)
     customer_id = Column(Integer, ForeignKey('customers.id'), nullable=True)
     created_at = Column(String(50), nullable=True)
     updated_at = Column(String(50), nullable=True)
+    change_seq = Column(Integer, nullable=True, index=True)
 
     invoice = relationship('Invoice', lazy='joined')
     vendor = relationship('Vendor', lazy='joined')
     customer = relationship('Customer', lazy='joined')
+    allocations = relationship(
+        'PaymentAllocation', cascade='all, delete-orphan', lazy='selectin', back_populates='payment',
+        order_by='PaymentAllocation.id',
+    )
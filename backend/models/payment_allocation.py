@@ -0,0 +1,20 @@
+"""Payment allocation model."""
+from sqlalchemy import Column, Integer, Float, String, ForeignKey, UniqueConstraint
+from sqlalchemy.orm import relationship
+from database import Base
+
+
+class PaymentAllocation(Base):
+    """The part of a payment applied to one invoice."""
+    __tablename__ = 'payment_allocations'
+    __table_args__ = (
+        UniqueConstraint('payment_id', 'invoice_id', name='uq_payment_allocations_payment_invoice'),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    payment_id = Column(Integer, ForeignKey('payments.id', ondelete='CASCADE'), nullable=False)
+    invoice_id = Column(Integer, ForeignKey('invoices.id', ondelete='CASCADE'), nullable=False, index=True)
+    amount = Column(Float, nullable=False, default=0.0)
+    created_at = Column(String(50), nullable=True)
+
+    payment = relationship('Payment', back_populates='allocations')
@@ -0,0 +1,12 @@
+"""Table version model."""
+from sqlalchemy import Column, Integer, String
+from database import Base
+
+
+class TableVersion(Base):
+    """Write counter per table, bumped in the same transaction as each change."""
+    __tablename__ = 'table_versions'
+
+    name = Column(String(50), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(String(50), nullable=True)
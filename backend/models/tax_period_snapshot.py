@@ -0,0 +1,20 @@
+"""Tax period snapshot model."""
+from sqlalchemy import Column, Integer, String, Date, Text, UniqueConstraint
+from database import Base
+
+
+class TaxPeriodSnapshot(Base):
+    """Frozen sales tax figures for a closed filing period.
+
+    ``rates`` holds the per-rate breakdown as a JSON list.
+    """
+    __tablename__ = 'tax_period_snapshots'
+    __table_args__ = (
+        UniqueConstraint('granularity', 'period_start', name='uq_tax_period_snapshots_period'),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    granularity = Column(String(10), nullable=False)
+    period_start = Column(Date, nullable=False)
+    rates = Column(Text, nullable=False, default='[]')
+    created_at = Column(String(50), nullable=True)
@@ -0,0 +1,14 @@
+"""Tombstone model."""
+from sqlalchemy import Column, Integer, String
+from database import Base
+
+
+class Tombstone(Base):
+    """Deletion of a synced row, kept so sync clients can drop their copy."""
+    __tablename__ = 'tombstones'
+
+    id = Column(Integer, primary_key=True)
+    table_name = Column(String(50), nullable=False)
+    row_id = Column(Integer, nullable=False)
+    change_seq = Column(Integer, nullable=False, index=True)
+    deleted_at = Column(String(50), nullable=True)
@@ -0,0 +1,183 @@
+"""Keyset (cursor) pagination for list endpoints.
+
+Pagination is opt-in: a request without ``limit`` gets the full list as
+before. With ``limit`` the endpoint returns ``{"items": [...],
+"nextCursor": ..., "limit": n}`` and the client passes ``nextCursor`` back
+as ``after`` to fetch the following page. Cursors encode the sort key
+values of the last row, so every page is an index range scan whose cost
+does not depend on how many rows precede it.
+"""
+import base64
+import binascii
+import datetime
+import json
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, or_
+
+from fieldsets import records
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# (mapped attribute, descending)
+SortKey = Tuple[Any, bool]
+
+
+class PageRequest(NamedTuple):
+    limit: Optional[int]
+    after: Optional[List[Any]]
+
+
+def parse_page_args(args, keys: Sequence[SortKey]) -> PageRequest:
+    """Read ``limit`` and ``after`` from request args.
+
+    ``limit`` is None when the client did not ask for paging. The cursor is
+    decoded against ``keys``. Raises ``ValueError`` with a client-facing
+    message on bad input.
+    """
+    token = args.get('after') or None
+    after = decode_cursor(token, keys) if token else None
+    raw_limit = args.get('limit')
+    if raw_limit in (None, ''):
+        return PageRequest(DEFAULT_PAGE_SIZE if after else None, after)
+    try:
+        limit = int(raw_limit)
+    except (TypeError, ValueError):
+        raise ValueError('limit must be an integer')
+    if limit < 1:
+        raise ValueError('limit must be at least 1')
+    return PageRequest(min(limit, MAX_PAGE_SIZE), after)
+
+
+def parse_sort(args, fields: Dict[str, Any], default: Sequence[SortKey]) -> List[SortKey]:
+    """Read ``sort=field`` / ``sort=-field`` into pagination keys.
+
+    ``fields`` maps API field names to mapped attributes. The unique last key
+    of ``default`` is appended as a tiebreaker in the same direction.
+    """
+    raw = (args.get('sort') or '').strip()
+    if not raw:
+        return list(default)
+    descending = raw.startswith('-')
+    attribute = fields.get(raw.lstrip('+-'))
+    if attribute is None:
+        raise ValueError(f"sort must be one of {', '.join(sorted(fields))}, optionally prefixed with '-'")
+    tiebreaker = default[-1][0]
+    if attribute is tiebreaker:
+        return [(attribute, descending)]
+    return [(attribute, descending), (tiebreaker, descending)]
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Encode sort key values as an opaque URL-safe token."""
+    payload = json.dumps([
+        value.isoformat() if isinstance(value, (datetime.date, datetime.datetime)) else value
+        for value in values
+    ], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token: str, keys: Sequence[SortKey]) -> List[Any]:
+    """Decode a token from :func:`encode_cursor`, coercing values to column types."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+    except (binascii.Error, UnicodeError, ValueError):
+        raise ValueError('Invalid cursor')
+    if not isinstance(values, list) or len(values) != len(keys):
+        raise ValueError('Invalid cursor')
+    return [_coerce(attribute, value) for (attribute, _), value in zip(keys, values)]
+
+
+def _coerce(attribute, value):
+    if value is None:
+        return None
+    try:
+        python_type = attribute.type.python_type
+    except NotImplementedError:
+        return value
+    try:
+        if python_type is datetime.date:
+            return datetime.date.fromisoformat(value)
+        if python_type is datetime.datetime:
+            return datetime.datetime.fromisoformat(value)
+        return python_type(value)
+    except (TypeError, ValueError):
+        raise ValueError('Invalid cursor')
+
+
+def _nullable(attribute) -> bool:
+    return bool(getattr(attribute.expression, 'nullable', False))
+
+
+def _order(attribute, descending: bool):
+    clause = attribute.desc() if descending else attribute.asc()
+    return clause.nulls_last() if _nullable(attribute) else clause
+
+
+def _equal(attribute, value):
+    return attribute.is_(None) if value is None else attribute == value
+
+
+def _beyond(attribute, descending: bool, value):
+    """Rows strictly after ``value`` in this key's order (NULLs sort last)."""
+    if value is None:
+        return None
+    clause = attribute < value if descending else attribute > value
+    return or_(clause, attribute.is_(None)) if _nullable(attribute) else clause
+
+
+def _after(keys: Sequence[SortKey], values: Sequence[Any]):
+    """Build ``(k1, k2, ...) > (v1, v2, ...)`` honouring each key's direction."""
+    clauses = []
+    for index, (attribute, descending) in enumerate(keys):
+        beyond = _beyond(attribute, descending, values[index])
+        if beyond is None:
+            continue
+        equal = [_equal(keys[prior][0], values[prior]) for prior in range(index)]
+        clauses.append(and_(*equal, beyond))
+    return or_(*clauses)
+
+
+def sort_query(query, keys: Sequence[SortKey]):
+    """Order ``query`` by ``keys``."""
+    return query.order_by(*(_order(attribute, descending) for attribute, descending in keys))
+
+
+def _page_query(query, keys: Sequence[SortKey], page: PageRequest):
+    if page.after:
+        query = query.filter(_after(keys, page.after))
+    return sort_query(query, keys).limit(page.limit + 1)
+
+
+def _split_page(rows: List[Any], keys: Sequence[SortKey], page: PageRequest):
+    next_cursor = None
+    if len(rows) > page.limit:
+        rows = rows[:page.limit]
+        next_cursor = encode_cursor([getattr(rows[-1], attribute.key) for attribute, _ in keys])
+    return rows, next_cursor
+
+
+def paginate(query, keys: Sequence[SortKey], page: PageRequest):
+    """Apply ordering, the cursor and the limit to ``query``.
+
+    ``keys`` must end with a unique column (normally the primary key) so the
+    ordering is total. Returns ``(rows, next_cursor)``.
+    """
+    return _split_page(_page_query(query, keys, page).all(), keys, page)
+
+
+def paginate_select(db, statement, keys: Sequence[SortKey], page: PageRequest):
+    """:func:`paginate` for a Core ``select()``, executed on ``db``.
+
+    The statement must select each key under its attribute name; rows come
+    back as :func:`fieldsets.records`.
+    """
+    rows = list(records(db.execute(_page_query(statement, keys, page))))
+    return _split_page(rows, keys, page)
+
+
+def page_payload(items: List[Any], next_cursor: Optional[str], page: PageRequest) -> dict:
+    """Response body for a paginated list."""
+    return {'items': items, 'nextCursor': next_cursor, 'limit': page.limit}
@@ -0,0 +1,123 @@
+"""Per-request SQL query counting and timing.
+
+Engine events count and time every statement. During a request the totals
+are kept on ``flask.g``; in debug mode they are returned in ``X-Query-Count``
+and ``X-Query-Time`` (milliseconds) headers and logged, with a warning when
+one statement runs often enough to look like an N+1 lazy load. Headers only
+cover queries made before the view returned, so the log line is the one to
+read for streamed responses.
+
+:func:`query_budget` asserts an upper bound on the queries a block of code
+runs, e.g. one test client request.
+"""
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Iterator, List, Tuple
+
+from flask import g, has_app_context, request
+from sqlalchemy import event
+
+# Executions of one statement within a request that count as an N+1 pattern.
+N_PLUS_ONE_THRESHOLD = 10
+# Marks the request that owns ``g.query_stats``; requests dispatched inside
+# it (``/api/batch``) add to its totals instead of reporting their own.
+STATS_ENVIRON_KEY = 'ledgerflow.query_stats'
+
+_local = threading.local()
+
+
+class QueryStats:
+    """Number, total time and per-statement counts of executed queries."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements: Counter = Counter()
+
+    def record(self, statement: str, duration: float) -> None:
+        self.count += 1
+        self.duration += duration
+        self.statements[statement] += 1
+
+    @property
+    def duration_ms(self) -> float:
+        return self.duration * 1000
+
+    def repeated(self, threshold: int = N_PLUS_ONE_THRESHOLD) -> List[Tuple[str, int]]:
+        """Statements executed at least ``threshold`` times, most frequent first."""
+        return [(statement, count) for statement, count in self.statements.most_common() if count >= threshold]
+
+
+def _active_stats() -> List[QueryStats]:
+    active = list(getattr(_local, 'budgets', ()))
+    if has_app_context() and g.get('query_stats') is not None:
+        active.append(g.query_stats)
+    return active
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - conn.info['query_start'].pop()
+    for stats in _active_stats():
+        stats.record(statement, duration)
+
+
+def install_query_stats(app, engine) -> None:
+    """Count queries on ``engine`` for every request handled by ``app``."""
+    if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+    @app.before_request
+    def start_query_stats():
+        g.query_stats = request.environ[STATS_ENVIRON_KEY] = QueryStats()
+
+    @app.after_request
+    def add_query_stats_headers(response):
+        stats = request.environ.get(STATS_ENVIRON_KEY)
+        if app.debug and stats is not None:
+            response.headers['X-Query-Count'] = str(stats.count)
+            response.headers['X-Query-Time'] = f'{stats.duration_ms:.1f}'
+        return response
+
+    @app.teardown_request
+    def log_query_stats(exception=None):
+        stats = request.environ.get(STATS_ENVIRON_KEY)
+        if stats is None:
+            return
+        g.pop('query_stats', None)
+        if not app.debug:
+            return
+        app.logger.info(
+            '%s %s: %d queries in %.1f ms', request.method, request.full_path.rstrip('?'),
+            stats.count, stats.duration_ms,
+        )
+        for statement, count in stats.repeated():
+            app.logger.warning('Possible N+1: %d executions of %s', count, ' '.join(statement.split()))
+
+
+@contextmanager
+def query_budget(limit: int) -> Iterator[QueryStats]:
+    """Fail with ``AssertionError`` if the block runs more than ``limit`` queries.
+
+        with query_budget(2):
+            client.get('/api/payments').get_data()
+
+    Streamed response bodies only query while they are read, so read them
+    inside the block.
+    """
+    stats = QueryStats()
+    budgets = _local.__dict__.setdefault('budgets', [])
+    budgets.append(stats)
+    try:
+        yield stats
+    finally:
+        budgets.remove(stats)
+    if stats.count > limit:
+        statements = '\n'.join(f'{count} x {statement}' for statement, count in stats.statements.most_common())
+        raise AssertionError(f'{stats.count} queries exceed the budget of {limit}:\n{statements}')
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""Rebuild the monthly rollup table from invoices and expenses.
+
+Run once after upgrading an existing database to backfill the rollups, or
+at any time to repair drift.
+"""
+from database import SessionLocal, engine, Base
+from rollups import rebuild_rollups
+
+
+def main():
+    """Recompute all monthly rollup rows."""
+    session = SessionLocal()
+    try:
+        Base.metadata.create_all(bind=engine)
+        count = rebuild_rollups(session)
+        session.commit()
+        print(f"Rebuilt {count} monthly rollup rows.")
+    except Exception as e:
+        print(f"Error rebuilding rollups: {e}")
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+if __name__ == '__main__':
+    main()
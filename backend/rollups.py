@@ -0,0 +1,164 @@
+"""Incrementally maintained monthly invoice and expense totals.
+
+Write routes capture a fact for the record before and after a change and
+pass both to :func:`apply_change` before committing, so the rollup rows are
+updated in the same transaction as the source rows. :func:`rebuild_rollups`
+recomputes everything from scratch for backfills and repairs.
+"""
+from datetime import date
+from typing import Dict, Iterable, Optional, Tuple
+
+from cache import bump_versions
+from models import MonthlyRollup, Invoice, Expense
+from utils import parse_iso_date
+
+KIND_INVOICE = 'invoice'
+KIND_EXPENSE = 'expense'
+UNDATED = ''
+
+# (kind, month, category, amount)
+Fact = Tuple[str, str, str, float]
+
+
+def month_of(*values) -> str:
+    """Return the ``YYYY-MM`` key of the first parseable date in ``values``."""
+    for value in values:
+        parsed = parse_iso_date(value)
+        if parsed:
+            return parsed.strftime('%Y-%m')
+    return UNDATED
+
+
+def parse_month(key: str) -> Optional[date]:
+    """Convert a ``YYYY-MM`` key to the first day of that month."""
+    if not key:
+        return None
+    try:
+        year, month = key.split('-')
+        return date(int(year), int(month), 1)
+    except (TypeError, ValueError):
+        return None
+
+
+def invoice_fact(invoice: Optional[Invoice]) -> Optional[Fact]:
+    """Describe the rollup contribution of an invoice."""
+    if invoice is None:
+        return None
+    return (
+        KIND_INVOICE,
+        month_of(invoice.issue_date, invoice.created_at),
+        invoice.status or '',
+        invoice.total or 0.0,
+    )
+
+
+def expense_fact(expense: Optional[Expense]) -> Optional[Fact]:
+    """Describe the rollup contribution of an expense."""
+    if expense is None:
+        return None
+    return (
+        KIND_EXPENSE,
+        month_of(expense.date, expense.created_at),
+        expense.type or '',
+        expense.amount or 0.0,
+    )
+
+
+def apply_change(db, before: Optional[Fact], after: Optional[Fact]) -> None:
+    """Move a record's contribution from ``before`` to ``after``.
+
+    Pass ``None`` as ``before`` for inserts and as ``after`` for deletes.
+    """
+    if before == after:
+        return
+    deltas: Dict[Tuple[str, str, str], Tuple[float, int]] = {}
+    if before:
+        total, count = deltas.get(before[:3], (0.0, 0))
+        deltas[before[:3]] = (total - before[3], count - 1)
+    if after:
+        total, count = deltas.get(after[:3], (0.0, 0))
+        deltas[after[:3]] = (total + after[3], count + 1)
+    apply_deltas(db, deltas)
+
+
+def apply_changes(db, changes: Iterable[Tuple[Optional[Fact], Optional[Fact]]]) -> None:
+    """:func:`apply_change` for many ``(before, after)`` pairs, with one update per bucket."""
+    deltas: Dict[Tuple[str, str, str], Tuple[float, int]] = {}
+    for before, after in changes:
+        if before == after:
+            continue
+        if before:
+            total, count = deltas.get(before[:3], (0.0, 0))
+            deltas[before[:3]] = (total - before[3], count - 1)
+        if after:
+            total, count = deltas.get(after[:3], (0.0, 0))
+            deltas[after[:3]] = (total + after[3], count + 1)
+    apply_deltas(db, deltas)
+
+
+def apply_inserts(db, facts: Iterable[Fact]) -> None:
+    """Add the contributions of newly inserted records with one update per bucket."""
+    deltas: Dict[Tuple[str, str, str], Tuple[float, int]] = {}
+    for fact in facts:
+        total, count = deltas.get(fact[:3], (0.0, 0))
+        deltas[fact[:3]] = (total + fact[3], count + 1)
+    apply_deltas(db, deltas)
+
+
+def apply_deltas(db, deltas: Dict[Tuple[str, str, str], Tuple[float, int]]) -> None:
+    """Add ``(total, count)`` deltas to their ``(kind, month, category)`` buckets."""
+    for (kind, month, category), (total, count) in deltas.items():
+        if not total and not count:
+            continue
+        updated = (
+            db.query(MonthlyRollup)
+            .filter(
+                MonthlyRollup.kind == kind,
+                MonthlyRollup.month == month,
+                MonthlyRollup.category == category,
+            )
+            .update(
+                {
+                    MonthlyRollup.total: MonthlyRollup.total + total,
+                    MonthlyRollup.count: MonthlyRollup.count + count,
+                },
+                synchronize_session=False,
+            )
+        )
+        if not updated:
+            db.add(MonthlyRollup(kind=kind, month=month, category=category, total=total, count=count))
+            db.flush()
+
+
+def rebuild_rollups(db, batch_size: int = 1000) -> int:
+    """Recompute every rollup row from the invoice and expense tables.
+
+    Returns the number of rollup rows written. The invoice and expense
+    versions are bumped so that cached dashboards are rebuilt too. The
+    caller commits.
+    """
+    buckets: Dict[Tuple[str, str, str], Tuple[float, int]] = {}
+
+    def add(fact: Fact) -> None:
+        total, count = buckets.get(fact[:3], (0.0, 0))
+        buckets[fact[:3]] = (total + fact[3], count + 1)
+
+    invoices = db.query(
+        Invoice.issue_date, Invoice.created_at, Invoice.status, Invoice.total
+    ).yield_per(batch_size)
+    for invoice in invoices:
+        add(invoice_fact(invoice))
+
+    expenses = db.query(
+        Expense.date, Expense.created_at, Expense.type, Expense.amount
+    ).yield_per(batch_size)
+    for expense in expenses:
+        add(expense_fact(expense))
+
+    db.query(MonthlyRollup).delete(synchronize_session=False)
+    db.bulk_insert_mappings(MonthlyRollup, [
+        {'kind': kind, 'month': month, 'category': category, 'total': total, 'count': count}
+        for (kind, month, category), (total, count) in buckets.items()
+    ])
+    bump_versions(db, 'invoices', 'expenses')
+    return len(buckets)
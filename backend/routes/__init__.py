@@ -8,6 +8,10 @@ from routes.payments import payments_bp
 from routes.company import company_bp
 from routes.settings import settings_bp
 from routes.dashboard import dashboard_bp
+from routes.reports import reports_bp
+from routes.search import search_bp
+from routes.sync import sync_bp
+from routes.batch import batch_bp
 
 __all__ = [
     'health_bp',
@@ -19,4 +23,8 @@ __all__ = [
     'company_bp',
     'settings_bp',
     'dashboard_bp',
+    'reports_bp',
+    'search_bp',
+    'sync_bp',
+    'batch_bp',
 ]
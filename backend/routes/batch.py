@@ -0,0 +1,165 @@
+"""Transactional batch route.
+
+``POST /api/batch`` runs an ordered list of write requests through the
+regular route handlers inside one database transaction with one commit. The
+batch session is bound to a single connection in ``rollback_only`` mode, so
+a handler's ``db.commit()`` only flushes, while its ``db.rollback()`` (or any
+failed operation) aborts the whole batch.
+
+Operations may refer to the responses of earlier, labelled operations:
+a body string that is exactly ``"$customer.id"`` is replaced by that value,
+and the same reference inside a path is replaced by its text. Other body
+strings are left alone, so free text such as ``"Paid via $PayPal.me"`` is
+sent as written; a leading ``$$`` sends a string that would otherwise be a
+reference literally, with one ``$`` dropped.
+"""
+import re
+from typing import Any, Dict, List
+
+from flask import Blueprint, current_app, jsonify, request
+from werkzeug.exceptions import HTTPException
+
+from models import SessionLocal, engine
+
+batch_bp = Blueprint('batch', __name__)
+
+MAX_BATCH_OPERATIONS = 100
+# Reads are left out: conditional GETs and cached reports would be keyed on
+# table versions the batch has not committed yet.
+BATCH_METHODS = ('POST', 'PUT', 'DELETE')
+
+_REFERENCE = re.compile(r'\$([A-Za-z_][\w-]*)((?:\.[\w-]+)+)')
+
+
+class BatchError(ValueError):
+    """An operation that cannot be run, with a client-facing message."""
+
+
+def _lookup(labels: Dict[str, Any], match) -> Any:
+    label, path = match.group(1), match.group(2)
+    if label not in labels:
+        raise BatchError(f"Unknown reference '{match.group(0)}'")
+    value = labels[label]
+    for key in path[1:].split('.'):
+        if isinstance(value, list) and key.isdigit() and int(key) < len(value):
+            value = value[int(key)]
+        elif isinstance(value, dict) and key in value:
+            value = value[key]
+        else:
+            raise BatchError(f"Reference '{match.group(0)}' does not match the response of '{label}'")
+    return value
+
+
+def resolve_references(value: Any, labels: Dict[str, Any]) -> Any:
+    """Replace ``$label.field`` references in a body with earlier results.
+
+    Only a string that is exactly one reference is resolved, taking the
+    referenced value with its JSON type; a string starting with ``$$`` loses
+    one ``$`` and is otherwise kept as is.
+    """
+    if isinstance(value, dict):
+        return {key: resolve_references(item, labels) for key, item in value.items()}
+    if isinstance(value, list):
+        return [resolve_references(item, labels) for item in value]
+    if isinstance(value, str) and value.startswith('$'):
+        if value.startswith('$$'):
+            return value[1:]
+        match = _REFERENCE.fullmatch(value)
+        if match:
+            return _lookup(labels, match)
+    return value
+
+
+def resolve_path(path: Any, labels: Dict[str, Any]) -> Any:
+    """Replace every ``$label.field`` reference in a path with its text."""
+    if isinstance(path, str) and '$' in path:
+        return _REFERENCE.sub(lambda found: str(_lookup(labels, found)), path)
+    return path
+
+
+def _parse_operation(operation: Any, labels: Dict[str, Any]) -> Dict[str, Any]:
+    if not isinstance(operation, dict):
+        raise BatchError('Operation must be an object')
+    method = str(operation.get('method') or 'POST').upper()
+    if method not in BATCH_METHODS:
+        raise BatchError(f"method must be one of {', '.join(BATCH_METHODS)}")
+    path = resolve_path(operation.get('path'), labels)
+    if not isinstance(path, str) or not path.startswith('/api/') or path.split('?')[0].rstrip('/') == '/api/batch':
+        raise BatchError('path must be an API path other than /api/batch')
+    label = operation.get('label')
+    if label is not None and (not isinstance(label, str) or not re.fullmatch(r'[A-Za-z_][\w-]*', label)):
+        raise BatchError('label must be a name of letters, digits, _ or -')
+    if label in labels:
+        raise BatchError(f"Label '{label}' is used twice")
+    parsed = {'method': method, 'path': path, 'label': label}
+    if 'body' in operation:
+        parsed['json'] = resolve_references(operation['body'], labels)
+    return parsed
+
+
+def _dispatch(operation: Dict[str, Any]):
+    """Run one operation through its route handler, returning the response."""
+    options = {'method': operation['method']}
+    if 'json' in operation:
+        options['json'] = operation['json']
+    with current_app.test_request_context(operation['path'], **options):
+        try:
+            return current_app.make_response(current_app.dispatch_request())
+        except HTTPException as exc:
+            return current_app.make_response((jsonify({'error': exc.description}), exc.code))
+
+
+def _run(operations: List[Any], transaction) -> tuple:
+    labels: Dict[str, Any] = {}
+    results = []
+    for index, raw in enumerate(operations):
+        try:
+            operation = _parse_operation(raw, labels)
+        except BatchError as exc:
+            return jsonify({'error': str(exc), 'index': index}), 400
+
+        response = _dispatch(operation)
+        body = response.get_json(silent=True)
+        result = {'status': response.status_code, 'body': body}
+        if response.status_code >= 400:
+            error = body.get('error') if isinstance(body, dict) else None
+            return jsonify({'error': error or 'Operation failed', 'index': index, 'result': result}), response.status_code
+        if not transaction.is_active:
+            # The handler rolled back after a database error but still reported success.
+            return jsonify({'error': 'Operation could not be saved', 'index': index, 'result': result}), 409
+
+        results.append(result)
+        if operation['label']:
+            labels[operation['label']] = body
+    return jsonify({'results': results}), 200
+
+
+@batch_bp.post('/api/batch')
+def run_batch():
+    """Run ``{"operations": [...]}`` in order, committing once if all succeed.
+
+    Each operation is ``{"method", "path", "body", "label"}``. The response
+    holds one ``{"status", "body"}`` result per operation; if one fails,
+    nothing is saved and its ``index`` and ``result`` are returned instead.
+    """
+    data = request.get_json(force=True, silent=True)
+    operations = data.get('operations') if isinstance(data, dict) else None
+    if not isinstance(operations, list) or not operations:
+        return jsonify({'error': 'operations must be a non-empty array'}), 400
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        return jsonify({'error': f'A batch holds at most {MAX_BATCH_OPERATIONS} operations'}), 400
+
+    connection = engine.connect()
+    transaction = connection.begin()
+    SessionLocal.remove()
+    SessionLocal(bind=connection, join_transaction_mode='rollback_only')
+    try:
+        response, status = _run(operations, transaction)
+        if status == 200:
+            transaction.commit()
+        return response, status
+    finally:
+        if transaction.is_active:
+            transaction.rollback()
+        SessionLocal.remove()
+        connection.close()
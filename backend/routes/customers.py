@@ -1,45 +1,88 @@
 """Customer CRUD routes."""
 import datetime
 from flask import Blueprint, jsonify, request
+from sqlalchemy import select
+from cache import bump_versions, conditional
+from fieldsets import Field, parse_fields, select_columns, serialize, table_column
 from models import SessionLocal, Customer
+from pagination import page_payload, paginate_select, parse_page_args, sort_query
+from streaming import stream_select, wants_ndjson
 
 customers_bp = Blueprint('customers', __name__)
 
+# Default listing order; the id makes the ordering total.
+CUSTOMER_DEFAULT_SORT = [(Customer.id, False)]
+# The same order over plain table columns, for Core selects.
+CUSTOMER_ROW_SORT = [(table_column(attribute), descending) for attribute, descending in CUSTOMER_DEFAULT_SORT]
+
+
+def _address(street, city, state, zip_code, country):
+    return {
+        'street': street,
+        'city': city,
+        'state': state,
+        'zipCode': zip_code,
+        'country': country,
+    }
+
+
+ADDRESS_COLUMNS = (Customer.street, Customer.city, Customer.state, Customer.zip_code, Customer.country)
+BILLING_ADDRESS_COLUMNS = (
+    Customer.billing_street,
+    Customer.billing_city,
+    Customer.billing_state,
+    Customer.billing_zip_code,
+    Customer.billing_country,
+)
+
+CUSTOMER_FIELDS = {
+    'id': Field(lambda c: c.id, (Customer.id,)),
+    'name': Field(lambda c: c.name, (Customer.name,)),
+    'email': Field(lambda c: c.email, (Customer.email,)),
+    'phone': Field(lambda c: c.phone, (Customer.phone,)),
+    'company': Field(lambda c: c.company, (Customer.company,)),
+    'address': Field(
+        lambda c: _address(c.street, c.city, c.state, c.zip_code, c.country),
+        ADDRESS_COLUMNS,
+    ),
+    'billingAddress': Field(
+        lambda c: _address(c.billing_street, c.billing_city, c.billing_state, c.billing_zip_code, c.billing_country),
+        BILLING_ADDRESS_COLUMNS,
+    ),
+    'taxId': Field(lambda c: c.tax_id, (Customer.tax_id,)),
+    'paymentTerms': Field(lambda c: c.payment_terms, (Customer.payment_terms,)),
+    'creditLimit': Field(lambda c: c.credit_limit, (Customer.credit_limit,)),
+    'notes': Field(lambda c: c.notes, (Customer.notes,)),
+    'isActive': Field(lambda c: c.is_active, (Customer.is_active,)),
+    'createdAt': Field(lambda c: c.created_at, (Customer.created_at,)),
+}
+
+
+def _serialize_customer(c, fields=None):
+    """Serialize a customer record for API responses, optionally only ``fields``."""
+    return serialize(c, CUSTOMER_FIELDS, fields)
+
 
 @customers_bp.get('/api/customers')
+@conditional('customers')
 def get_customers():
+    try:
+        page = parse_page_args(request.args, CUSTOMER_DEFAULT_SORT)
+        fields = parse_fields(request.args, CUSTOMER_FIELDS)
+        ndjson = wants_ndjson(request)
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+
     db = SessionLocal()
-    customers = db.query(Customer).all()
-    result = []
-    for c in customers:
-        result.append({
-            'id': c.id,
-            'name': c.name,
-            'email': c.email,
-            'phone': c.phone,
-            'company': c.company,
-            'address': {
-                'street': c.street,
-                'city': c.city,
-                'state': c.state,
-                'zipCode': c.zip_code,
-                'country': c.country,
-            },
-            'billingAddress': {
-                'street': c.billing_street,
-                'city': c.billing_city,
-                'state': c.billing_state,
-                'zipCode': c.billing_zip_code,
-                'country': c.billing_country,
-            },
-            'taxId': c.tax_id,
-            'paymentTerms': c.payment_terms,
-            'creditLimit': c.credit_limit,
-            'notes': c.notes,
-            'isActive': c.is_active,
-            'createdAt': c.created_at
-        })
-    return jsonify(result), 200
+    # Read-only listing: Core rows go straight to dicts without building ORM instances.
+    statement = select(*select_columns(CUSTOMER_FIELDS, fields, [Customer.id]))
+    if page.limit is None:
+        statement = sort_query(statement, CUSTOMER_ROW_SORT)
+        return stream_select(db, statement, lambda c: _serialize_customer(c, fields), ndjson), 200
+
+    customers, next_cursor = paginate_select(db, statement, CUSTOMER_ROW_SORT, page)
+    data = [_serialize_customer(c, fields) for c in customers]
+    return jsonify(page_payload(data, next_cursor, page)), 200
 
 
 @customers_bp.post('/api/customers')
@@ -78,6 +121,7 @@ def create_customer():
         created_at=datetime.datetime.utcnow().isoformat()
     )
     db.add(customer)
+    bump_versions(db, 'customers')
     db.commit()
     return jsonify({'status': 'ok', 'id': customer.id}), 201
 
@@ -117,6 +161,7 @@ def update_customer(customer_id):
     customer.credit_limit = credit_limit
     customer.notes = data.get('notes')
     customer.is_active = data.get('isActive', True)
+    bump_versions(db, 'customers')
     db.commit()
     return jsonify({'status': 'ok', 'id': customer.id}), 200
 
@@ -127,6 +172,7 @@ def delete_customer(customer_id):
     customer = db.query(Customer).filter(Customer.id == customer_id).first()
     if not customer:
         return jsonify({'error': 'Customer not found'}), 404
+    bump_versions(db, 'customers')
     db.delete(customer)
     db.commit()
     return jsonify({'status': 'ok'}), 200
@@ -1,58 +1,22 @@
 """Dashboard analytics routes."""
-from collections import defaultdict
-from datetime import datetime, date
+from datetime import date
 
-from flask import Blueprint, jsonify
-from sqlalchemy.orm import joinedload
+from flask import Blueprint, jsonify, make_response, request
+from sqlalchemy import func
 
-from models import SessionLocal, Invoice, Expense
+from allocations import PAYABLE_STATUSES
+from cache import ResponseCache, get_versions, make_etag
+from models import SessionLocal, Invoice, Customer, MonthlyRollup
+from rollups import KIND_EXPENSE, KIND_INVOICE, parse_month
+from utils import format_date
 
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
+# Tables whose writes can change the dashboard response.
+DASHBOARD_TABLES = ('invoices', 'expenses', 'payments', 'customers')
 
-def parse_iso_date(value):
-    """Parse supported date strings to ``date`` objects.
-
-    Handles date, datetime, and string inputs. Supported string formats:
-    - ISO format (YYYY-MM-DD or YYYY-MM-DDTHH:MM:SS)
-    - "%Y-%m-%d"
-    - "%Y-%m-%dT%H:%M:%S"
-    - "%Y-%m-%d %H:%M:%S"
-
-    Args:
-        value: A date, datetime, or date string to parse.
-
-    Returns:
-        date: Parsed date object, or None if parsing fails.
-    """
-    if not value:
-        return None
-
-    if isinstance(value, date):
-        return value
-
-    if isinstance(value, datetime):
-        return value.date()
-
-    for fmt in (
-        None,
-        "%Y-%m-%d",
-        "%Y-%m-%dT%H:%M:%S",
-        "%Y-%m-%d %H:%M:%S",
-    ):
-        try:
-            if fmt is None:
-                return datetime.fromisoformat(value).date()
-            return datetime.strptime(value, fmt).date()
-        except (TypeError, ValueError):
-            continue
-    return None
-
-
-def month_start(value):
-    """Return the first day of the month for a date."""
-    return date(value.year, value.month, 1)
+_cache = ResponseCache(maxsize=16)
 
 
 def shift_month(reference, offset):
@@ -69,100 +33,122 @@ def percent_change(current, previous):
     return ((current - previous) / previous) * 100.0
 
 
+def build_dashboard(db, today):
+    """Aggregate metrics for the dashboard view as of ``today``."""
+    total_revenue = 0.0
+    total_expenses = 0.0
+    revenue_by_month = {}
+    expenses_by_month = {}
+
+    rollups = db.query(
+        MonthlyRollup.kind,
+        MonthlyRollup.month,
+        MonthlyRollup.category,
+        MonthlyRollup.total,
+    ).all()
+
+    for kind, month, category, total in rollups:
+        bucket = parse_month(month)
+        if kind == KIND_INVOICE:
+            if category == 'paid':
+                total_revenue += total
+                if bucket:
+                    revenue_by_month[bucket] = revenue_by_month.get(bucket, 0.0) + total
+        elif kind == KIND_EXPENSE:
+            total_expenses += total
+            if bucket:
+                expenses_by_month[bucket] = expenses_by_month.get(bucket, 0.0) + total
+
+    net_profit = total_revenue - total_expenses
+
+    # Outstanding is what is left to pay, as in the AR aging report.
+    outstanding_total, outstanding_count = (
+        db.query(func.coalesce(func.sum(Invoice.balance_due), 0.0), func.count(Invoice.id))
+        .filter(Invoice.status.in_(PAYABLE_STATUSES), Invoice.balance_due > 0)
+        .one()
+    )
+
+    current_month = date(today.year, today.month, 1)
+    previous_month = shift_month(current_month, -1)
+    trend_months = [shift_month(current_month, offset) for offset in range(-5, 1)]
+
+    current_revenue = revenue_by_month.get(current_month, 0.0)
+    previous_revenue = revenue_by_month.get(previous_month, 0.0)
+    revenue_change = percent_change(current_revenue, previous_revenue)
+
+    current_expenses = expenses_by_month.get(current_month, 0.0)
+    previous_expenses = expenses_by_month.get(previous_month, 0.0)
+    expenses_change = percent_change(current_expenses, previous_expenses)
+
+    current_profit = current_revenue - current_expenses
+    previous_profit = previous_revenue - previous_expenses
+    profit_change = percent_change(current_profit, previous_profit)
+
+    revenue_trend = [
+        {
+            'label': month.strftime('%b %Y'),
+            'total': round(revenue_by_month.get(month, 0.0), 2),
+        }
+        for month in trend_months
+    ]
+
+    recent_invoices = (
+        db.query(
+            Invoice.invoice_number,
+            Invoice.total,
+            Invoice.status,
+            Invoice.due_date,
+            Customer.id.label('customer_id'),
+            Customer.name.label('customer_name'),
+        )
+        .outerjoin(Customer, Invoice.customer_id == Customer.id)
+        .order_by(Invoice.created_at.desc())
+        .limit(5)
+        .all()
+    )
+
+    recent_invoices_data = []
+    for invoice in recent_invoices:
+        recent_invoices_data.append({
+            'invoiceNumber': invoice.invoice_number,
+            'customerName': invoice.customer_name if invoice.customer_id is not None else 'Unknown',
+            'total': round(invoice.total or 0.0, 2),
+            'status': invoice.status,
+            'dueDate': format_date(invoice.due_date),
+        })
+
+    return {
+        'metrics': {
+            'totalRevenue': {'amount': round(total_revenue, 2), 'change': round(revenue_change, 2)},
+            'totalExpenses': {'amount': round(total_expenses, 2), 'change': round(expenses_change, 2)},
+            'outstandingInvoices': {'amount': round(outstanding_total, 2), 'count': outstanding_count},
+            'netProfit': {'amount': round(net_profit, 2), 'change': round(profit_change, 2)},
+        },
+        'revenueTrend': revenue_trend,
+        'recentInvoices': recent_invoices_data,
+    }
+
+
 @dashboard_bp.get('/api/dashboard')
 def get_dashboard_data():
-    """Aggregate metrics for the dashboard view."""
+    """Serve dashboard metrics, reusing cached results while nothing changed."""
     db = SessionLocal()
     try:
-        invoices = (
-            db.query(Invoice)
-            .options(joinedload(Invoice.customer))
-            .all()
-        )
-        expenses = db.query(Expense).all()
-
-        total_revenue = sum((invoice.total or 0.0) for invoice in invoices if invoice.status == 'paid')
-        total_expenses = sum((expense.amount or 0.0) for expense in expenses)
-
-        outstanding_invoices = [invoice for invoice in invoices if invoice.status != 'paid']
-        outstanding_total = sum((invoice.total or 0.0) for invoice in outstanding_invoices)
-        outstanding_count = len(outstanding_invoices)
-
-        net_profit = total_revenue - total_expenses
-
         today = date.today()
-        current_month = date(today.year, today.month, 1)
-        previous_month = shift_month(current_month, -1)
-
-        revenue_by_month = defaultdict(float)
-        expenses_by_month = defaultdict(float)
-
-        for invoice in invoices:
-            if invoice.status != 'paid':
-                continue
-            invoice_date = parse_iso_date(invoice.issue_date) or parse_iso_date(invoice.created_at)
-            if not invoice_date:
-                continue
-            revenue_by_month[month_start(invoice_date)] += invoice.total or 0.0
-
-        for expense in expenses:
-            expense_date = parse_iso_date(expense.date) or parse_iso_date(expense.created_at)
-            if not expense_date:
-                continue
-            expenses_by_month[month_start(expense_date)] += expense.amount or 0.0
-
-        current_revenue = revenue_by_month.get(current_month, 0.0)
-        previous_revenue = revenue_by_month.get(previous_month, 0.0)
-        revenue_change = percent_change(current_revenue, previous_revenue)
-
-        current_expenses = expenses_by_month.get(current_month, 0.0)
-        previous_expenses = expenses_by_month.get(previous_month, 0.0)
-        expenses_change = percent_change(current_expenses, previous_expenses)
-
-        current_profit = current_revenue - current_expenses
-        previous_profit = previous_revenue - previous_expenses
-        profit_change = percent_change(current_profit, previous_profit)
-
-        trend_months = [shift_month(current_month, offset) for offset in range(-5, 1)]
-        revenue_trend = [
-            {
-                'label': month.strftime('%b %Y'),
-                'total': round(revenue_by_month.get(month, 0.0), 2),
-            }
-            for month in trend_months
-        ]
-
-        recent_invoices = (
-            db.query(Invoice)
-            .options(joinedload(Invoice.customer))
-            .order_by(Invoice.created_at.desc())
-            .limit(5)
-            .all()
-        )
-
-        recent_invoices_data = []
-        for invoice in recent_invoices:
-            due_date = parse_iso_date(invoice.due_date)
-            recent_invoices_data.append({
-                'invoiceNumber': invoice.invoice_number,
-                'customerName': invoice.customer.name if invoice.customer else 'Unknown',
-                'total': round(invoice.total or 0.0, 2),
-                'status': invoice.status,
-                'dueDate': due_date.isoformat() if due_date else None,
-            })
-
-        response = {
-            'metrics': {
-                'totalRevenue': {'amount': round(total_revenue, 2), 'change': round(revenue_change, 2)},
-                'totalExpenses': {'amount': round(total_expenses, 2), 'change': round(expenses_change, 2)},
-                'outstandingInvoices': {'amount': round(outstanding_total, 2), 'count': outstanding_count},
-                'netProfit': {'amount': round(net_profit, 2), 'change': round(profit_change, 2)},
-            },
-            'revenueTrend': revenue_trend,
-            'recentInvoices': recent_invoices_data,
-        }
-
-        return jsonify(response), 200
+        versions = get_versions(db, *DASHBOARD_TABLES)
+        etag = make_etag(today.isoformat(), sorted(versions.items()))
+
+        if request.if_none_match.contains(etag):
+            response = make_response('', 304)
+        else:
+            payload = _cache.get(etag)
+            if payload is None:
+                payload = build_dashboard(db, today)
+                _cache.set(etag, payload)
+            response = make_response(jsonify(payload), 200)
+
+        response.set_etag(etag)
+        return response
     finally:
         db.close()
         SessionLocal.remove()
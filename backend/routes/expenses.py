@@ -1,14 +1,32 @@
 """Expense routes."""
+import csv
 import datetime
+import io
 from typing import Any, Dict, Optional
 
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
 from sqlalchemy.exc import SQLAlchemyError
 
 from models import SessionLocal, Expense, Vendor, Customer
+from pagination import page_payload, paginate, parse_page_args, parse_sort, sort_query
+from cache import bump_versions, conditional
+from expense_import import COLUMN_SYNONYMS, DEFAULT_EXPENSE_TYPE, import_bank_csv
+from fieldsets import Field, load_options, parse_fields, serialize
+from rollups import apply_change, expense_fact
+from streaming import NDJSON_MIMETYPE, stream_query, wants_ndjson
+from utils import format_date, parse_date_arg, parse_int_arg, parse_iso_date
 
 expenses_bp = Blueprint('expenses', __name__)
 
+# Default listing order; the id makes the ordering total.
+EXPENSE_DEFAULT_SORT = [(Expense.id, False)]
+EXPENSE_SORT_FIELDS = {
+    'id': Expense.id,
+    'date': Expense.date,
+    'amount': Expense.amount,
+    'type': Expense.type,
+}
+
 
 def _serialize_party(party: Any, party_type: str) -> Optional[Dict[str, Any]]:
     """Serialize a vendor or customer for API responses."""
@@ -34,32 +52,35 @@ def _serialize_party(party: Any, party_type: str) -> Optional[Dict[str, Any]]:
     }
 
 
-def _serialize_expense(expense: Expense) -> Dict[str, Any]:
-    """Serialize an expense record for API responses."""
-    return {
-        'id': expense.id,
-        'type': expense.type,
-        'amount': expense.amount,
-        'date': expense.date,
-        'paymentMethod': expense.payment_method,
-        'referenceNumber': expense.reference_number,
-        'description': expense.description,
-        'taxDeductible': bool(expense.tax_deductible),
-        'tag': expense.tag,
-        'vendorId': expense.vendor_id,
-        'customerId': expense.customer_id,
-        'createdAt': expense.created_at,
-        'updatedAt': expense.updated_at,
-        'vendor': _serialize_party(expense.vendor, 'vendor'),
-        'customer': _serialize_party(expense.customer, 'customer'),
-    }
+EXPENSE_FIELDS = {
+    'id': Field(lambda expense: expense.id, (Expense.id,)),
+    'type': Field(lambda expense: expense.type, (Expense.type,)),
+    'amount': Field(lambda expense: expense.amount, (Expense.amount,)),
+    'date': Field(lambda expense: format_date(expense.date), (Expense.date,)),
+    'paymentMethod': Field(lambda expense: expense.payment_method, (Expense.payment_method,)),
+    'referenceNumber': Field(lambda expense: expense.reference_number, (Expense.reference_number,)),
+    'description': Field(lambda expense: expense.description, (Expense.description,)),
+    'taxDeductible': Field(lambda expense: bool(expense.tax_deductible), (Expense.tax_deductible,)),
+    'tag': Field(lambda expense: expense.tag, (Expense.tag,)),
+    'vendorId': Field(lambda expense: expense.vendor_id, (Expense.vendor_id,)),
+    'customerId': Field(lambda expense: expense.customer_id, (Expense.customer_id,)),
+    'createdAt': Field(lambda expense: expense.created_at, (Expense.created_at,)),
+    'updatedAt': Field(lambda expense: expense.updated_at, (Expense.updated_at,)),
+    'vendor': Field(lambda expense: _serialize_party(expense.vendor, 'vendor'), (Expense.vendor,)),
+    'customer': Field(lambda expense: _serialize_party(expense.customer, 'customer'), (Expense.customer,)),
+}
+
+
+def _serialize_expense(expense: Expense, fields=None) -> Dict[str, Any]:
+    """Serialize an expense record for API responses, optionally only ``fields``."""
+    return serialize(expense, EXPENSE_FIELDS, fields)
 
 
 def _apply_payload(expense: Expense, data: Dict[str, Any]) -> None:
     """Apply request payload data to an expense instance."""
     expense.type = (data.get('type') or '').strip()
     expense.amount = float(data.get('amount') or 0)
-    expense.date = (data.get('date') or '').strip()
+    expense.date = parse_iso_date((data.get('date') or '').strip())
     expense.payment_method = (data.get('paymentMethod') or '').strip() or None
     expense.reference_number = (data.get('referenceNumber') or '').strip() or None
     expense.description = (data.get('description') or '').strip() or None
@@ -79,18 +100,53 @@ def _apply_payload(expense: Expense, data: Dict[str, Any]) -> None:
         expense.customer_id = None
 
 
+def _filter_expenses(query, args):
+    """Apply the ``from``/``to``, ``type``, ``tag``, ``vendorId`` and ``customerId`` list filters."""
+    start = parse_date_arg(args, 'from')
+    end = parse_date_arg(args, 'to')
+    if start:
+        query = query.filter(Expense.date >= start)
+    if end:
+        query = query.filter(Expense.date <= end)
+    for name, column in (('type', Expense.type), ('tag', Expense.tag)):
+        value = (args.get(name) or '').strip()
+        if value:
+            query = query.filter(column == value)
+    for name, column in (('vendorId', Expense.vendor_id), ('customerId', Expense.customer_id)):
+        value = parse_int_arg(args, name)
+        if value is not None:
+            query = query.filter(column == value)
+    return query
+
+
 @expenses_bp.get('/api/expenses')
+@conditional('expenses', 'vendors', 'customers')
 def list_expenses():
-    """Return all expenses."""
+    """Stream matching expenses, or return one page of them when ``limit`` is given."""
     db = SessionLocal()
     try:
-        expenses = db.query(Expense).all()
-        return jsonify([_serialize_expense(expense) for expense in expenses]), 200
+        keys = parse_sort(request.args, EXPENSE_SORT_FIELDS, EXPENSE_DEFAULT_SORT)
+        page = parse_page_args(request.args, keys)
+        fields = parse_fields(request.args, EXPENSE_FIELDS)
+        ndjson = wants_ndjson(request)
+        query = _filter_expenses(db.query(Expense), request.args)
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+
+    if fields is not None:
+        query = query.options(*load_options(Expense, EXPENSE_FIELDS, fields, [key for key, _ in keys]))
+    try:
+        if page.limit is None:
+            return stream_query(sort_query(query, keys), lambda expense: _serialize_expense(expense, fields), ndjson), 200
+        expenses, next_cursor = paginate(query, keys, page)
+        data = [_serialize_expense(expense, fields) for expense in expenses]
+        return jsonify(page_payload(data, next_cursor, page)), 200
     except SQLAlchemyError as exc:
         return jsonify({'error': 'Failed to load expenses', 'details': str(exc)}), 500
 
 
 @expenses_bp.get('/api/expenses/<int:expense_id>')
+@conditional('expenses', 'vendors', 'customers')
 def get_expense(expense_id: int):
     """Return a single expense."""
     db = SessionLocal()
@@ -116,6 +172,8 @@ def create_expense():
         return jsonify({'error': 'Expense type is required'}), 400
     if expense.amount <= 0:
         return jsonify({'error': 'Amount must be greater than zero'}), 400
+    if not expense.date:
+        return jsonify({'error': 'A valid expense date is required'}), 400
 
     if expense.vendor_id:
         vendor = db.query(Vendor).filter(Vendor.id == expense.vendor_id).first()
@@ -134,11 +192,54 @@ def create_expense():
     expense.updated_at = now
 
     db.add(expense)
+    apply_change(db, None, expense_fact(expense))
+    bump_versions(db, 'expenses')
     db.commit()
     db.refresh(expense)
     return jsonify(_serialize_expense(expense)), 201
 
 
+@expenses_bp.post('/api/expenses/import')
+def import_expenses():
+    """Import expenses from a bank statement CSV body.
+
+    Query arguments ``<input>Column`` (e.g. ``amountColumn``) name the CSV
+    header for an input; ``sign``, ``defaultType``, ``paymentMethod`` and
+    ``dateFormat`` tune parsing. NDJSON clients get a progress line per
+    batch as the file is read; others get the final report.
+    """
+    db = SessionLocal()
+    try:
+        ndjson = wants_ndjson(request)
+        columns = {
+            field: request.args[f'{field}Column']
+            for field in COLUMN_SYNONYMS if request.args.get(f'{field}Column')
+        }
+        reports = import_bank_csv(
+            db,
+            io.TextIOWrapper(request.stream, encoding='utf-8-sig', newline=''),
+            columns=columns,
+            sign=request.args.get('sign', 'negative'),
+            default_type=request.args.get('defaultType') or DEFAULT_EXPENSE_TYPE,
+            payment_method=request.args.get('paymentMethod') or None,
+            date_format=request.args.get('dateFormat') or None,
+        )
+        if not ndjson:
+            report = None
+            for report in reports:
+                pass
+            return jsonify(report), 200
+    except (ValueError, csv.Error) as exc:
+        return jsonify({'error': str(exc)}), 400
+
+    def progress():
+        dumps = current_app.json.dumps
+        for report in reports:
+            yield dumps(report) + '\n'
+
+    return Response(stream_with_context(progress()), mimetype=NDJSON_MIMETYPE)
+
+
 @expenses_bp.put('/api/expenses/<int:expense_id>')
 def update_expense(expense_id: int):
     """Update an existing expense."""
@@ -147,6 +248,7 @@ def update_expense(expense_id: int):
     if not expense:
         return jsonify({'error': 'Expense not found'}), 404
 
+    before = expense_fact(expense)
     data = request.get_json(force=True) or {}
     _apply_payload(expense, data)
 
@@ -154,6 +256,8 @@ def update_expense(expense_id: int):
         return jsonify({'error': 'Expense type is required'}), 400
     if expense.amount <= 0:
         return jsonify({'error': 'Amount must be greater than zero'}), 400
+    if not expense.date:
+        return jsonify({'error': 'A valid expense date is required'}), 400
 
     if expense.vendor_id:
         vendor = db.query(Vendor).filter(Vendor.id == expense.vendor_id).first()
@@ -172,6 +276,8 @@ def update_expense(expense_id: int):
         expense.customer = None
 
     expense.updated_at = datetime.datetime.utcnow().isoformat()
+    apply_change(db, before, expense_fact(expense))
+    bump_versions(db, 'expenses')
 
     db.commit()
     db.refresh(expense)
@@ -186,6 +292,8 @@ def delete_expense(expense_id: int):
     if not expense:
         return jsonify({'error': 'Expense not found'}), 404
 
+    apply_change(db, expense_fact(expense), None)
+    bump_versions(db, 'expenses')
     db.delete(expense)
     db.commit()
     return jsonify({'status': 'ok'}), 200
@@ -1,27 +1,90 @@
 """Invoice CRUD routes."""
+import csv
 import datetime
+import io
 from flask import Blueprint, jsonify, request
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import joinedload, selectinload
 from sqlalchemy.exc import IntegrityError
 from models import SessionLocal, Invoice, InvoiceItem
-from utils import parse_float, normalize_status, serialize_invoice
+from pagination import page_payload, paginate, parse_page_args, parse_sort, sort_query
+from allocations import refresh_invoices, release_invoice
+from cache import bump_versions, conditional
+from fieldsets import load_options, parse_fields
+from invoice_import import import_invoices, read_invoice_csv
+from rollups import apply_change, invoice_fact
+from streaming import stream_query, wants_ndjson
+from utils import (
+    INVOICE_FIELDS,
+    parse_int_arg,
+    parse_invoice_payload,
+    serialize_invoice,
+)
 
 invoices_bp = Blueprint('invoices', __name__)
 
+# Default listing order; the id makes the ordering total.
+INVOICE_DEFAULT_SORT = [(Invoice.id, True)]
+INVOICE_SORT_FIELDS = {
+    'id': Invoice.id,
+    'invoiceNumber': Invoice.invoice_number,
+    'status': Invoice.status,
+    'issueDate': Invoice.issue_date,
+    'dueDate': Invoice.due_date,
+    'total': Invoice.total,
+}
+INVOICE_VIEWS = ('full', 'summary')
+
+
+def _filter_invoices(query, args):
+    """Apply the ``status`` (comma-separated) and ``customerId`` list filters."""
+    statuses = [status.strip().lower() for status in (args.get('status') or '').split(',') if status.strip()]
+    if statuses:
+        query = query.filter(Invoice.status.in_(statuses))
+    customer_id = parse_int_arg(args, 'customerId')
+    if customer_id is not None:
+        query = query.filter(Invoice.customer_id == customer_id)
+    return query
+
 
 @invoices_bp.get('/api/invoices')
+@conditional('invoices', 'customers')
 def get_invoices():
     db = SessionLocal()
-    invoices = (
-        db.query(Invoice)
-        .options(joinedload(Invoice.customer), joinedload(Invoice.items))
-        .order_by(Invoice.id.desc())
-        .all()
-    )
-    return jsonify([serialize_invoice(invoice) for invoice in invoices]), 200
+    try:
+        keys = parse_sort(request.args, INVOICE_SORT_FIELDS, INVOICE_DEFAULT_SORT)
+        page = parse_page_args(request.args, keys)
+        fields = parse_fields(request.args, INVOICE_FIELDS)
+        ndjson = wants_ndjson(request)
+        query = _filter_invoices(db.query(Invoice), request.args)
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+
+    view = (request.args.get('view') or 'full').lower()
+    if view not in INVOICE_VIEWS:
+        return jsonify({'error': f"view must be one of {', '.join(INVOICE_VIEWS)}"}), 400
+    if view == 'summary' and fields is None:
+        fields = [name for name in INVOICE_FIELDS if name != 'lineItems']
+
+    if fields is None:
+        query = query.options(joinedload(Invoice.customer), selectinload(Invoice.items))
+    else:
+        # Columns and relationships outside ``fields`` are neither selected nor joined.
+        query = query.options(*load_options(Invoice, INVOICE_FIELDS, fields, [key for key, _ in keys]))
+
+    if page.limit is None:
+        return stream_query(
+            sort_query(query, keys),
+            lambda invoice: serialize_invoice(invoice, fields=fields),
+            ndjson,
+        ), 200
+
+    invoices, next_cursor = paginate(query, keys, page)
+    data = [serialize_invoice(invoice, fields=fields) for invoice in invoices]
+    return jsonify(page_payload(data, next_cursor, page)), 200
 
 
 @invoices_bp.get('/api/invoices/<int:invoice_id>')
+@conditional('invoices', 'customers')
 def get_invoice(invoice_id):
     db = SessionLocal()
     invoice = (
@@ -39,58 +102,13 @@ def get_invoice(invoice_id):
 def create_invoice():
     db = SessionLocal()
     data = request.get_json(force=True) or {}
-    invoice_number = (data.get('invoiceNumber') or '').strip()
-    customer_id = data.get('customerId')
     try:
-        customer_id = int(customer_id)
-    except (TypeError, ValueError):
-        customer_id = None
-
-    if not invoice_number or not customer_id:
-        return jsonify({'error': 'Invoice number and customer are required'}), 400
+        values, items = parse_invoice_payload(data)
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
 
-    line_items = data.get('lineItems') or []
-    parsed_items = []
-    subtotal = 0.0
-
-    for item in line_items:
-        description = (item.get('description') or '').strip()
-        if not description:
-            continue
-        quantity = parse_float(item.get('quantity'), 0.0)
-        rate = parse_float(item.get('rate'), 0.0)
-        amount = quantity * rate
-        subtotal += amount
-        parsed_items.append({
-            'description': description,
-            'quantity': quantity,
-            'rate': rate,
-        })
-
-    tax_rate = parse_float(data.get('taxRate'), 0.0)
-    tax_total = subtotal * (tax_rate / 100.0)
-    discount_total = parse_float(data.get('discountTotal'), 0.0)
-    total = subtotal + tax_total - discount_total
     now = datetime.datetime.utcnow().isoformat()
-
-    invoice = Invoice(
-        invoice_number=invoice_number,
-        customer_id=customer_id,
-        status=normalize_status(data.get('status')),
-        issue_date=data.get('issueDate'),
-        due_date=data.get('dueDate'),
-        payment_terms=data.get('paymentTerms'),
-        notes=data.get('notes'),
-        terms=data.get('terms'),
-        tax_rate=tax_rate,
-        subtotal=subtotal,
-        tax_total=tax_total,
-        discount_total=discount_total,
-        total=total,
-        created_at=now,
-        updated_at=now,
-    )
-
+    invoice = Invoice(**values, amount_paid=0.0, balance_due=values['total'], created_at=now, updated_at=now)
     db.add(invoice)
 
     try:
@@ -99,14 +117,11 @@ def create_invoice():
         db.rollback()
         return jsonify({'error': 'Invoice number must be unique'}), 400
 
-    for item in parsed_items:
-        db.add(InvoiceItem(
-            invoice_id=invoice.id,
-            description=item['description'],
-            quantity=item['quantity'],
-            rate=item['rate'],
-        ))
+    for item in items:
+        db.add(InvoiceItem(invoice_id=invoice.id, **item))
 
+    apply_change(db, None, invoice_fact(invoice))
+    bump_versions(db, 'invoices')
     db.commit()
 
     invoice = (
@@ -118,6 +133,44 @@ def create_invoice():
     return jsonify(serialize_invoice(invoice)), 201
 
 
+@invoices_bp.post('/api/invoices/bulk')
+def bulk_create_invoices():
+    """Create invoices from a JSON array or a CSV upload, reporting on every row."""
+    db = SessionLocal()
+    try:
+        if request.mimetype == 'text/csv':
+            payloads = read_invoice_csv(io.TextIOWrapper(request.stream, encoding='utf-8-sig', newline=''))
+        else:
+            data = request.get_json(force=True, silent=True)
+            if not isinstance(data, list):
+                return jsonify({'error': 'Expected a JSON array of invoices or a text/csv body'}), 400
+            payloads = enumerate(data, start=1)
+        report = import_invoices(db, payloads)
+    except (ValueError, csv.Error) as exc:
+        return jsonify({'error': str(exc)}), 400
+    return jsonify(report), 200
+
+
+def _merge_items(invoice, items):
+    """Make ``invoice.items`` match ``items``, writing only the differences.
+
+    Items are matched by ``id``: matched rows are updated where a value
+    changed, items without a known ``id`` are inserted, and rows not sent
+    are deleted. Saving unchanged items writes nothing to the item table.
+    """
+    existing = {item.id: item for item in invoice.items}
+    for data in items:
+        current = existing.pop(data.pop('id'), None)
+        if current is None:
+            invoice.items.append(InvoiceItem(**data))
+            continue
+        for key, value in data.items():
+            if getattr(current, key) != value:
+                setattr(current, key, value)
+    for item in existing.values():
+        invoice.items.remove(item)
+
+
 @invoices_bp.put('/api/invoices/<int:invoice_id>')
 def update_invoice(invoice_id):
     db = SessionLocal()
@@ -132,69 +185,30 @@ def update_invoice(invoice_id):
     if not invoice:
         return jsonify({'error': 'Invoice not found'}), 404
 
-    invoice_number = (data.get('invoiceNumber') or '').strip()
-    customer_id = data.get('customerId')
+    before = invoice_fact(invoice)
+    previous_total = invoice.total
     try:
-        customer_id = int(customer_id)
-    except (TypeError, ValueError):
-        customer_id = None
-
-    if not invoice_number or not customer_id:
-        return jsonify({'error': 'Invoice number and customer are required'}), 400
+        values, items = parse_invoice_payload(data, item_ids=True)
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
 
-    line_items = data.get('lineItems') or []
-    parsed_items = []
-    subtotal = 0.0
-
-    for item in line_items:
-        description = (item.get('description') or '').strip()
-        if not description:
-            continue
-        quantity = parse_float(item.get('quantity'), 0.0)
-        rate = parse_float(item.get('rate'), 0.0)
-        amount = quantity * rate
-        subtotal += amount
-        parsed_items.append({
-            'description': description,
-            'quantity': quantity,
-            'rate': rate,
-        })
-
-    tax_rate = parse_float(data.get('taxRate'), 0.0)
-    tax_total = subtotal * (tax_rate / 100.0)
-    discount_total = parse_float(data.get('discountTotal'), 0.0)
-    total = subtotal + tax_total - discount_total
-
-    invoice.invoice_number = invoice_number
-    invoice.customer_id = customer_id
-    invoice.status = normalize_status(data.get('status'))
-    invoice.issue_date = data.get('issueDate')
-    invoice.due_date = data.get('dueDate')
-    invoice.payment_terms = data.get('paymentTerms')
-    invoice.notes = data.get('notes')
-    invoice.terms = data.get('terms')
-    invoice.tax_rate = tax_rate
-    invoice.subtotal = subtotal
-    invoice.tax_total = tax_total
-    invoice.discount_total = discount_total
-    invoice.total = total
+    for key, value in values.items():
+        setattr(invoice, key, value)
     invoice.updated_at = datetime.datetime.utcnow().isoformat()
+    _merge_items(invoice, items)
 
-    db.query(InvoiceItem).filter(InvoiceItem.invoice_id == invoice.id).delete()
-
-    for item in parsed_items:
-        db.add(InvoiceItem(
-            invoice_id=invoice.id,
-            description=item['description'],
-            quantity=item['quantity'],
-            rate=item['rate'],
-        ))
+    apply_change(db, before, invoice_fact(invoice))
+    bump_versions(db, 'invoices')
 
     try:
-        db.commit()
+        db.flush()
     except IntegrityError:
         db.rollback()
         return jsonify({'error': 'Invoice number must be unique'}), 400
+    if invoice.total != previous_total:
+        # A new total moves the balance due, which can settle or reopen the invoice.
+        refresh_invoices(db, [invoice.id])
+    db.commit()
 
     invoice = (
         db.query(Invoice)
@@ -211,6 +225,9 @@ def delete_invoice(invoice_id):
     invoice = db.query(Invoice).filter(Invoice.id == invoice_id).first()
     if not invoice:
         return jsonify({'error': 'Invoice not found'}), 404
+    apply_change(db, invoice_fact(invoice), None)
+    release_invoice(db, invoice.id)
+    bump_versions(db, 'invoices')
     db.delete(invoice)
     db.commit()
     return jsonify({'status': 'ok'}), 200
@@ -1,14 +1,40 @@
 """Payment routes."""
+import csv
 import datetime
+import io
 from typing import Any, Dict, Optional
 
 from flask import Blueprint, jsonify, request
 from sqlalchemy.exc import SQLAlchemyError
-
+from sqlalchemy.orm import defaultload, joinedload, noload
+
+from allocations import (
+    apply_remittance,
+    check_allocations,
+    parse_allocations,
+    payment_allocations,
+    read_remittance_csv,
+    refresh_invoices,
+    set_allocations,
+    single_allocation,
+)
+from cache import bump_versions, conditional
+from fieldsets import Field, load_options, parse_fields, serialize
 from models import SessionLocal, Payment, Invoice, Vendor, Customer
+from pagination import page_payload, paginate, parse_page_args, parse_sort, sort_query
+from streaming import stream_query, wants_ndjson
+from utils import format_date, parse_date_arg, parse_int_arg, parse_iso_date
 
 payments_bp = Blueprint('payments', __name__)
 
+# Default listing order; the id makes the ordering total.
+PAYMENT_DEFAULT_SORT = [(Payment.id, False)]
+PAYMENT_SORT_FIELDS = {
+    'id': Payment.id,
+    'date': Payment.date,
+    'amount': Payment.amount,
+}
+
 
 def _serialize_party(party: Any, party_type: str) -> Optional[Dict[str, Any]]:
     """Serialize a vendor or customer record."""
@@ -47,34 +73,51 @@ def _serialize_invoice(invoice: Optional[Invoice]) -> Optional[Dict[str, Any]]:
         'invoiceNumber': invoice.invoice_number,
         'status': invoice.status,
         'total': invoice.total,
+        'balanceDue': invoice.balance_due,
         'customerName': customer_name,
     }
 
 
-def _serialize_payment(payment: Payment) -> Dict[str, Any]:
-    """Serialize a payment record for API responses."""
-    return {
-        'id': payment.id,
-        'amount': payment.amount,
-        'date': payment.date,
-        'paymentMethod': payment.payment_method,
-        'referenceNumber': payment.reference_number,
-        'notes': payment.notes,
-        'invoiceId': payment.invoice_id,
-        'vendorId': payment.vendor_id,
-        'customerId': payment.customer_id,
-        'createdAt': payment.created_at,
-        'updatedAt': payment.updated_at,
-        'invoice': _serialize_invoice(payment.invoice),
-        'vendor': _serialize_party(payment.vendor, 'vendor'),
-        'customer': _serialize_party(payment.customer, 'customer'),
-    }
+PAYMENT_FIELDS = {
+    'id': Field(lambda payment: payment.id, (Payment.id,)),
+    'amount': Field(lambda payment: payment.amount, (Payment.amount,)),
+    'date': Field(lambda payment: format_date(payment.date), (Payment.date,)),
+    'paymentMethod': Field(lambda payment: payment.payment_method, (Payment.payment_method,)),
+    'referenceNumber': Field(lambda payment: payment.reference_number, (Payment.reference_number,)),
+    'notes': Field(lambda payment: payment.notes, (Payment.notes,)),
+    'invoiceId': Field(lambda payment: payment.invoice_id, (Payment.invoice_id,)),
+    'vendorId': Field(lambda payment: payment.vendor_id, (Payment.vendor_id,)),
+    'customerId': Field(lambda payment: payment.customer_id, (Payment.customer_id,)),
+    'createdAt': Field(lambda payment: payment.created_at, (Payment.created_at,)),
+    'updatedAt': Field(lambda payment: payment.updated_at, (Payment.updated_at,)),
+    'invoice': Field(lambda payment: _serialize_invoice(payment.invoice), (Payment.invoice,)),
+    'vendor': Field(lambda payment: _serialize_party(payment.vendor, 'vendor'), (Payment.vendor,)),
+    'customer': Field(lambda payment: _serialize_party(payment.customer, 'customer'), (Payment.customer,)),
+    'allocations': Field(
+        lambda payment: [
+            {'invoiceId': allocation.invoice_id, 'amount': allocation.amount}
+            for allocation in payment.allocations
+        ],
+        (Payment.allocations,),
+    ),
+}
+
+
+# The linked invoice is serialized as a summary that names its customer but
+# omits its line items; loading the customer in the same query avoids one
+# lazy load per payment.
+INVOICE_SUMMARY_LOAD = defaultload(Payment.invoice).options(noload(Invoice.items), joinedload(Invoice.customer))
+
+
+def _serialize_payment(payment: Payment, fields=None) -> Dict[str, Any]:
+    """Serialize a payment record for API responses, optionally only ``fields``."""
+    return serialize(payment, PAYMENT_FIELDS, fields)
 
 
 def _apply_payload(payment: Payment, data: Dict[str, Any]) -> None:
     """Apply payload data to a payment instance."""
     payment.amount = float(data.get('amount') or 0)
-    payment.date = (data.get('date') or '').strip()
+    payment.date = parse_iso_date((data.get('date') or '').strip())
     payment.payment_method = (data.get('paymentMethod') or '').strip() or None
     payment.reference_number = (data.get('referenceNumber') or '').strip() or None
     payment.notes = (data.get('notes') or '').strip() or None
@@ -98,22 +141,87 @@ def _apply_payload(payment: Payment, data: Dict[str, Any]) -> None:
         payment.customer_id = None
 
 
+def _payload_type_error(data: Dict[str, Any]) -> Optional[str]:
+    """Message for a JSON payload field of the wrong type, or ``None``."""
+    amount = data.get('amount')
+    if amount is not None and (isinstance(amount, bool) or not isinstance(amount, (int, float, str))):
+        return 'Amount must be a number'
+    for key in ('date', 'paymentMethod', 'referenceNumber', 'notes'):
+        if data.get(key) is not None and not isinstance(data[key], str):
+            return f'{key} must be a string'
+    return None
+
+
+def _resolve_allocations(db, payment: Payment, data: Dict[str, Any], current: Dict[int, float]) -> Dict[int, float]:
+    """The allocations a payment body asks for, checked against the invoices.
+
+    Without an ``allocations`` array, the payment's ``invoiceId`` receives as
+    much of it as the invoice's balance due allows; without either, the
+    ``current`` allocations are kept. Raises ``ValueError`` with a
+    client-facing message.
+    """
+    allocations = parse_allocations(data)
+    if allocations is None:
+        if payment.invoice_id:
+            return single_allocation(db, payment.invoice_id, payment.amount, current)
+        allocations = current
+    check_allocations(db, payment.amount, allocations, current)
+    payment.invoice_id = next(iter(allocations)) if len(allocations) == 1 else None
+    return allocations
+
+
+def _filter_payments(query, args):
+    """Apply the ``from``/``to``, ``invoiceId``, ``customerId`` and ``vendorId`` list filters."""
+    start = parse_date_arg(args, 'from')
+    end = parse_date_arg(args, 'to')
+    if start:
+        query = query.filter(Payment.date >= start)
+    if end:
+        query = query.filter(Payment.date <= end)
+    for name, column in (
+        ('invoiceId', Payment.invoice_id),
+        ('customerId', Payment.customer_id),
+        ('vendorId', Payment.vendor_id),
+    ):
+        value = parse_int_arg(args, name)
+        if value is not None:
+            query = query.filter(column == value)
+    return query
+
+
 @payments_bp.get('/api/payments')
+@conditional('payments', 'invoices', 'vendors', 'customers')
 def list_payments():
-    """Return all payments."""
+    """Stream matching payments, or return one page of them when ``limit`` is given."""
     db = SessionLocal()
     try:
-        payments = db.query(Payment).all()
-        return jsonify([_serialize_payment(payment) for payment in payments]), 200
+        keys = parse_sort(request.args, PAYMENT_SORT_FIELDS, PAYMENT_DEFAULT_SORT)
+        page = parse_page_args(request.args, keys)
+        fields = parse_fields(request.args, PAYMENT_FIELDS)
+        ndjson = wants_ndjson(request)
+        query = db.query(Payment).options(INVOICE_SUMMARY_LOAD)
+        query = _filter_payments(query, request.args)
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+
+    if fields is not None:
+        query = query.options(*load_options(Payment, PAYMENT_FIELDS, fields, [key for key, _ in keys]))
+    try:
+        if page.limit is None:
+            return stream_query(sort_query(query, keys), lambda payment: _serialize_payment(payment, fields), ndjson), 200
+        payments, next_cursor = paginate(query, keys, page)
+        data = [_serialize_payment(payment, fields) for payment in payments]
+        return jsonify(page_payload(data, next_cursor, page)), 200
     except SQLAlchemyError as exc:
         return jsonify({'error': 'Failed to load payments', 'details': str(exc)}), 500
 
 
 @payments_bp.get('/api/payments/<int:payment_id>')
+@conditional('payments', 'invoices', 'vendors', 'customers')
 def get_payment(payment_id: int):
     """Return a single payment."""
     db = SessionLocal()
-    payment = db.query(Payment).filter(Payment.id == payment_id).first()
+    payment = db.query(Payment).options(INVOICE_SUMMARY_LOAD).filter(Payment.id == payment_id).first()
     if not payment:
         return jsonify({'error': 'Payment not found'}), 404
     return jsonify(_serialize_payment(payment)), 200
@@ -135,6 +243,10 @@ def create_payment():
         return jsonify({'error': 'Amount must be greater than zero'}), 400
     if not payment.date:
         return jsonify({'error': 'Payment date is required'}), 400
+    try:
+        allocations = _resolve_allocations(db, payment, data, {})
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
 
     if payment.invoice_id:
         invoice = db.query(Invoice).filter(Invoice.id == payment.invoice_id).first()
@@ -163,11 +275,66 @@ def create_payment():
     payment.updated_at = now
 
     db.add(payment)
+    bump_versions(db, 'payments')
+    db.flush()
+    set_allocations(db, payment.id, allocations, current={})
     db.commit()
     db.refresh(payment)
     return jsonify(_serialize_payment(payment)), 201
 
 
+@payments_bp.post('/api/payments/remittance')
+def apply_payment_remittance():
+    """Record one payment split across the invoices of a remittance advice.
+
+    Takes a JSON body with the payment fields and ``lines`` of
+    ``{"invoiceNumber", "amount"}``, or a ``text/csv`` body with those
+    columns and the payment fields as query arguments.
+    """
+    db = SessionLocal()
+    try:
+        if request.mimetype == 'text/csv':
+            data = request.args
+            lines = read_remittance_csv(io.TextIOWrapper(request.stream, encoding='utf-8-sig', newline=''))
+        else:
+            data = request.get_json(force=True, silent=True)
+            if not isinstance(data, dict) or not isinstance(data.get('lines'), list):
+                return jsonify({'error': 'Expected a JSON object with lines or a text/csv body'}), 400
+            type_error = _payload_type_error(data)
+            if type_error:
+                return jsonify({'error': type_error}), 400
+            lines = enumerate(data['lines'], start=1)
+
+        payment = Payment()
+        try:
+            _apply_payload(payment, data)
+        except ValueError:
+            return jsonify({'error': 'Amount must be a number'}), 400
+        if payment.amount < 0:
+            return jsonify({'error': 'Amount must not be negative'}), 400
+        if not payment.date:
+            return jsonify({'error': 'Payment date is required'}), 400
+        if payment.customer_id and not db.query(Customer.id).filter(Customer.id == payment.customer_id).first():
+            return jsonify({'error': 'Customer not found'}), 400
+        if payment.vendor_id and not db.query(Vendor.id).filter(Vendor.id == payment.vendor_id).first():
+            return jsonify({'error': 'Vendor not found'}), 400
+
+        now = datetime.datetime.utcnow().isoformat()
+        payment.created_at = now
+        payment.updated_at = now
+        report = apply_remittance(db, payment, lines)
+    except (ValueError, csv.Error) as exc:
+        return jsonify({'error': str(exc)}), 400
+
+    if not report['applied']:
+        db.rollback()
+        return jsonify({'error': 'No remittance line could be applied', **report}), 400
+    bump_versions(db, 'payments')
+    db.commit()
+    db.refresh(payment)
+    return jsonify({'payment': _serialize_payment(payment), **report}), 201
+
+
 @payments_bp.put('/api/payments/<int:payment_id>')
 def update_payment(payment_id: int):
     """Update an existing payment."""
@@ -183,6 +350,11 @@ def update_payment(payment_id: int):
         return jsonify({'error': 'Amount must be greater than zero'}), 400
     if not payment.date:
         return jsonify({'error': 'Payment date is required'}), 400
+    current = payment_allocations(db, payment.id)
+    try:
+        allocations = _resolve_allocations(db, payment, data, current)
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
 
     if payment.invoice_id:
         invoice = db.query(Invoice).filter(Invoice.id == payment.invoice_id).first()
@@ -209,6 +381,9 @@ def update_payment(payment_id: int):
         payment.customer = None
 
     payment.updated_at = datetime.datetime.utcnow().isoformat()
+    bump_versions(db, 'payments')
+    db.flush()
+    set_allocations(db, payment.id, allocations, current)
 
     db.commit()
     db.refresh(payment)
@@ -223,6 +398,10 @@ def delete_payment(payment_id: int):
     if not payment:
         return jsonify({'error': 'Payment not found'}), 404
 
+    invoice_ids = [allocation.invoice_id for allocation in payment.allocations]
+    bump_versions(db, 'payments')
     db.delete(payment)
+    db.flush()
+    refresh_invoices(db, invoice_ids)
     db.commit()
     return jsonify({'status': 'ok'}), 200
@@ -0,0 +1,689 @@
+"""Reporting routes."""
+import datetime
+import heapq
+import json
+import math
+from itertools import groupby
+
+from flask import Blueprint, current_app, jsonify, request
+from sqlalchemy import case, func, or_
+from sqlalchemy.exc import IntegrityError
+
+from analytics import get_report_engine
+from models import SessionLocal, Invoice, Customer, Expense, Payment, PaymentAllocation, TaxSettings, TaxPeriodSnapshot
+from utils import parse_iso_date
+
+reports_bp = Blueprint('reports', __name__)
+
+# Invoice statuses that still count as receivable.
+OPEN_STATUSES = ('sent', 'overdue')
+# Invoice statuses that count as billed for tax purposes.
+BILLED_STATUSES = ('sent', 'overdue', 'paid')
+
+# (key, label, maximum days past due); the last bucket is open-ended.
+AGING_BUCKETS = (
+    ('current', 'Current', 0),
+    ('days1To30', '1-30', 30),
+    ('days31To60', '31-60', 60),
+    ('days61To90', '61-90', 90),
+    ('days90Plus', '90+', None),
+)
+
+GRANULARITIES = ('month', 'quarter', 'year')
+MONTHS_PER_PERIOD = {'month': 1, 'quarter': 3, 'year': 12}
+# Periods one report may list, e.g. 20 years of months.
+MAX_REPORT_PERIODS = 240
+
+CASH_FLOW_GRANULARITIES = ('day', 'month')
+
+LEADERBOARD_METRICS = ('billed', 'paid', 'outstanding')
+MAX_LEADERBOARD_SIZE = 100
+
+
+def _date_arg(name, default):
+    """Read a date query parameter; returns None when it is malformed."""
+    value = request.args.get(name)
+    if not value:
+        return default
+    return parse_iso_date(value)
+
+
+def period_start(value, granularity):
+    """Return the first day of the period containing ``value``."""
+    if granularity == 'year':
+        return datetime.date(value.year, 1, 1)
+    if granularity == 'quarter':
+        return datetime.date(value.year, (value.month - 1) // 3 * 3 + 1, 1)
+    return datetime.date(value.year, value.month, 1)
+
+
+def next_period(start, granularity):
+    """Return the first day of the period following ``start``.
+
+    Raises ``ValueError`` for the last period before ``datetime.date.max``.
+    """
+    index = start.year * 12 + start.month - 1 + MONTHS_PER_PERIOD[granularity]
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def period_end(start, granularity):
+    """Return the last day of the period starting on ``start``."""
+    try:
+        return next_period(start, granularity) - datetime.timedelta(days=1)
+    except ValueError:
+        return datetime.date.max
+
+
+def period_count(start, end, granularity):
+    """Number of periods covering ``start``..``end``."""
+    first, last = period_start(start, granularity), period_start(end, granularity)
+    months = (last.year - first.year) * 12 + last.month - first.month
+    return months // MONTHS_PER_PERIOD[granularity] + 1
+
+
+def _period_range_error(start, end, granularity):
+    """Client-facing message when ``start``..``end`` spans too many periods, else None."""
+    if period_count(start, end, granularity) > MAX_REPORT_PERIODS:
+        return (f'The range spans more than {MAX_REPORT_PERIODS} {granularity}s; '
+                f'narrow it or use a coarser granularity')
+    return None
+
+
+def period_label(start, granularity):
+    """Human-readable key for a period, e.g. ``2024-03``, ``2024-Q1``, ``2024``."""
+    if granularity == 'year':
+        return str(start.year)
+    if granularity == 'quarter':
+        return f'{start.year}-Q{(start.month - 1) // 3 + 1}'
+    return start.strftime('%Y-%m')
+
+
+def iter_periods(start, end, granularity):
+    """Yield ``(period_start, period_end)`` pairs covering ``start``..``end``."""
+    current = period_start(start, granularity)
+    last = period_start(end, granularity)
+    while True:
+        yield current, period_end(current, granularity)
+        if current >= last:
+            return
+        current = next_period(current, granularity)
+
+
+def _monthly_revenue(db, start, end):
+    """Paid invoice totals as ``(year, month, amount)`` rows."""
+    year = func.extract('year', Invoice.issue_date)
+    month = func.extract('month', Invoice.issue_date)
+    return (
+        db.query(year, month, func.sum(Invoice.total))
+        .filter(
+            Invoice.status == 'paid',
+            Invoice.issue_date >= start,
+            Invoice.issue_date <= end,
+        )
+        .group_by(year, month)
+        .all()
+    )
+
+
+def _monthly_expenses(db, start, end):
+    """Expense totals as ``(year, month, type, tag, amount)`` rows."""
+    year = func.extract('year', Expense.date)
+    month = func.extract('month', Expense.date)
+    return (
+        db.query(year, month, Expense.type, Expense.tag, func.sum(Expense.amount))
+        .filter(Expense.date >= start, Expense.date <= end)
+        .group_by(year, month, Expense.type, Expense.tag)
+        .all()
+    )
+
+
+def _monthly_revenue_columnar(engine, start, end):
+    """Columnar-engine equivalent of :func:`_monthly_revenue`."""
+    groups = engine.group_sum(
+        'invoices',
+        'total',
+        ['issue_date__month'],
+        equals={'status': 'paid'},
+        between={'issue_date': (start, end)},
+    )
+    return [(year, month, amount) for ((year, month),), amount in groups.items()]
+
+
+def _monthly_expenses_columnar(engine, start, end):
+    """Columnar-engine equivalent of :func:`_monthly_expenses`."""
+    groups = engine.group_sum(
+        'expenses',
+        'amount',
+        ['date__month', 'type', 'tag'],
+        between={'date': (start, end)},
+    )
+    return [
+        (year, month, expense_type, tag, amount)
+        for ((year, month), expense_type, tag), amount in groups.items()
+    ]
+
+
+def days_between(db, later, earlier):
+    """SQL expression for the number of days from ``earlier`` to ``later``."""
+    if db.get_bind().dialect.name == 'sqlite':
+        return func.julianday(later) - func.julianday(earlier)
+    return later - earlier
+
+
+def _customer_aggregates(db, customer_id=None):
+    """Billed, paid and outstanding figures keyed by customer id.
+
+    Paid amounts come from payment allocations, and outstanding amounts are
+    the balances due of open invoices.
+    """
+    is_billed = Invoice.status != 'draft'
+    is_open = Invoice.status.in_(OPEN_STATUSES)
+    invoice_query = db.query(
+        Invoice.customer_id,
+        func.sum(case((is_billed, Invoice.total), else_=0.0)),
+        func.sum(case((is_open, Invoice.balance_due), else_=0.0)),
+        func.sum(case((is_billed, 1), else_=0)),
+        func.min(Invoice.issue_date),
+    )
+    payment_query = (
+        db.query(
+            Invoice.customer_id,
+            func.sum(PaymentAllocation.amount),
+            func.count(func.distinct(PaymentAllocation.payment_id)),
+            func.avg(days_between(db, Payment.date, Invoice.issue_date)),
+            func.max(Payment.date),
+        )
+        .select_from(PaymentAllocation)
+        .join(Invoice, PaymentAllocation.invoice_id == Invoice.id)
+        .join(Payment, PaymentAllocation.payment_id == Payment.id)
+    )
+    if customer_id is not None:
+        invoice_query = invoice_query.filter(Invoice.customer_id == customer_id)
+        payment_query = payment_query.filter(Invoice.customer_id == customer_id)
+
+    entries = {}
+
+    def entry(key):
+        return entries.setdefault(key, {
+            'customerId': key,
+            'billed': 0.0,
+            'paid': 0.0,
+            'outstanding': 0.0,
+            'invoiceCount': 0,
+            'paymentCount': 0,
+            'averageDaysToPay': None,
+            'firstInvoiceDate': None,
+            'lastPaymentDate': None,
+        })
+
+    for key, billed, outstanding, invoice_count, first_invoice in invoice_query.group_by(Invoice.customer_id):
+        target = entry(key)
+        target['billed'] = billed or 0.0
+        target['outstanding'] = outstanding or 0.0
+        target['invoiceCount'] = int(invoice_count or 0)
+        target['firstInvoiceDate'] = first_invoice
+
+    for key, paid, payment_count, average_days, last_payment in payment_query.group_by(Invoice.customer_id):
+        target = entry(key)
+        target['paid'] = paid or 0.0
+        target['paymentCount'] = payment_count
+        target['averageDaysToPay'] = average_days
+        target['lastPaymentDate'] = last_payment
+
+    return entries
+
+
+def _finish_customer_entry(entry, name):
+    """Round amounts and format dates of an aggregate entry."""
+    result = dict(entry, customerName=name or 'Unknown')
+    for key in ('billed', 'paid', 'outstanding'):
+        result[key] = round(entry[key], 2)
+    if entry['averageDaysToPay'] is not None:
+        result['averageDaysToPay'] = round(float(entry['averageDaysToPay']), 1)
+    for key in ('firstInvoiceDate', 'lastPaymentDate'):
+        value = parse_iso_date(entry[key])
+        result[key] = value.isoformat() if value else None
+    return result
+
+
+def _days_before(day, days):
+    """``day`` minus ``days`` days, clamped to ``datetime.date.min``."""
+    try:
+        return day - datetime.timedelta(days=days)
+    except OverflowError:
+        return datetime.date.min
+
+
+@reports_bp.get('/api/reports/ar-aging')
+def get_ar_aging():
+    """Accounts-receivable aging per customer as of a given date, by balance due."""
+    as_of = _date_arg('asOf', datetime.date.today())
+    if not as_of:
+        return jsonify({'error': 'asOf must be in YYYY-MM-DD format'}), 400
+
+    whens = [(or_(Invoice.due_date.is_(None), Invoice.due_date >= as_of), AGING_BUCKETS[0][0])]
+    for key, _, max_days in AGING_BUCKETS[1:-1]:
+        whens.append((Invoice.due_date >= _days_before(as_of, max_days), key))
+    bucket = case(*whens, else_=AGING_BUCKETS[-1][0]).label('bucket')
+
+    db = SessionLocal()
+    rows = (
+        db.query(
+            Invoice.customer_id,
+            Customer.name,
+            bucket,
+            func.sum(Invoice.balance_due),
+            func.count(Invoice.id),
+        )
+        .outerjoin(Customer, Invoice.customer_id == Customer.id)
+        .filter(Invoice.status.in_(OPEN_STATUSES), Invoice.balance_due > 0)
+        .group_by(Invoice.customer_id, Customer.name, bucket)
+        .all()
+    )
+
+    empty = {key: 0.0 for key, _, _ in AGING_BUCKETS}
+    totals = dict(empty, total=0.0, invoiceCount=0)
+    customers = {}
+    for customer_id, customer_name, bucket_key, amount, count in rows:
+        amount = amount or 0.0
+        entry = customers.setdefault(customer_id, dict(
+            empty,
+            customerId=customer_id,
+            customerName=customer_name or 'Unknown',
+            total=0.0,
+            invoiceCount=0,
+        ))
+        for target in (entry, totals):
+            target[bucket_key] += amount
+            target['total'] += amount
+            target['invoiceCount'] += count
+
+    def rounded(entry):
+        return {key: round(value, 2) if isinstance(value, float) else value for key, value in entry.items()}
+
+    return jsonify({
+        'asOf': as_of.isoformat(),
+        'buckets': [{'key': key, 'label': label} for key, label, _ in AGING_BUCKETS],
+        'totals': rounded(totals),
+        'customers': [
+            rounded(entry)
+            for entry in sorted(customers.values(), key=lambda entry: entry['total'], reverse=True)
+        ],
+    }), 200
+
+
+@reports_bp.get('/api/reports/profit-loss')
+def get_profit_loss():
+    """Revenue from paid invoices against expenses by type and tag per period."""
+    today = datetime.date.today()
+    start = _date_arg('from', datetime.date(today.year, 1, 1))
+    end = _date_arg('to', today)
+    granularity = (request.args.get('granularity') or 'month').lower()
+
+    if not start or not end:
+        return jsonify({'error': 'from and to must be in YYYY-MM-DD format'}), 400
+    if start > end:
+        return jsonify({'error': 'from must not be after to'}), 400
+    if granularity not in GRANULARITIES:
+        return jsonify({'error': f"granularity must be one of {', '.join(GRANULARITIES)}"}), 400
+    error = _period_range_error(start, end, granularity)
+    if error:
+        return jsonify({'error': error}), 400
+
+    db = SessionLocal()
+    if current_app.config.get('REPORT_ENGINE') == 'columnar':
+        engine = get_report_engine(db)
+        revenue_rows = _monthly_revenue_columnar(engine, start, end)
+        expense_rows = _monthly_expenses_columnar(engine, start, end)
+    else:
+        revenue_rows = _monthly_revenue(db, start, end)
+        expense_rows = _monthly_expenses(db, start, end)
+
+    periods = {
+        period_start_date: {
+            'period': period_label(period_start_date, granularity),
+            'start': period_start_date.isoformat(),
+            'end': period_end_date.isoformat(),
+            'revenue': 0.0,
+            'expenses': 0.0,
+            'byType': {},
+            'byTag': {},
+        }
+        for period_start_date, period_end_date in iter_periods(start, end, granularity)
+    }
+    totals = {'revenue': 0.0, 'expenses': 0.0, 'byType': {}, 'byTag': {}}
+
+    def bucket(year, month):
+        return periods[period_start(datetime.date(int(year), int(month), 1), granularity)]
+
+    for year, month, amount in revenue_rows:
+        amount = amount or 0.0
+        bucket(year, month)['revenue'] += amount
+        totals['revenue'] += amount
+
+    for year, month, expense_type, tag, amount in expense_rows:
+        amount = amount or 0.0
+        for target in (bucket(year, month), totals):
+            target['expenses'] += amount
+            target['byType'][expense_type] = target['byType'].get(expense_type, 0.0) + amount
+            target['byTag'][tag] = target['byTag'].get(tag, 0.0) + amount
+
+    def finish(entry):
+        result = {key: value for key, value in entry.items() if key not in ('byType', 'byTag')}
+        result['revenue'] = round(entry['revenue'], 2)
+        result['expenses'] = round(entry['expenses'], 2)
+        result['netProfit'] = round(entry['revenue'] - entry['expenses'], 2)
+        result['expensesByType'] = [
+            {'type': expense_type, 'amount': round(amount, 2)}
+            for expense_type, amount in sorted(entry['byType'].items(), key=lambda item: -item[1])
+        ]
+        result['expensesByTag'] = [
+            {'tag': tag, 'amount': round(amount, 2)}
+            for tag, amount in sorted(entry['byTag'].items(), key=lambda item: -item[1])
+        ]
+        return result
+
+    return jsonify({
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'granularity': granularity,
+        'periods': [finish(periods[key]) for key in sorted(periods)],
+        'totals': finish(totals),
+    }), 200
+
+
+@reports_bp.get('/api/reports/customers/top')
+def get_top_customers():
+    """Top customers by billed, paid or outstanding amount."""
+    metric = request.args.get('by') or 'billed'
+    if metric not in LEADERBOARD_METRICS:
+        return jsonify({'error': f"by must be one of {', '.join(LEADERBOARD_METRICS)}"}), 400
+    try:
+        limit = int(request.args.get('limit') or 10)
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    limit = max(1, min(limit, MAX_LEADERBOARD_SIZE))
+
+    db = SessionLocal()
+    entries = _customer_aggregates(db)
+    top = heapq.nlargest(limit, entries.values(), key=lambda entry: entry[metric])
+
+    names = dict(
+        db.query(Customer.id, Customer.name)
+        .filter(Customer.id.in_([entry['customerId'] for entry in top]))
+        .all()
+    ) if top else {}
+
+    return jsonify({
+        'by': metric,
+        'limit': limit,
+        'customers': [_finish_customer_entry(entry, names.get(entry['customerId'])) for entry in top],
+    }), 200
+
+
+@reports_bp.get('/api/reports/customers/<int:customer_id>/lifetime-value')
+def get_customer_lifetime_value(customer_id):
+    """Lifetime billed, paid and outstanding totals for one customer."""
+    db = SessionLocal()
+    customer = db.query(Customer.id, Customer.name).filter(Customer.id == customer_id).first()
+    if not customer:
+        return jsonify({'error': 'Customer not found'}), 404
+
+    entries = _customer_aggregates(db, customer_id)
+    entry = entries.get(customer_id) or {
+        'customerId': customer_id,
+        'billed': 0.0,
+        'paid': 0.0,
+        'outstanding': 0.0,
+        'invoiceCount': 0,
+        'paymentCount': 0,
+        'averageDaysToPay': None,
+        'firstInvoiceDate': None,
+        'lastPaymentDate': None,
+    }
+    return jsonify(_finish_customer_entry(entry, customer.name)), 200
+
+
+def _dated_amounts(db, model, start, end, sign, batch_size=1000):
+    """Stream ``(date, signed amount)`` pairs of ``model`` in date order."""
+    rows = (
+        db.query(model.date, model.amount)
+        .filter(model.date >= start, model.date <= end)
+        .order_by(model.date)
+        .yield_per(batch_size)
+    )
+    for day, amount in rows:
+        yield day, sign * (amount or 0.0)
+
+
+@reports_bp.get('/api/reports/cash-flow')
+def get_cash_flow():
+    """Payments in and expenses out per day or month with a running balance."""
+    today = datetime.date.today()
+    start = _date_arg('from', datetime.date(today.year, 1, 1))
+    end = _date_arg('to', today)
+    granularity = (request.args.get('granularity') or 'month').lower()
+
+    if not start or not end:
+        return jsonify({'error': 'from and to must be in YYYY-MM-DD format'}), 400
+    if start > end:
+        return jsonify({'error': 'from must not be after to'}), 400
+    if granularity not in CASH_FLOW_GRANULARITIES:
+        return jsonify({'error': f"granularity must be one of {', '.join(CASH_FLOW_GRANULARITIES)}"}), 400
+
+    db = SessionLocal()
+    opening = request.args.get('openingBalance')
+    if opening not in (None, ''):
+        try:
+            opening = float(opening)
+        except ValueError:
+            opening = None
+        # float() also reads 'nan' and 'inf', which cannot be written as JSON.
+        if opening is None or not math.isfinite(opening):
+            return jsonify({'error': 'openingBalance must be a number'}), 400
+    else:
+        inflow_before = db.query(func.sum(Payment.amount)).filter(Payment.date < start).scalar() or 0.0
+        outflow_before = db.query(func.sum(Expense.amount)).filter(Expense.date < start).scalar() or 0.0
+        opening = inflow_before - outflow_before
+
+    movements = heapq.merge(
+        _dated_amounts(db, Payment, start, end, 1),
+        _dated_amounts(db, Expense, start, end, -1),
+        key=lambda movement: movement[0],
+    )
+    if granularity == 'day':
+        bucket_of = lambda movement: movement[0].isoformat()
+    else:
+        bucket_of = lambda movement: movement[0].strftime('%Y-%m')
+
+    balance = opening
+    total_inflow = total_outflow = 0.0
+    periods = []
+    for period, group in groupby(movements, key=bucket_of):
+        inflow = outflow = 0.0
+        for _, amount in group:
+            if amount >= 0:
+                inflow += amount
+            else:
+                outflow -= amount
+        balance += inflow - outflow
+        total_inflow += inflow
+        total_outflow += outflow
+        periods.append({
+            'period': period,
+            'inflow': round(inflow, 2),
+            'outflow': round(outflow, 2),
+            'net': round(inflow - outflow, 2),
+            'balance': round(balance, 2),
+        })
+
+    return jsonify({
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'granularity': granularity,
+        'openingBalance': round(opening, 2),
+        'closingBalance': round(balance, 2),
+        'totals': {
+            'inflow': round(total_inflow, 2),
+            'outflow': round(total_outflow, 2),
+            'net': round(total_inflow - total_outflow, 2),
+        },
+        'periods': periods,
+    }), 200
+
+
+def _monthly_tax(db, start, end):
+    """Billed invoice tax as ``(year, month, rate, taxable, tax, count)`` rows."""
+    year = func.extract('year', Invoice.issue_date)
+    month = func.extract('month', Invoice.issue_date)
+    return (
+        db.query(
+            year,
+            month,
+            Invoice.tax_rate,
+            func.sum(Invoice.subtotal),
+            func.sum(Invoice.tax_total),
+            func.count(Invoice.id),
+        )
+        .filter(
+            Invoice.status.in_(BILLED_STATUSES),
+            Invoice.issue_date >= start,
+            Invoice.issue_date <= end,
+        )
+        .group_by(year, month, Invoice.tax_rate)
+        .all()
+    )
+
+
+def _tax_rate_names(db):
+    """Map configured tax rates to their names."""
+    settings = db.query(TaxSettings).first()
+    names = {}
+    if not settings:
+        return names
+    if settings.default_tax_rate is not None:
+        names[round(settings.default_tax_rate, 4)] = 'Default'
+    for i in range(1, 6):
+        name = getattr(settings, f'tax_rate_{i}_name')
+        rate = getattr(settings, f'tax_rate_{i}_rate')
+        if name and rate is not None:
+            names[round(rate, 4)] = name
+    return names
+
+
+@reports_bp.get('/api/reports/sales-tax')
+def get_sales_tax():
+    """Sales tax collected per rate and filing period.
+
+    The range is widened to whole periods. Periods that ended more than
+    ``TAX_FILING_GRACE_DAYS`` ago are treated as filed: their figures are
+    computed once and then served from ``tax_period_snapshots`` if they
+    had invoices. Pass ``refresh=true`` to recompute them.
+    """
+    today = datetime.date.today()
+    start = _date_arg('from', datetime.date(today.year, 1, 1))
+    end = _date_arg('to', today)
+    granularity = (request.args.get('granularity') or 'quarter').lower()
+    refresh = (request.args.get('refresh') or '').lower() in ('1', 'true', 'yes')
+
+    if not start or not end:
+        return jsonify({'error': 'from and to must be in YYYY-MM-DD format'}), 400
+    if start > end:
+        return jsonify({'error': 'from must not be after to'}), 400
+    if granularity not in GRANULARITIES:
+        return jsonify({'error': f"granularity must be one of {', '.join(GRANULARITIES)}"}), 400
+    error = _period_range_error(start, end, granularity)
+    if error:
+        return jsonify({'error': error}), 400
+
+    periods = list(iter_periods(start, end, granularity))
+    cutoff = today - datetime.timedelta(days=current_app.config.get('TAX_FILING_GRACE_DAYS', 30))
+    closed = {first for first, last in periods if last < cutoff}
+
+    db = SessionLocal()
+    snapshots = {}
+    if closed:
+        query = db.query(TaxPeriodSnapshot).filter(
+            TaxPeriodSnapshot.granularity == granularity,
+            TaxPeriodSnapshot.period_start.in_(closed),
+        )
+        if refresh:
+            query.delete(synchronize_session=False)
+        else:
+            snapshots = {snapshot.period_start: json.loads(snapshot.rates) for snapshot in query}
+
+    pending = [(first, last) for first, last in periods if first not in snapshots]
+    if pending:
+        computed = {first: {} for first, _ in pending}
+        for year, month, rate, taxable, tax, count in _monthly_tax(db, pending[0][0], pending[-1][1]):
+            first = period_start(datetime.date(int(year), int(month), 1), granularity)
+            if first not in computed:
+                continue
+            entry = computed[first].setdefault(rate or 0.0, {
+                'rate': rate or 0.0,
+                'taxableAmount': 0.0,
+                'taxCollected': 0.0,
+                'invoiceCount': 0,
+            })
+            entry['taxableAmount'] += taxable or 0.0
+            entry['taxCollected'] += tax or 0.0
+            entry['invoiceCount'] += count
+
+        now = datetime.datetime.utcnow().isoformat()
+        for first, rates in computed.items():
+            snapshots[first] = [rates[rate] for rate in sorted(rates)]
+            # Periods without invoices cost nothing to recompute and are not frozen.
+            if first in closed and rates:
+                db.add(TaxPeriodSnapshot(
+                    granularity=granularity,
+                    period_start=first,
+                    rates=json.dumps(snapshots[first]),
+                    created_at=now,
+                ))
+
+    if closed and (refresh or pending):
+        try:
+            db.commit()
+        except IntegrityError:
+            # Another request froze the same period first; our figures match.
+            db.rollback()
+
+    names = _tax_rate_names(db)
+    totals = {}
+
+    def present(entry):
+        return {
+            'rate': entry['rate'],
+            'name': names.get(round(entry['rate'], 4)),
+            'taxableAmount': round(entry['taxableAmount'], 2),
+            'taxCollected': round(entry['taxCollected'], 2),
+            'invoiceCount': entry['invoiceCount'],
+        }
+
+    result_periods = []
+    for first, last in periods:
+        rates = snapshots.get(first, [])
+        for entry in rates:
+            total = totals.setdefault(entry['rate'], dict(entry, taxableAmount=0.0, taxCollected=0.0, invoiceCount=0))
+            total['taxableAmount'] += entry['taxableAmount']
+            total['taxCollected'] += entry['taxCollected']
+            total['invoiceCount'] += entry['invoiceCount']
+        result_periods.append({
+            'period': period_label(first, granularity),
+            'start': first.isoformat(),
+            'end': last.isoformat(),
+            'closed': first in closed,
+            'taxCollected': round(sum(entry['taxCollected'] for entry in rates), 2),
+            'rates': [present(entry) for entry in rates],
+        })
+
+    return jsonify({
+        'from': periods[0][0].isoformat(),
+        'to': periods[-1][1].isoformat(),
+        'granularity': granularity,
+        'periods': result_periods,
+        'totals': {
+            'taxCollected': round(sum(entry['taxCollected'] for entry in totals.values()), 2),
+            'rates': [present(totals[rate]) for rate in sorted(totals)],
+        },
+    }), 200
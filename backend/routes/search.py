@@ -0,0 +1,47 @@
+"""Search routes."""
+from flask import Blueprint, jsonify, request
+
+from cache import conditional
+from models import SessionLocal
+from search import ENTITIES_BY_TYPE, MIN_QUERY_LENGTH, search, search_terms
+from utils import parse_int_arg
+
+search_bp = Blueprint('search', __name__)
+
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+
+
+@search_bp.get('/api/search')
+@conditional('customers', 'vendors', 'invoices', 'expenses')
+def search_entities():
+    """Ranked substring search across customers, vendors, invoices and expenses."""
+    query = (request.args.get('q') or '').strip()
+    if not search_terms(query):
+        return jsonify({
+            'error': f'Search query must contain a term of at least {MIN_QUERY_LENGTH} characters'
+        }), 400
+
+    types = [name.strip() for name in (request.args.get('types') or '').split(',') if name.strip()]
+    unknown = [name for name in types if name not in ENTITIES_BY_TYPE]
+    if unknown:
+        return jsonify({'error': f"types must be among {', '.join(ENTITIES_BY_TYPE)}"}), 400
+
+    try:
+        limit = parse_int_arg(request.args, 'limit')
+        offset = parse_int_arg(request.args, 'offset') or 0
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    limit = min(max(limit or DEFAULT_SEARCH_LIMIT, 1), MAX_SEARCH_LIMIT)
+    offset = max(offset, 0)
+
+    db = SessionLocal()
+    # Fetch one extra hit to know whether another page exists.
+    hits = search(db, query, types, limit + 1, offset)
+    return jsonify({
+        'query': query,
+        'items': hits[:limit],
+        'limit': limit,
+        'offset': offset,
+        'nextOffset': offset + limit if len(hits) > limit else None,
+    }), 200
@@ -0,0 +1,97 @@
+"""Delta sync routes."""
+import heapq
+
+from flask import Blueprint, jsonify, request
+from sqlalchemy.orm import joinedload, selectinload
+
+from cache import conditional
+from fieldsets import serialize
+from models import SessionLocal, Customer, Vendor, Invoice, Expense, Payment, Tombstone, current_change_seq
+from routes.customers import CUSTOMER_FIELDS
+from routes.expenses import EXPENSE_FIELDS
+from routes.payments import INVOICE_SUMMARY_LOAD, PAYMENT_FIELDS
+from routes.vendors import VENDOR_FIELDS
+from utils import parse_int_arg, serialize_invoice
+
+sync_bp = Blueprint('sync', __name__)
+
+DEFAULT_SYNC_LIMIT = 500
+MAX_SYNC_LIMIT = 5000
+
+# ``(table, model, loader options, serializer)`` for every synced table.
+SYNC_TABLES = (
+    ('customers', Customer, (), lambda customer: serialize(customer, CUSTOMER_FIELDS)),
+    ('vendors', Vendor, (), lambda vendor: serialize(vendor, VENDOR_FIELDS)),
+    ('invoices', Invoice, (joinedload(Invoice.customer), selectinload(Invoice.items)), serialize_invoice),
+    ('expenses', Expense, (), lambda expense: serialize(expense, EXPENSE_FIELDS)),
+    ('payments', Payment, (INVOICE_SUMMARY_LOAD,), lambda payment: serialize(payment, PAYMENT_FIELDS)),
+)
+
+
+def _upserts(db, table, model, options, serializer, since, until, limit):
+    rows = (
+        db.query(model)
+        .options(*options)
+        .filter(model.change_seq > since, model.change_seq <= until)
+        .order_by(model.change_seq)
+        .limit(limit)
+    )
+    # Serializing is deferred until the merge has picked the rows to return.
+    return [
+        (row.change_seq, lambda row=row: {'table': table, 'op': 'upsert', 'id': row.id, 'data': serializer(row)})
+        for row in rows
+    ]
+
+
+def _deletes(db, since, until, limit):
+    rows = (
+        db.query(Tombstone)
+        .filter(Tombstone.change_seq > since, Tombstone.change_seq <= until)
+        .order_by(Tombstone.change_seq)
+        .limit(limit)
+    )
+    return [
+        (row.change_seq, lambda row=row: {'table': row.table_name, 'op': 'delete', 'id': row.row_id})
+        for row in rows
+    ]
+
+
+@sync_bp.get('/api/sync')
+@conditional('customers', 'vendors', 'invoices', 'expenses', 'payments')
+def sync_changes():
+    """Rows inserted, updated or deleted after change number ``since``, oldest first."""
+    try:
+        since = parse_int_arg(request.args, 'since') or 0
+        limit = parse_int_arg(request.args, 'limit')
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    if since < 0:
+        return jsonify({'error': 'since must not be negative'}), 400
+    limit = min(max(limit or DEFAULT_SYNC_LIMIT, 1), MAX_SYNC_LIMIT)
+
+    db = SessionLocal()
+    # Everything at or below the committed counter is visible, so reading up
+    # to it cannot skip a change that commits while this request runs.
+    until = current_change_seq(db)
+    streams = [
+        _upserts(db, table, model, options, serializer, since, until, limit + 1)
+        for table, model, options, serializer in SYNC_TABLES
+    ]
+    streams.append(_deletes(db, since, until, limit + 1))
+
+    changes = []
+    next_since = until
+    for seq, build in heapq.merge(*streams, key=lambda entry: entry[0]):
+        if len(changes) == limit:
+            next_since = changes[-1]['seq']
+            break
+        change = build()
+        change['seq'] = seq
+        changes.append(change)
+
+    return jsonify({
+        'changes': changes,
+        'since': since,
+        'nextSince': next_since,
+        'hasMore': next_since < until,
+    }), 200
@@ -1,43 +1,79 @@
 """Vendor CRUD routes."""
 import datetime
 from flask import Blueprint, jsonify, request
+from sqlalchemy import select
+from cache import bump_versions, conditional
+from fieldsets import Field, parse_fields, select_columns, serialize, table_column
 from models import SessionLocal, Vendor
+from pagination import page_payload, paginate_select, parse_page_args, sort_query
+from streaming import stream_select, wants_ndjson
 
 vendors_bp = Blueprint('vendors', __name__)
 
+# Default listing order; the id makes the ordering total.
+VENDOR_DEFAULT_SORT = [(Vendor.id, False)]
+# The same order over plain table columns, for Core selects.
+VENDOR_ROW_SORT = [(table_column(attribute), descending) for attribute, descending in VENDOR_DEFAULT_SORT]
+
+
+def _vendor_address(v):
+    address = {
+        'street': v.street,
+        'city': v.city,
+        'state': v.state,
+        'zipCode': v.zip_code,
+        'country': v.country,
+    }
+    if not any(address.values()):
+        return None
+    return address
+
+
+VENDOR_FIELDS = {
+    'id': Field(lambda v: v.id, (Vendor.id,)),
+    'company': Field(lambda v: (v.company or '').strip(), (Vendor.company,)),
+    'contact': Field(lambda v: (v.contact_name or '').strip() or None, (Vendor.contact_name,)),
+    'email': Field(lambda v: v.email, (Vendor.email,)),
+    'phone': Field(lambda v: v.phone, (Vendor.phone,)),
+    'address': Field(
+        _vendor_address,
+        (Vendor.street, Vendor.city, Vendor.state, Vendor.zip_code, Vendor.country),
+    ),
+    'taxId': Field(lambda v: v.tax_id, (Vendor.tax_id,)),
+    'paymentTerms': Field(lambda v: v.payment_terms, (Vendor.payment_terms,)),
+    'category': Field(lambda v: v.category, (Vendor.category,)),
+    'accountNumber': Field(lambda v: v.account_number, (Vendor.account_number,)),
+    'notes': Field(lambda v: v.notes, (Vendor.notes,)),
+    'isActive': Field(lambda v: v.is_active, (Vendor.is_active,)),
+    'createdAt': Field(lambda v: v.created_at, (Vendor.created_at,)),
+}
+
+
+def _serialize_vendor(v, fields=None):
+    """Serialize a vendor record for API responses, optionally only ``fields``."""
+    return serialize(v, VENDOR_FIELDS, fields)
+
 
 @vendors_bp.get('/api/vendors')
+@conditional('vendors')
 def get_vendors():
+    try:
+        page = parse_page_args(request.args, VENDOR_DEFAULT_SORT)
+        fields = parse_fields(request.args, VENDOR_FIELDS)
+        ndjson = wants_ndjson(request)
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+
     db = SessionLocal()
-    vendors = db.query(Vendor).all()
-    result = []
-    for v in vendors:
-        address = {
-            'street': v.street,
-            'city': v.city,
-            'state': v.state,
-            'zipCode': v.zip_code,
-            'country': v.country,
-        }
-        if not any(address.values()):
-            address = None
-
-        result.append({
-            'id': v.id,
-            'company': (v.company or '').strip(),
-            'contact': (v.contact_name or '').strip() or None,
-            'email': v.email,
-            'phone': v.phone,
-            'address': address,
-            'taxId': v.tax_id,
-            'paymentTerms': v.payment_terms,
-            'category': v.category,
-            'accountNumber': v.account_number,
-            'notes': v.notes,
-            'isActive': v.is_active,
-            'createdAt': v.created_at
-        })
-    return jsonify(result), 200
+    # Read-only listing: Core rows go straight to dicts without building ORM instances.
+    statement = select(*select_columns(VENDOR_FIELDS, fields, [Vendor.id]))
+    if page.limit is None:
+        statement = sort_query(statement, VENDOR_ROW_SORT)
+        return stream_select(db, statement, lambda v: _serialize_vendor(v, fields), ndjson), 200
+
+    vendors, next_cursor = paginate_select(db, statement, VENDOR_ROW_SORT, page)
+    data = [_serialize_vendor(v, fields) for v in vendors]
+    return jsonify(page_payload(data, next_cursor, page)), 200
 
 
 @vendors_bp.post('/api/vendors')
@@ -68,6 +104,7 @@ def create_vendor():
         created_at=datetime.datetime.utcnow().isoformat()
     )
     db.add(vendor)
+    bump_versions(db, 'vendors')
     db.commit()
     return jsonify({'status': 'ok', 'id': vendor.id}), 201
 
@@ -99,6 +136,7 @@ def update_vendor(vendor_id):
     vendor.account_number = data.get('accountNumber')
     vendor.notes = data.get('notes')
     vendor.is_active = data.get('isActive', True)
+    bump_versions(db, 'vendors')
     db.commit()
     return jsonify({'status': 'ok', 'id': vendor.id}), 200
 
@@ -109,6 +147,7 @@ def delete_vendor(vendor_id):
     vendor = db.query(Vendor).filter(Vendor.id == vendor_id).first()
     if not vendor:
         return jsonify({'error': 'Vendor not found'}), 404
+    bump_versions(db, 'vendors')
     db.delete(vendor)
     db.commit()
     return jsonify({'status': 'ok'}), 200
@@ -0,0 +1,221 @@
+"""Cross-entity substring search over customers, vendors, invoices and expenses.
+
+On SQLite the searchable text lives in an FTS5 ``search_index`` table using
+the trigram tokenizer, so any substring of three or more characters is an
+index lookup. Triggers on the source tables keep it in sync with every write
+path, including bulk Core inserts and raw SQL. Each entry's rowid encodes
+the entity: ``id * len(SEARCH_ENTITIES) + code``.
+
+Other databases search the source tables with ``ILIKE``; on PostgreSQL
+:func:`install_search` adds ``pg_trgm`` GIN indexes over the same text
+expressions so those scans are indexed too. SQLite builds without FTS5 or
+the trigram tokenizer (before 3.34) fall back to ``LIKE`` scans.
+"""
+import weakref
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+MIN_QUERY_LENGTH = 3
+
+
+class SearchEntity(NamedTuple):
+    """Searchable text of one entity type; ``title`` and ``body`` are column names."""
+    type: str
+    code: int
+    table: str
+    title: str
+    body: Sequence[str]
+
+
+SEARCH_ENTITIES = (
+    SearchEntity('customer', 0, 'customers', 'name', ('company', 'email', 'phone')),
+    SearchEntity('vendor', 1, 'vendors', 'company', ('name', 'email', 'phone')),
+    SearchEntity('invoice', 2, 'invoices', 'invoice_number', ('notes', 'terms')),
+    SearchEntity('expense', 3, 'expenses', 'description', ('type', 'tag', 'reference_number')),
+)
+ENTITIES_BY_TYPE = {entity.type: entity for entity in SEARCH_ENTITIES}
+STRIDE = len(SEARCH_ENTITIES)
+
+# SQLite engines whose search index was installed by :func:`install_search`.
+_fts_engines = weakref.WeakSet()
+
+
+def _text(columns: Iterable[str], prefix: str = '') -> str:
+    """SQL expression joining ``columns`` with spaces, treating NULL as empty."""
+    return " || ' ' || ".join(f"coalesce({prefix}{column}, '')" for column in columns)
+
+
+def _rowid(entity: SearchEntity, prefix: str = '') -> str:
+    return f"{prefix}id * {STRIDE} + {entity.code}"
+
+
+# -- Installation --------------------------------------------------------------------------
+def _sqlite_triggers(entity: SearchEntity) -> Dict[str, str]:
+    """``{name: CREATE TRIGGER statement}`` keeping ``entity`` in the index."""
+    insert = (
+        f"INSERT INTO search_index (rowid, title, body) VALUES "
+        f"({_rowid(entity, 'NEW.')}, {_text([entity.title], 'NEW.')}, {_text(entity.body, 'NEW.')});"
+    )
+    delete = f"DELETE FROM search_index WHERE rowid = {_rowid(entity, 'OLD.')};"
+    name = f"search_{entity.table}"
+    return {
+        f"{name}_ai": f"CREATE TRIGGER {name}_ai AFTER INSERT ON {entity.table} BEGIN {insert} END",
+        f"{name}_au": f"CREATE TRIGGER {name}_au AFTER UPDATE ON {entity.table} BEGIN {delete} {insert} END",
+        f"{name}_ad": f"CREATE TRIGGER {name}_ad AFTER DELETE ON {entity.table} BEGIN {delete} END",
+    }
+
+
+def rebuild_search_index(conn) -> None:
+    """Refill the SQLite search index from the source tables."""
+    conn.execute(text("DELETE FROM search_index"))
+    for entity in SEARCH_ENTITIES:
+        conn.execute(text(
+            f"INSERT INTO search_index (rowid, title, body) "
+            f"SELECT {_rowid(entity)}, {_text([entity.title])}, {_text(entity.body)} FROM {entity.table}"
+        ))
+
+
+def _sqlite_has_trigram(conn) -> bool:
+    """Whether this SQLite build has FTS5 with the trigram tokenizer (3.34+)."""
+    version = conn.execute(text("SELECT sqlite_version()")).scalar()
+    if tuple(int(part) for part in version.split('.')[:2]) < (3, 34):
+        return False
+    try:
+        conn.execute(text("CREATE VIRTUAL TABLE temp.search_probe USING fts5(x, tokenize = 'trigram')"))
+    except OperationalError:
+        return False
+    conn.execute(text("DROP TABLE temp.search_probe"))
+    return True
+
+
+def install_search(engine) -> None:
+    """Create the search index, its triggers or trigram indexes as needed.
+
+    Safe to call on every start-up. The SQLite index is backfilled from
+    existing rows whenever it or any of its triggers had to be created, since
+    writes made without the triggers are missing from it. Without trigram
+    support the triggers are dropped, as they could not write to the index.
+    """
+    with engine.begin() as conn:
+        if engine.dialect.name == 'sqlite' and not _sqlite_has_trigram(conn):
+            for entity in SEARCH_ENTITIES:
+                for name in _sqlite_triggers(entity):
+                    conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+        elif engine.dialect.name == 'sqlite':
+            existing = {name for name, in conn.execute(text(
+                "SELECT name FROM sqlite_master WHERE name = 'search_index' OR type = 'trigger'"
+            ))}
+            created = False
+            if 'search_index' not in existing:
+                conn.execute(text(
+                    "CREATE VIRTUAL TABLE search_index USING fts5(title, body, tokenize = 'trigram')"
+                ))
+                created = True
+            for entity in SEARCH_ENTITIES:
+                for name, statement in _sqlite_triggers(entity).items():
+                    if name not in existing:
+                        conn.execute(text(statement))
+                        created = True
+            if created:
+                rebuild_search_index(conn)
+            _fts_engines.add(engine)
+        elif engine.dialect.name == 'postgresql':
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            for entity in SEARCH_ENTITIES:
+                conn.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS ix_{entity.table}_search_trgm ON {entity.table} "
+                    f"USING gin (({_text([entity.title, *entity.body])}) gin_trgm_ops)"
+                ))
+
+
+# -- Querying ------------------------------------------------------------------------------
+def search_terms(query: str) -> List[str]:
+    """Split ``query`` into the terms long enough to match trigrams."""
+    return [term for term in query.split() if len(term) >= MIN_QUERY_LENGTH]
+
+
+def _like_pattern(term: str) -> str:
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+
+def _hit(entity: SearchEntity, row_id: int, title: str, detail: str, score: float) -> Dict:
+    return {
+        'type': entity.type,
+        'id': row_id,
+        'title': title or None,
+        'detail': ' '.join(detail.split()) or None,
+        'score': score,
+    }
+
+
+def _search_fts(db, terms, entities, limit, offset):
+    # Trigrams cannot match terms shorter than three characters, so those
+    # only filter the rows the longer terms matched.
+    long_terms = search_terms(' '.join(terms))
+    short_terms = [term for term in terms if term not in long_terms]
+    params = {
+        'match': ' '.join('"' + term.replace('"', '""') + '"' for term in long_terms),
+        'limit': limit,
+        'offset': offset,
+    }
+    codes = ', '.join(str(entity.code) for entity in entities)
+    conditions = ['search_index MATCH :match', f"rowid % {STRIDE} IN ({codes})"]
+    for index, term in enumerate(short_terms):
+        params[f'term{index}'] = _like_pattern(term)
+        conditions.append(f"title || ' ' || body LIKE :term{index} ESCAPE '\\'")
+    rows = db.execute(text(
+        f"SELECT rowid, title, body, bm25(search_index, 10.0, 1.0) AS rank FROM search_index "
+        f"WHERE {' AND '.join(conditions)} ORDER BY rank LIMIT :limit OFFSET :offset"
+    ), params)
+    by_code = {entity.code: entity for entity in SEARCH_ENTITIES}
+    return [
+        _hit(by_code[rowid % STRIDE], rowid // STRIDE, title, body, round(-rank, 6))
+        for rowid, title, body, rank in rows
+    ]
+
+
+def _search_like(db, terms, entities, limit, offset):
+    postgres = db.get_bind().dialect.name == 'postgresql'
+    like = 'ILIKE' if postgres else 'LIKE'
+    params = {'limit': limit, 'offset': offset, 'query': ' '.join(terms)}
+    for index, term in enumerate(terms):
+        params[f'term{index}'] = _like_pattern(term)
+
+    selects = []
+    for entity in entities:
+        haystack = _text([entity.title, *entity.body])
+        conditions = ' AND '.join(
+            f"({haystack}) {like} :term{index} ESCAPE '\\'" for index in range(len(terms))
+        )
+        score = f"similarity({haystack}, :query)" if postgres else '0.0'
+        selects.append(
+            f"SELECT {entity.code} AS code, id, {_text([entity.title])} AS title, "
+            f"{_text(entity.body)} AS body, {score} AS score FROM {entity.table} WHERE {conditions}"
+        )
+    rows = db.execute(text(
+        ' UNION ALL '.join(selects) + " ORDER BY score DESC, code, id LIMIT :limit OFFSET :offset"
+    ), params)
+    by_code = {entity.code: entity for entity in SEARCH_ENTITIES}
+    return [
+        _hit(by_code[code], row_id, title, body, float(score))
+        for code, row_id, title, body, score in rows
+    ]
+
+
+def search(db, query: str, types: Optional[Iterable[str]] = None,
+           limit: int = 20, offset: int = 0) -> List[Dict]:
+    """Return ranked hits for ``query``, best first.
+
+    Every whitespace-separated term must occur as a substring; at least one
+    term needs :data:`MIN_QUERY_LENGTH` characters.
+    """
+    terms = query.split()
+    entities = [ENTITIES_BY_TYPE[name] for name in types] if types else list(SEARCH_ENTITIES)
+    if not search_terms(query) or not entities:
+        return []
+    if db.get_bind().engine in _fts_engines:
+        return _search_fts(db, terms, entities, limit, offset)
+    return _search_like(db, terms, entities, limit, offset)
@@ -2,8 +2,10 @@
 import random
 from datetime import datetime, timedelta
 from faker import Faker
+from cache import bump_versions
 from database import SessionLocal, engine, Base
-from models import Customer, Vendor, Invoice, InvoiceItem, Expense, Payment
+from models import Customer, Vendor, Invoice, InvoiceItem, Expense, Payment, PaymentAllocation
+from rollups import rebuild_rollups
 
 # Initialize Faker
 fake = Faker()
@@ -153,8 +155,8 @@ def create_invoices(session, customers, count=50):
             invoice_number=invoice_number,
             customer_id=customer.id,
             status=random.choice(INVOICE_STATUSES),
-            issue_date=issue_date.isoformat(),
-            due_date=due_date.isoformat(),
+            issue_date=issue_date,
+            due_date=due_date,
             payment_terms=customer.payment_terms,
             notes=fake.sentence() if random.random() > 0.7 else None,
             terms=fake.paragraph() if random.random() > 0.8 else None,
@@ -163,6 +165,8 @@ def create_invoices(session, customers, count=50):
             tax_total=tax_total,
             discount_total=discount_total,
             total=total,
+            amount_paid=0.0,
+            balance_due=total,
             created_at=issue_date.isoformat(),
             updated_at=datetime.now().isoformat(),
             items=items
@@ -197,7 +201,7 @@ def create_expenses(session, vendors, customers, count=100):
         expense = Expense(
             type=random.choice(EXPENSE_TYPES),
             amount=round(random.uniform(10, 5000), 2),
-            date=expense_date.isoformat(),
+            date=expense_date,
             payment_method=random.choice(PAYMENT_METHODS),
             reference_number=fake.bothify(text='REF-########') if random.random() > 0.5 else None,
             description=fake.sentence(),
@@ -236,7 +240,7 @@ def create_payments(session, invoices, vendors, customers, count=80):
 
         payment = Payment(
             amount=amount,
-            date=payment_date.isoformat(),
+            date=payment_date,
             payment_method=random.choice(PAYMENT_METHODS),
             reference_number=fake.bothify(text='PMT-########') if random.random() > 0.4 else None,
             notes=fake.sentence() if random.random() > 0.7 else None,
@@ -246,6 +250,11 @@ def create_payments(session, invoices, vendors, customers, count=80):
             created_at=payment_date.isoformat(),
             updated_at=datetime.now().isoformat(),
         )
+        if invoice and invoice.balance_due > 0:
+            applied = round(min(amount, invoice.balance_due), 2)
+            payment.allocations.append(PaymentAllocation(invoice_id=invoice.id, amount=applied))
+            invoice.amount_paid = round(invoice.amount_paid + applied, 2)
+            invoice.balance_due = round(invoice.total - invoice.amount_paid, 2)
         payments.append(payment)
 
     session.add_all(payments)
@@ -273,6 +282,13 @@ def main():
         expenses = create_expenses(session, vendors, customers, count=100)
         payments = create_payments(session, invoices, vendors, customers, count=80)
 
+        # Seeded rows bypass the write routes, so rebuild the dashboard rollups from them
+        rebuild_rollups(session)
+
+        # Invalidate ETags handed out before the seed
+        bump_versions(session, 'customers', 'vendors', 'invoices', 'expenses', 'payments')
+        session.commit()
+
         print("=" * 50)
         print("Data seeding completed successfully!")
         print(f"Total created:")
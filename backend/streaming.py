@@ -0,0 +1,99 @@
+"""Streaming responses for unpaged list endpoints.
+
+Rows are read with ``yield_per`` and encoded in batches as the response is
+sent, so memory stays bounded by one batch however large the table is. The
+default body is a JSON array; ``format=ndjson`` or an ``Accept:
+application/x-ndjson`` header selects one JSON document per line.
+
+The first batch is read before the response starts, so a query that fails
+outright still raises in the view. Once the status line is sent, a failing
+query can only end the body: it is logged, NDJSON gets a last ``error``
+line, and a JSON array is left unclosed so that clients fail to parse it
+rather than read a short list.
+"""
+from typing import Any, Callable, Iterable, Iterator
+
+from flask import Response, current_app, stream_with_context
+from sqlalchemy.exc import SQLAlchemyError
+
+from fieldsets import records
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+STREAM_FORMATS = ('json', 'ndjson')
+STREAM_BATCH_SIZE = 500
+
+
+def wants_ndjson(request) -> bool:
+    """Whether the client asked for NDJSON.
+
+    Raises ``ValueError`` with a client-facing message on an unknown ``format``.
+    """
+    fmt = (request.args.get('format') or '').lower()
+    if fmt:
+        if fmt not in STREAM_FORMATS:
+            raise ValueError(f"format must be one of {', '.join(STREAM_FORMATS)}")
+        return fmt == 'ndjson'
+    return request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+
+
+def _encoded_batches(rows: Iterable[Any], serialize: Callable[[Any], Any], batch_size: int) -> Iterator[list]:
+    dumps = current_app.json.dumps
+    batch = []
+    for row in rows:
+        batch.append(dumps(serialize(row)))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _log_failure() -> None:
+    current_app.logger.exception('Streamed response failed after it started')
+
+
+def _json_array(first, batches):
+    yield '[' + ','.join(first)
+    try:
+        for batch in batches:
+            yield ',' + ','.join(batch)
+    except SQLAlchemyError:
+        _log_failure()
+        return
+    yield ']'
+
+
+def _ndjson(first, batches):
+    if first:
+        yield '\n'.join(first) + '\n'
+    try:
+        for batch in batches:
+            yield '\n'.join(batch) + '\n'
+    except SQLAlchemyError:
+        _log_failure()
+        yield current_app.json.dumps({'error': 'Failed to load the remaining rows'}) + '\n'
+
+
+def _stream(rows, serialize, ndjson, batch_size):
+    batches = _encoded_batches(rows, serialize, batch_size)
+    first = next(batches, [])
+    if ndjson:
+        return Response(stream_with_context(_ndjson(first, batches)), mimetype=NDJSON_MIMETYPE)
+    return Response(stream_with_context(_json_array(first, batches)), mimetype='application/json')
+
+
+def stream_query(query, serialize: Callable[[Any], Any], ndjson: bool = False,
+                 batch_size: int = STREAM_BATCH_SIZE) -> Response:
+    """Stream every row of ``query`` through ``serialize``.
+
+    The query runs with ``yield_per``, so it must not eager-load collections
+    with ``joinedload``; use ``selectinload`` instead.
+    """
+    return _stream(query.yield_per(batch_size), serialize, ndjson, batch_size)
+
+
+def stream_select(db, statement, serialize: Callable[[Any], Any], ndjson: bool = False,
+                  batch_size: int = STREAM_BATCH_SIZE) -> Response:
+    """Stream every row of a Core ``select()`` executed on ``db``, as :func:`fieldsets.records`."""
+    rows = records(db.execute(statement.execution_options(yield_per=batch_size)))
+    return _stream(rows, serialize, ndjson, batch_size)
@@ -0,0 +1,101 @@
+"""Pytest fixtures and configuration.
+
+The app is imported against a throwaway SQLite database, so the suite never
+touches ``ledgerflow.db`` or the ``DATABASE_URL`` of the shell it runs in.
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+_DB_DIR = tempfile.mkdtemp(prefix='ledgerflow-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_DB_DIR, 'test.db')}"
+os.environ['FLASK_CONFIG'] = 'testing'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+
+from app import app as flask_app  # noqa: E402
+from models import engine  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def app():
+    """The application, bound to the test database for the whole session."""
+    yield flask_app
+    engine.dispose()
+    shutil.rmtree(_DB_DIR, ignore_errors=True)
+
+
+@pytest.fixture
+def client(app):
+    """A test client for the application."""
+    return app.test_client()
+
+
+def _created(response):
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()
+
+
+@pytest.fixture(scope='session')
+def sample_data(app):
+    """Customers, vendors, invoices, expenses and payments that link to each other.
+
+    Every list holds enough rows that a per-row lazy load would show up in
+    the query counts.
+    """
+    client = app.test_client()
+    count = 12
+    customers = [
+        _created(client.post('/api/customers', json={
+            'name': f'Customer {index}', 'email': f'customer{index}@example.com', 'company': f'Customer Co {index}',
+        }))
+        for index in range(count)
+    ]
+    vendors = [
+        _created(client.post('/api/vendors', json={
+            'contactName': f'Vendor {index}', 'email': f'vendor{index}@example.com', 'company': f'Vendor Co {index}',
+        }))
+        for index in range(count)
+    ]
+    invoices = [
+        _created(client.post('/api/invoices', json={
+            'invoiceNumber': f'SAMPLE-{index:03d}',
+            'customerId': customer['id'],
+            'status': 'sent',
+            'issueDate': '2026-01-15',
+            'dueDate': '2026-02-14',
+            'taxRate': 10,
+            'lineItems': [
+                {'description': 'Consulting', 'quantity': 2, 'rate': 100},
+                {'description': 'Hosting', 'quantity': 1, 'rate': 50},
+            ],
+        }))
+        for index, customer in enumerate(customers)
+    ]
+    expenses = [
+        _created(client.post('/api/expenses', json={
+            'type': 'software', 'amount': 20 + index, 'date': '2026-01-20', 'vendorId': vendor['id'],
+        }))
+        for index, vendor in enumerate(vendors)
+    ]
+    # Only half of the payments name a customer, so the customers of the
+    # other invoices are not already in the session when they are read.
+    payments = [
+        _created(client.post('/api/payments', json={
+            'amount': 100,
+            'date': '2026-01-25',
+            'customerId': invoice['customerId'] if index % 2 else None,
+            'vendorId': vendor['id'],
+            'allocations': [{'invoiceId': invoice['id'], 'amount': 100}],
+        }))
+        for index, (invoice, vendor) in enumerate(zip(invoices, vendors))
+    ]
+    return {
+        'customers': customers,
+        'vendors': vendors,
+        'invoices': invoices,
+        'expenses': expenses,
+        'payments': payments,
+    }
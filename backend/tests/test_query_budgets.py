@@ -0,0 +1,77 @@
+"""Query budgets for the list and detail endpoints.
+
+Each endpoint runs a fixed number of queries however many rows it returns;
+a budget that starts failing usually means a relationship is lazy loaded
+once per row again.
+"""
+import pytest
+
+from query_stats import query_budget
+
+# (path, queries) for the list endpoints: the table version lookup of the
+# conditional GET, the list itself and one IN lookup per eager relationship.
+LIST_BUDGETS = [
+    ('/api/customers', 2),
+    ('/api/customers?limit=5', 2),
+    ('/api/vendors', 2),
+    ('/api/vendors?limit=5', 2),
+    ('/api/invoices', 3),
+    ('/api/invoices?limit=5', 3),
+    ('/api/expenses', 2),
+    ('/api/expenses?limit=5', 2),
+    ('/api/payments', 3),
+    ('/api/payments?limit=5', 3),
+    ('/api/payments?fields=id,amount,allocations&limit=5', 3),
+]
+
+
+def _get(client, path):
+    response = client.get(path)
+    # Unpaged lists are streamed and only query while the body is read.
+    response.get_data()
+    return response
+
+
+@pytest.mark.parametrize('path,budget', LIST_BUDGETS)
+def test_list_endpoint_budget(client, sample_data, path, budget):
+    with query_budget(budget):
+        response = _get(client, path)
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize('kind,budget', [
+    ('invoices', 2),
+    ('expenses', 2),
+    ('payments', 3),
+])
+def test_detail_endpoint_budget(client, sample_data, kind, budget):
+    record_id = sample_data[kind][0]['id']
+    with query_budget(budget):
+        response = _get(client, f'/api/{kind}/{record_id}')
+    assert response.status_code == 200
+    assert response.get_json()['id'] == record_id
+
+
+@pytest.mark.parametrize('path', ['/api/invoices', '/api/expenses', '/api/payments'])
+def test_list_queries_do_not_grow_with_rows(client, sample_data, path):
+    counts = []
+    for limit in (2, len(sample_data['payments'])):
+        with query_budget(10) as stats:
+            response = _get(client, f'{path}?limit={limit}')
+        assert len(response.get_json()['items']) == limit
+        assert stats.repeated(threshold=2) == []
+        counts.append(stats.count)
+    assert counts[0] == counts[1]
+
+
+def test_payments_list_loads_related_rows_without_n_plus_one(client, sample_data):
+    with query_budget(3) as stats:
+        response = _get(client, '/api/payments?limit=50')
+    payments = response.get_json()['items']
+    assert len(payments) >= len(sample_data['payments'])
+    linked = [payment for payment in payments if payment['allocations']]
+    assert linked
+    for payment in linked:
+        assert payment['invoice']['customerName'] is not None
+        assert payment['vendor'] is not None
+    assert stats.repeated(threshold=2) == []
@@ -1,4 +1,8 @@
 """Utility functions for the LedgerFlow backend."""
+from datetime import date, datetime
+
+from fieldsets import Field, serialize
+from models import Invoice
 
 
 def parse_float(value, default=0.0):
@@ -11,6 +15,44 @@ def parse_float(value, default=0.0):
         return default
 
 
+def parse_int(value, default=None):
+    """Parse a value to int with a default fallback."""
+    try:
+        if value in (None, ''):
+            return default
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def parse_int_arg(args, name):
+    """Read an optional integer query parameter.
+
+    Raises ``ValueError`` with a client-facing message when it is malformed.
+    """
+    value = args.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} must be an integer')
+
+
+def parse_date_arg(args, name):
+    """Read an optional ``YYYY-MM-DD`` query parameter.
+
+    Raises ``ValueError`` with a client-facing message when it is malformed.
+    """
+    value = args.get(name)
+    if not value:
+        return None
+    parsed = parse_iso_date(value)
+    if parsed is None:
+        raise ValueError(f'{name} must be in YYYY-MM-DD format')
+    return parsed
+
+
 def normalize_status(value, allowed_statuses=None):
     """Normalize and validate invoice status."""
     if allowed_statuses is None:
@@ -21,46 +63,173 @@ def normalize_status(value, allowed_statuses=None):
     return value
 
 
-def serialize_invoice(invoice, include_items=True):
-    """Serialize an invoice object to dictionary."""
-    customer = None
-    if invoice.customer:
-        customer = {
-            'id': invoice.customer.id,
-            'name': invoice.customer.name,
-            'email': invoice.customer.email,
-            'company': invoice.customer.company,
-        }
+def parse_invoice_payload(data, item_ids=False):
+    """Validate an invoice request body and compute its totals.
+
+    Returns ``(values, items)``: invoice column values and line item dicts.
+    Items without a description are dropped. With ``item_ids`` every item
+    dict also carries the ``id`` sent for it, or ``None``. Raises
+    ``ValueError`` with a client-facing message on invalid input.
+    """
+    invoice_number = str(data.get('invoiceNumber') or '').strip()
+    customer_id = data.get('customerId')
+    try:
+        customer_id = int(customer_id)
+    except (TypeError, ValueError):
+        customer_id = None
+
+    if not invoice_number or not customer_id:
+        raise ValueError('Invoice number and customer are required')
+
+    issue_date = parse_iso_date(data.get('issueDate'))
+    due_date = parse_iso_date(data.get('dueDate'))
+    if (data.get('issueDate') and not issue_date) or (data.get('dueDate') and not due_date):
+        raise ValueError('Dates must be in YYYY-MM-DD format')
+
+    line_items = data.get('lineItems') or []
+    if not isinstance(line_items, list) or not all(isinstance(item, dict) for item in line_items):
+        raise ValueError('lineItems must be an array of objects')
 
-    data = {
-        'id': invoice.id,
-        'invoiceNumber': invoice.invoice_number,
-        'customerId': invoice.customer_id,
-        'status': invoice.status,
-        'issueDate': invoice.issue_date,
-        'dueDate': invoice.due_date,
-        'paymentTerms': invoice.payment_terms,
-        'notes': invoice.notes,
-        'terms': invoice.terms,
-        'taxRate': invoice.tax_rate or 0.0,
-        'subtotal': invoice.subtotal or 0.0,
-        'taxTotal': invoice.tax_total or 0.0,
-        'discountTotal': invoice.discount_total or 0.0,
-        'total': invoice.total or 0.0,
-        'createdAt': invoice.created_at,
-        'updatedAt': invoice.updated_at,
-        'customer': customer,
+    items = []
+    subtotal = 0.0
+    for item in line_items:
+        description = str(item.get('description') or '').strip()
+        if not description:
+            continue
+        quantity = parse_float(item.get('quantity'), 0.0)
+        rate = parse_float(item.get('rate'), 0.0)
+        subtotal += quantity * rate
+        items.append({
+            'description': description,
+            'quantity': quantity,
+            'rate': rate,
+        })
+        if item_ids:
+            items[-1]['id'] = parse_int(item.get('id'))
+
+    tax_rate = parse_float(data.get('taxRate'), 0.0)
+    tax_total = subtotal * (tax_rate / 100.0)
+    discount_total = parse_float(data.get('discountTotal'), 0.0)
+    values = {
+        'invoice_number': invoice_number,
+        'customer_id': customer_id,
+        'status': normalize_status(data.get('status')),
+        'issue_date': issue_date,
+        'due_date': due_date,
+        'payment_terms': data.get('paymentTerms'),
+        'notes': data.get('notes'),
+        'terms': data.get('terms'),
+        'tax_rate': tax_rate,
+        'subtotal': subtotal,
+        'tax_total': tax_total,
+        'discount_total': discount_total,
+        'total': subtotal + tax_total - discount_total,
+    }
+    return values, items
+
+
+def format_date(value):
+    """Serialize a date to an ISO string, passing ``None`` through."""
+    return value.isoformat() if value else None
+
+
+def _invoice_customer(invoice):
+    if not invoice.customer:
+        return None
+    return {
+        'id': invoice.customer.id,
+        'name': invoice.customer.name,
+        'email': invoice.customer.email,
+        'company': invoice.customer.company,
     }
 
-    if include_items:
-        data['lineItems'] = [
-            {
-                'id': item.id,
-                'description': item.description,
-                'quantity': item.quantity,
-                'rate': item.rate,
-            }
-            for item in invoice.items
-        ]
-
-    return data
+
+def _invoice_line_items(invoice):
+    return [
+        {
+            'id': item.id,
+            'description': item.description,
+            'quantity': item.quantity,
+            'rate': item.rate,
+        }
+        for item in invoice.items
+    ]
+
+
+INVOICE_FIELDS = {
+    'id': Field(lambda invoice: invoice.id, (Invoice.id,)),
+    'invoiceNumber': Field(lambda invoice: invoice.invoice_number, (Invoice.invoice_number,)),
+    'customerId': Field(lambda invoice: invoice.customer_id, (Invoice.customer_id,)),
+    'status': Field(lambda invoice: invoice.status, (Invoice.status,)),
+    'issueDate': Field(lambda invoice: format_date(invoice.issue_date), (Invoice.issue_date,)),
+    'dueDate': Field(lambda invoice: format_date(invoice.due_date), (Invoice.due_date,)),
+    'paymentTerms': Field(lambda invoice: invoice.payment_terms, (Invoice.payment_terms,)),
+    'notes': Field(lambda invoice: invoice.notes, (Invoice.notes,)),
+    'terms': Field(lambda invoice: invoice.terms, (Invoice.terms,)),
+    'taxRate': Field(lambda invoice: invoice.tax_rate or 0.0, (Invoice.tax_rate,)),
+    'subtotal': Field(lambda invoice: invoice.subtotal or 0.0, (Invoice.subtotal,)),
+    'taxTotal': Field(lambda invoice: invoice.tax_total or 0.0, (Invoice.tax_total,)),
+    'discountTotal': Field(lambda invoice: invoice.discount_total or 0.0, (Invoice.discount_total,)),
+    'total': Field(lambda invoice: invoice.total or 0.0, (Invoice.total,)),
+    'amountPaid': Field(lambda invoice: invoice.amount_paid or 0.0, (Invoice.amount_paid,)),
+    'balanceDue': Field(lambda invoice: invoice.balance_due or 0.0, (Invoice.balance_due,)),
+    'createdAt': Field(lambda invoice: invoice.created_at, (Invoice.created_at,)),
+    'updatedAt': Field(lambda invoice: invoice.updated_at, (Invoice.updated_at,)),
+    'customer': Field(_invoice_customer, (Invoice.customer,)),
+    'lineItems': Field(_invoice_line_items, (Invoice.items,)),
+}
+
+
+def serialize_invoice(invoice, include_items=True, fields=None):
+    """Serialize an invoice object to dictionary.
+
+    ``fields`` limits the output to those keys of :data:`INVOICE_FIELDS`;
+    otherwise every field is included, line items only if ``include_items``.
+    """
+    if fields is None:
+        fields = [name for name in INVOICE_FIELDS if include_items or name != 'lineItems']
+    return serialize(invoice, INVOICE_FIELDS, fields)
+
+
+def parse_iso_date(value):
+    """Parse supported date strings to ``date`` objects.
+
+    Handles date, datetime, and string inputs. Supported string formats:
+    - ISO format (YYYY-MM-DD or YYYY-MM-DDTHH:MM:SS)
+    - "%Y-%m-%d"
+    - "%Y-%m-%dT%H:%M:%S"
+    - "%Y-%m-%d %H:%M:%S"
+
+    Args:
+        value: A date, datetime, or date string to parse.
+
+    Returns:
+        date: Parsed date object, or None if parsing fails.
+    """
+    if not value:
+        return None
+
+    if isinstance(value, datetime):
+        return value.date()
+
+    if isinstance(value, date):
+        return value
+
+    for fmt in (
+        None,
+        "%Y-%m-%d",
+        "%Y-%m-%dT%H:%M:%S",
+        "%Y-%m-%d %H:%M:%S",
+    ):
+        try:
+            if fmt is None:
+                return datetime.fromisoformat(value).date()
+            return datetime.strptime(value, fmt).date()
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+def month_start(value):
+    """Return the first day of the month for a date."""
+    return date(value.year, value.month, 1)
@@ -313,6 +313,7 @@ export class InvoiceCreateComponent implements OnInit, OnDestroy {
 
   private createLineItemGroup(item?: InvoiceLineItem): FormGroup {
     return this.fb.group({
+      id: [item?.id ?? null],
       description: [item?.description || '', Validators.required],
       quantity: [item?.quantity ?? 1, [Validators.required, Validators.min(0)]],
       rate: [item?.rate ?? 0, [Validators.required, Validators.min(0)]],
@@ -394,6 +395,7 @@ export class InvoiceCreateComponent implements OnInit, OnDestroy {
       .map(group => group.value as InvoiceLineItem)
       .filter(item => (item.description || '').trim().length > 0)
       .map(item => ({
+        ...(item.id ? { id: item.id } : {}),
         description: item.description.trim(),
         quantity: this.toNumber(item.quantity),
         rate: this.toNumber(item.rate),
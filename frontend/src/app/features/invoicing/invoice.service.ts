@@ -33,6 +33,8 @@ export interface Invoice {
   taxTotal?: number;
   discountTotal?: number;
   total?: number;
+  amountPaid?: number;
+  balanceDue?: number;
   createdAt?: string;
   updatedAt?: string;
   lineItems: InvoiceLineItem[];